@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+浏览器资源占用基准：比较各启动方案打开N个标签页后的内存占用
+
+用法:
+    python benchmark_browser.py                         # desktop 和 production 各开5个标签页
+    python benchmark_browser.py --tabs 10 --url https://www.baidu.com
+    python benchmark_browser.py --profiles production --output benchmark.json
+
+对每个方案记录：启动耗时、空载RSS、每开一个标签页后的Chrome进程树RSS和JS堆，
+最后给出平均每个标签页的增量以及每GB内存可容纳的标签页数
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import BROWSER_PROFILES, load_config, load_env
+from memory_stats import browser_pid, page_heap_mb, process_tree_rss_mb
+from utils import get_browser_config
+
+async def measure_profile(profile: str, tabs: int, url: str) -> Dict:
+    """启动一个方案的浏览器，逐个打开标签页并采样内存"""
+    from pyppeteer import launch
+
+    # 与 main.py 一样先加载 .env，再覆盖启动方案
+    load_env()
+    env = dict(os.environ, BROWSER_PROFILE=profile)
+    # 基准只比较方案本身，忽略 .env 中的视口和无头设置
+    for name in ("BROWSER_HEADLESS", "BROWSER_VIEWPORT", "BROWSER_TAB_HEAP_MB"):
+        env.pop(name, None)
+    config = load_config(env).browser
+    options = get_browser_config(config)
+
+    print(f"\n🧪 [{profile}] 启动浏览器: headless={config.headless} 视口={config.viewport_width}x{config.viewport_height}")
+    started = time.monotonic()
+    browser = await launch(options)
+    launch_seconds = time.monotonic() - started
+    pid = browser_pid(browser)
+
+    samples: List[Dict] = []
+    pages = []
+    try:
+        await asyncio.sleep(1)
+        baseline = process_tree_rss_mb(pid)
+        print(f"📊 [{profile}] 启动耗时 {launch_seconds:.2f}秒，空载RSS {baseline:.1f}MB" if baseline is not None
+              else f"📊 [{profile}] 启动耗时 {launch_seconds:.2f}秒（当前平台无法读取RSS）")
+        for index in range(1, tabs + 1):
+            page = await browser.newPage()
+            await page.setViewport({'width': config.viewport_width, 'height': config.viewport_height})
+            await page.goto(url, {'waitUntil': 'load', 'timeout': config.navigation_timeout_ms})
+            pages.append(page)
+            await asyncio.sleep(0.5)
+            rss = process_tree_rss_mb(pid)
+            heaps = [await page_heap_mb(p) for p in pages]
+            heap = sum(h for h in heaps if h is not None)
+            samples.append({"tabs": index, "rss_mb": rss, "js_heap_mb": heap})
+            print(f"   标签页 {index}: RSS {rss if rss is None else round(rss, 1)}MB，JS堆合计 {heap:.1f}MB")
+    finally:
+        await browser.close()
+
+    per_tab = None
+    if baseline is not None and samples and samples[-1]["rss_mb"] is not None:
+        per_tab = (samples[-1]["rss_mb"] - baseline) / len(samples)
+    return {
+        "profile": profile,
+        "headless": config.headless,
+        "viewport": f"{config.viewport_width}x{config.viewport_height}",
+        "tab_heap_limit_mb": config.tab_heap_limit_mb,
+        "args": options["args"],
+        "url": url,
+        "launch_seconds": round(launch_seconds, 3),
+        "baseline_rss_mb": baseline,
+        "samples": samples,
+        "per_tab_rss_mb": per_tab,
+        "tabs_per_gb": 1024 / per_tab if per_tab else None,
+    }
+
+def print_summary(reports: List[Dict]):
+    print("\n" + "=" * 72)
+    print(f"{'方案':<12}{'启动(秒)':>10}{'空载RSS(MB)':>14}{'每标签页(MB)':>14}{'每GB标签页数':>14}")
+    for report in reports:
+        def fmt(value, digits=1):
+            return "-" if value is None else f"{value:.{digits}f}"
+        print(f"{report['profile']:<12}{fmt(report['launch_seconds'], 2):>10}{fmt(report['baseline_rss_mb']):>14}"
+              f"{fmt(report['per_tab_rss_mb']):>14}{fmt(report['tabs_per_gb'], 0):>14}")
+    print("=" * 72)
+
+async def main():
+    parser = argparse.ArgumentParser(description="浏览器启动方案的内存占用基准")
+    parser.add_argument("--profiles", default=",".join(BROWSER_PROFILES), help="逗号分隔的启动方案")
+    parser.add_argument("--tabs", type=int, default=5, help="每个方案打开的标签页数")
+    parser.add_argument("--url", default="https://www.baidu.com", help="每个标签页打开的页面")
+    parser.add_argument("--output", help="把完整结果写入JSON文件")
+    args = parser.parse_args()
+
+    reports = []
+    for profile in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        reports.append(await measure_profile(profile, args.tabs, args.url))
+    print_summary(reports)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+本地解析函数的微基准：回退解析、搜索意图解析和搜索词清理的吞吐与内存分配
+
+用法:
+    python benchmark_parsers.py                          # 运行并与保存的基准对比
+    python benchmark_parsers.py --check                  # 有退化时以非零状态退出（用于CI）
+    python benchmark_parsers.py --save-baseline          # 把本次结果保存为新的基准
+    python benchmark_parsers.py --only clean_search_query --corpus-size 20000
+
+语料由固定种子按真实指令的模板生成（网站别名、中英文混合搜索词、登录、多步和多网站指令），
+每次运行完全相同。每个函数先预热，再把整份语料跑 --repeat 轮、关闭GC计时，取最快一轮计算每秒调用数；
+内存分配另跑一轮，用 tracemalloc 记录每次调用的峰值分配字节数。
+不同机器的绝对速度不可比，所以每一轮之前运行一段固定的校准负载，
+对比基准时使用“相对校准负载的速度”（各轮速度比的中位数）
+"""
+import argparse
+import dataclasses
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from structured_log import set_level
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "parsers_baseline.json")
+
+SITE_NAMES = ["知乎", "zhihu", "百度", "微博", "weibo", "B站", "b站", "bilibili", "哔哩哔哩", "豆瓣"]
+
+QUERIES = [
+    "大模型", "机器学习", "深度学习框架", "Python教程", "今天的天气", "北京到上海的高铁", "肖申克的救赎",
+    "iPhone 16", "machine learning tutorial", "原神攻略", "周杰伦 演唱会", "量子计算的原理", "Rust入门",
+    "三体", "AI绘画教程", "北京美食", "明天的汇率", "职业规划", "考研 经验 分享", "React 和 Vue 的区别",
+    "如何学习英语", "减肥食谱", "2024年 高考 分数线", "The Godfather", "新能源汽车 销量", "猫咪 的 日常",
+    "Docker 部署 教程", "世界杯 赛程", "程序员 的 职业 发展", "上海 租房 攻略",
+]
+
+USERS = [("test", "123456"), ("alice", "pass123"), ("bob", "qwerty"), ("13800138000", "Zh!2024")]
+
+TEMPLATES = [
+    # (权重, 模板)
+    (6, "打开{site}"), (3, "去{site}"), (3, "访问{site}"), (2, "进入{site}看看"),
+    (10, "去{site}搜索{query}"), (10, "在{site}搜索{query}"), (6, "帮我在{site}找一下{query}"),
+    (5, "{site}上搜索{query}"), (5, "用{site}查一下{query}"), (6, "搜索{query}"), (4, "查一下{query}"),
+    (3, "在{site}里搜一搜{query}"), (3, "学习{query}"),
+    (4, "登录{site} 用户名{user} 密码{password}"), (3, "登录{site}，用户名 {user} 密码 {password}"),
+    (3, "打开{site}然后搜索{query}"), (2, "先去{site}搜索{query}，然后去{site2}搜索{query2}"),
+    (2, "登录{site} 用户名{user} 密码{password} 然后搜索{query}"),
+    (3, "在{site}和{site2}搜索{query}"), (2, "在{site}、{site2}和{site3}搜索{query}"),
+]
+
+STOP_WORD_FILLERS = ["的", "了", "和", "与", "在"]
+
+def build_corpus(size: int, seed: int = 20240101) -> List[str]:
+    """按模板权重生成指令语料，相同的 size 和 seed 总是得到相同的语料"""
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in TEMPLATES]
+    corpus = []
+    for _ in range(size):
+        template = rng.choices(TEMPLATES, weights=weights)[0][1]
+        site, site2, site3 = rng.sample(SITE_NAMES, 3)
+        user, password = rng.choice(USERS)
+        corpus.append(template.format(site=site, site2=site2, site3=site3, user=user, password=password,
+                                      query=rng.choice(QUERIES), query2=rng.choice(QUERIES)))
+    return corpus
+
+def build_query_corpus(size: int, seed: int = 20240101) -> List[str]:
+    """搜索词清理的语料：解析后残留的搜索词，夹带多余空白和停用词"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        words = rng.choice(QUERIES).split()
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(STOP_WORD_FILLERS))
+        separator = rng.choice([" ", "  ", " \t"])
+        corpus.append(rng.choice(["", " "]) + separator.join(words) + rng.choice(["", " "]))
+    return corpus
+
+@dataclasses.dataclass
+class Target:
+    name: str
+    func: Callable[[str], object]
+    corpus: Callable[[int], List[str]]
+
+def get_targets() -> Dict[str, Target]:
+    from config import QwenConfig
+    from qwen_agent import QwenAgent
+    from utils import clean_search_query, parse_search_intent
+
+    agent = QwenAgent(QwenConfig(api_key=""))
+    return {target.name: target for target in [
+        Target("fallback_parse", agent._fallback_parse, build_corpus),
+        Target("parse_search_intent", parse_search_intent, build_corpus),
+        Target("clean_search_query", clean_search_query, build_query_corpus),
+    ]}
+
+def _time_round(func: Callable[[str], object], corpus: List[str]) -> float:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for text in corpus:
+            func(text)
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def _calibration_workload(text: str):
+    # 与被测函数同类的纯Python字符串操作，用来衡量机器本身的速度
+    return [part.strip() for part in text.replace("搜索", " ").split(" ") if part]
+
+
+def measure_allocations(func: Callable[[str], object], corpus: List[str]) -> Dict[str, float]:
+    """
+    每次调用的内存分配：峰值（调用过程中临时分配的最大字节数）和留存（调用结束后没有释放的字节数）
+
+    CPython 没有分配次数计数器，这里用 tracemalloc 的峰值近似衡量每次调用的分配量
+    """
+    tracemalloc.start()
+    try:
+        peak_total = retained_total = 0
+        for text in corpus:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func(text)
+            after, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - before
+            retained_total += after - before
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes_per_call": peak_total / len(corpus), "retained_bytes_per_call": retained_total / len(corpus)}
+
+def run_target(target: Target, corpus_size: int, repeat: int) -> Dict:
+    corpus = target.corpus(corpus_size)
+    calibration_corpus = build_corpus(corpus_size)
+    for text in corpus[:200]:
+        target.func(text)
+    _time_round(_calibration_workload, calibration_corpus)
+
+    # 校准负载和被测函数交替计时，每一对的速度比受机器负载（降频、其他进程）的影响相近，取中位数
+    rounds, ratios = [], []
+    for _ in range(repeat):
+        calibration = _time_round(_calibration_workload, calibration_corpus)
+        elapsed = _time_round(target.func, corpus)
+        rounds.append(elapsed)
+        ratios.append((len(corpus) / elapsed) / (len(calibration_corpus) / calibration))
+    best = min(rounds)
+    ops = len(corpus) / best
+    report = {
+        "name": target.name,
+        "calls": len(corpus),
+        "ops_per_sec": ops,
+        "relative": statistics.median(ratios),
+        "us_per_call": best / len(corpus) * 1e6,
+        "round_spread": (max(rounds) - best) / best,
+    }
+    report.update(measure_allocations(target.func, corpus[:min(len(corpus), 2000)]))
+    return report
+
+def run_benchmarks(names: Optional[List[str]] = None, corpus_size: int = 5000, repeat: int = 7) -> Dict:
+    """运行基准，返回 {环境信息, 校准速度, 各函数结果}"""
+    targets = get_targets()
+    names = names or list(targets)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "corpus_size": corpus_size,
+        "results": {name: run_target(targets[name], corpus_size, repeat) for name in names},
+    }
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """
+    与基准逐项对比，返回对比行；regressed 为真表示退化超过容差
+
+    速度比较相对校准负载的速度（消除机器差异），内存比较每次调用的峰值分配
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        speed = result["relative"] / base["relative"] - 1
+        memory = (result["peak_bytes_per_call"] / base["peak_bytes_per_call"] - 1) if base["peak_bytes_per_call"] else 0.0
+        rows.append({
+            "name": name,
+            "speed_change": speed,
+            "memory_change": memory,
+            "regressed": speed < -tolerance or memory > tolerance,
+        })
+    return rows
+
+def load_baseline(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_baseline(report: Dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+def print_report(report: Dict, rows: List[Dict]):
+    print("\n" + "=" * 78)
+    print(f"🧪 Python {report['python']} ({report['machine']})，语料 {report['corpus_size']} 条，"
+          f"相对速度 = 每秒调用数 / 校准负载的每秒调用数")
+    print(f"{'函数':<22}{'次/秒':>12}{'微秒/次':>10}{'相对速度':>10}{'峰值分配(B)':>14}{'留存(B)':>10}")
+    for result in report["results"].values():
+        print(f"{result['name']:<22}{result['ops_per_sec']:>12,.0f}{result['us_per_call']:>10.2f}"
+              f"{result['relative']:>10.3f}{result['peak_bytes_per_call']:>14,.0f}{result['retained_bytes_per_call']:>10,.0f}")
+    if rows:
+        print(f"\n{'与基准对比':<22}{'速度':>10}{'峰值分配':>12}")
+        for row in rows:
+            mark = "❌" if row["regressed"] else "✅"
+            print(f"{row['name']:<22}{row['speed_change']:>+10.1%}{row['memory_change']:>+12.1%}  {mark}")
+    print("=" * 78)
+
+def main():
+    parser = argparse.ArgumentParser(description="本地解析函数的微基准")
+    parser.add_argument("--only", help="只运行这些函数（逗号分隔）")
+    parser.add_argument("--corpus-size", type=int, default=5000, help="语料条数")
+    parser.add_argument("--repeat", type=int, default=7, help="计时轮数")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基准文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基准")
+    parser.add_argument("--check", action="store_true", help="有函数退化超过容差时以状态1退出")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的退化比例")
+    parser.add_argument("--output", help="把完整结果写入JSON文件")
+    args = parser.parse_args()
+
+    # 解析过程中的日志不计入耗时
+    set_level(logging.WARNING)
+    names = [name.strip() for name in args.only.split(",")] if args.only else None
+    report = run_benchmarks(names, args.corpus_size, args.repeat)
+
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    rows = compare(report, baseline, args.tolerance) if baseline else []
+    print_report(report, rows)
+
+    if args.output:
+        save_baseline(report, args.output)
+        print(f"💾 结果已写入 {args.output}")
+    if args.save_baseline:
+        save_baseline(report, args.baseline)
+        print(f"💾 基准已保存到 {args.baseline}")
+    elif baseline is None:
+        print(f"ℹ️  没有基准文件 {args.baseline}，使用 --save-baseline 保存")
+    if args.check and any(row["regressed"] for row in rows):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
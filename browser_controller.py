@@ -1,104 +1,165 @@
 import asyncio
-import os
-from typing import Dict, Optional
-from pyppeteer import launch
-from pyppeteer.page import Page
-from pyppeteer.browser import Browser
-from dotenv import load_dotenv
+import logging
+import time
+import urllib.parse
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
-# 加载环境变量
-load_dotenv()
+import metrics
+from config import AppConfig, get_config
+from context_pool import ContextPool
+from memory_watchdog import RECYCLE_PAGE, RESTART_BROWSER, MemoryWatchdog
+from page_scripts import (
+    DEFAULT_PASSWORD_TAB_TEXTS, EXTRACT_RESULTS_JS, FIND_BY_TEXT_JS, FOCUS_AND_SELECT_JS, LOGIN_ANALYZER_JS,
+    LOGIN_BUTTON_TEXTS, NEXT_PAGE_TEXTS, REF_ATTRIBUTE, RESULT_SNIPPET_MAX_LENGTH, SET_INPUT_VALUE_JS,
+    TEXT_SEARCH_MAX_NODES, TEXT_SEARCH_MAX_RESULTS, TEXT_SEARCH_MAX_TEXT_LENGTH
+)
+from recorder import TaskRecorder, current_recorder, record_selector, record_step
+from response_cache import ResponseCache
+from result_cache import ResultCache
+from results import SearchResult, TaskResult, merge_search_results
+from singleflight import AsyncSingleFlight, task_fingerprint
+from sites import SiteAdapter, get_registry
+from structured_log import correlation, debug_dumps_enabled, get_correlation_id, get_logger
+from utils import get_browser_config
 
-BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
-BROWSER_TIMEOUT = int(os.getenv("BROWSER_TIMEOUT", "30000"))
-CHROME_PATH = os.getenv("CHROME_PATH", "/mnt/c/Program Files/Google/Chrome/Application/chrome.exe")
+# pyppeteer 体积较大，只在真正启动浏览器时才导入
+if TYPE_CHECKING:
+    from pyppeteer.browser import Browser, BrowserContext
+    from pyppeteer.network_manager import Request
+    from pyppeteer.page import Page
+
+# 请求拦截器：处理了该请求（应答或中止）时返回True，否则交给下一个拦截器，最后放行
+RequestInterceptor = Callable[["Request"], Awaitable[bool]]
+
+logger = get_logger("browser")
+
+_task_latency = metrics.histogram("task_duration_seconds", "任务从提交到返回的耗时（含缓存命中）")
+_task_queue_depth = metrics.gauge("task_queue_depth", "等待执行名额（MAX_CONCURRENT_TASKS）的任务数")
+_tasks_running = metrics.gauge("tasks_running", "正在执行的任务数")
+_selector_lookups = metrics.counter("selector_lookups_total", "元素查找结果（hit/miss/analyzer）")
+
+# incognito 隔离时当前任务使用的页面和隐身上下文（每个 asyncio 任务各自独立）
+_task_page: ContextVar[Optional["Page"]] = ContextVar("task_page", default=None)
+_task_context: ContextVar[Optional["BrowserContext"]] = ContextVar("task_context", default=None)
 
 class BrowserController:
     _instance = None
-    _browser: Optional[Browser] = None
-    _page: Optional[Page] = None
+    _browser: Optional["Browser"] = None
+    _main_page: Optional["Page"] = None
+    
+    @property
+    def _page(self) -> Optional["Page"]:
+        """当前任务的页面：incognito 隔离时是任务自己的页面，否则是共用的主页面"""
+        page = _task_page.get()
+        return page if page is not None else self._main_page
     
-    def __new__(cls):
+    @_page.setter
+    def _page(self, page: Optional["Page"]):
+        self._main_page = page
+    
+    def __new__(cls, config: Optional[AppConfig] = None):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
     
-    def __init__(self):
+    def __init__(self, config: Optional[AppConfig] = None):
+        # 单例只在第一次构造时读取配置
         if not hasattr(self, 'initialized'):
             self.initialized = True
             
-            # 不同网站的搜索框选择器
-            self.search_selectors = {
-                "https://www.zhihu.com": "input[placeholder*='搜索']",
-                "https://www.baidu.com": "input#kw",
-                "https://weibo.com": "input[placeholder*='搜索']",
-                "https://www.bilibili.com": "input.nav-search-input",
-                "https://www.douban.com": "input[placeholder*='搜索']"
-            }
+            self.config = config or get_config()
+            self.browser_config = self.config.browser
+            self._task_semaphore = asyncio.Semaphore(self.config.execution.max_concurrent_tasks)
+            # 并发任务同时发现浏览器未启动时只启动一次
+            self._launch_lock = asyncio.Lock()
             
-            # 搜索按钮选择器（某些网站可能需要点击搜索按钮而不是回车）
-            self.search_button_selectors = {
-                "https://www.baidu.com": "input#su",
-                "https://www.douban.com": "input[type='submit']"
-            }
+            # 网站选择器、就绪信号和登录流程都来自网站适配器注册表
+            self.sites = get_registry(self.config.sites)
+            
+            cache_config = self.config.cache
+            self.result_cache = ResultCache(
+                default_ttl=cache_config.ttl_seconds,
+                stale_ttl=cache_config.stale_seconds,
+                max_entries=cache_config.max_entries
+            ) if cache_config.enabled else None
+            # 相同任务的并发请求共享一次执行
+            self._task_flight = AsyncSingleFlight("perform_task")
+            
+            # 任务之间检查内存，按需回收主页面或重启浏览器
+            self.watchdog = MemoryWatchdog(self.config.watchdog)
+            # 正在使用浏览器的任务和后台刷新数；看门狗回收期间清除 _watchdog_idle，新的工作等它完成再开始
+            self._active_tasks = 0
+            self._watchdog_idle = asyncio.Event()
+            self._watchdog_idle.set()
+            
+            execution = self.config.execution
+            self.context_pool = ContextPool(execution.context_pool_size, self.prepare_page) \
+                if execution.task_isolation == "incognito" else None
+            
+            self.request_interceptors: List[RequestInterceptor] = []
+            
+            # 拦截层的磁盘响应缓存：开启请求拦截后Chrome自身的HTTP缓存不可用，由它代替
+            response_config = self.config.response_cache
+            self.response_cache = ResponseCache(
+                response_config.directory, response_config.max_size_mb * 1024 * 1024, mode=response_config.mode
+            ) if response_config.mode != "off" else None
+            if self.response_cache is not None:
+                self.request_interceptors.append(self.response_cache.handle)
     
-    async def launch_browser(self, retry_count=3):
-        """启动浏览器（带重试机制）"""
-        if self._browser is not None:
-            print("浏览器已经在运行中")
-            return
+    def add_request_interceptor(self, interceptor: RequestInterceptor):
+        """添加请求拦截器（如HAR回放），只对之后打开的页面生效，需在启动浏览器前添加"""
+        self.request_interceptors.append(interceptor)
+    
+    async def launch_browser(self, retry_count: Optional[int] = None):
+        """启动浏览器（带重试机制）；并发调用时只有一个真正启动，其余等它完成"""
+        async with self._launch_lock:
+            if self._browser is not None:
+                logger.info("浏览器已经在运行中")
+                return
+            await self._launch_browser(retry_count)
+    
+    async def _launch_browser(self, retry_count: Optional[int] = None):
+        from pyppeteer import launch
+        
+        retry_count = retry_count or self.browser_config.launch_retries
+        launch_options = get_browser_config(self.browser_config)
         
-        # 测试不同的配置
+        # 先用配置的启动参数，失败后退回最小配置
         configs = [
             {
-                "name": "最小配置",
-                "args": ["--no-sandbox"]
-            },
-            {
-                "name": "标准配置", 
-                "args": [
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox",
-                    "--disable-dev-shm-usage"
-                ]
+                "name": "配置参数",
+                "args": launch_options["args"]
             },
             {
-                "name": "完整配置",
-                "args": [
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox", 
-                    "--disable-dev-shm-usage",
-                    "--disable-web-security",
-                    "--disable-features=VizDisplayCompositor",
-                    "--window-size=1920,1080"
-                ]
+                "name": "最小配置",
+                "args": ["--no-sandbox"]
             }
         ]
         
         for config in configs:
             for attempt in range(retry_count):
                 try:
-                    print(f"🚀 [尝试] {config['name']} - 第{attempt+1}次尝试...")
+                    logger.debug("🚀 [尝试] %s - 第%s次尝试...", config['name'], attempt+1)
                     
-                    self._browser = await launch(
-                        headless=BROWSER_HEADLESS,
-                        executablePath=CHROME_PATH,
-                        args=config["args"],
-                        timeout=30000
-                    )
+                    self._browser = await launch(dict(launch_options, args=config["args"]))
                     
                     # 测试浏览器是否真的可用
-                    self._page = await self._browser.newPage()
-                    await self._page.setViewport({'width': 1920, 'height': 1080})
+                    page = await self._browser.newPage()
+                    self._page = page
+                    await self.prepare_page(page)
                     
                     # 简单测试页面导航
-                    await self._page.goto("about:blank", {'timeout': 5000})
+                    await page.goto("about:blank", {'timeout': 5000})
                     
-                    print(f"✅ [成功] 浏览器启动成功 - {config['name']}")
+                    logger.info("✅ [成功] 浏览器启动成功 - %s", config['name'])
+                    if self.context_pool is not None:
+                        self.context_pool.warm(self._browser)
                     return
                     
                 except Exception as e:
-                    print(f"❌ [失败] {config['name']} 第{attempt+1}次尝试失败: {e}")
+                    logger.warning("❌ [失败] %s 第%s次尝试失败: %s", config['name'], attempt+1, e)
                     
                     # 清理失败的浏览器实例
                     if self._browser:
@@ -110,12 +171,42 @@ class BrowserController:
                         self._page = None
                     
                     if attempt < retry_count - 1:
-                        print(f"⏳ [等待] 等待2秒后重试...")
+                        logger.debug("⏳ [等待] 等待2秒后重试...")
                         await asyncio.sleep(2)
         
         # 所有配置都失败
         raise Exception("所有浏览器配置都启动失败，请运行 browser_diagnostic.py 进行详细诊断")
     
+    async def prepare_page(self, page: "Page"):
+        """新页面的通用设置：视口和请求拦截规则"""
+        await page.setViewport({
+            'width': self.browser_config.viewport_width,
+            'height': self.browser_config.viewport_height
+        })
+        page.setDefaultNavigationTimeout(self.browser_config.navigation_timeout_ms)
+        if self.response_cache is not None:
+            self.response_cache.attach(page)
+        
+        blocked_types = set(self.browser_config.blocked_resource_types)
+        blocked_patterns = self.browser_config.blocked_url_patterns
+        interceptors = list(self.request_interceptors)
+        if not blocked_types and not blocked_patterns and not interceptors:
+            return
+        
+        async def handle_request(request):
+            if request.resourceType in blocked_types or any(p in request.url for p in blocked_patterns):
+                await request.abort()
+                return
+            for interceptor in interceptors:
+                if await interceptor(request):
+                    return
+            await request.continue_()
+        
+        await page.setRequestInterception(True)
+        page.on('request', lambda request: asyncio.ensure_future(handle_request(request)))
+        if blocked_types or blocked_patterns:
+            logger.debug("🚫 [拦截] 屏蔽资源类型: %s URL片段: %s", sorted(blocked_types), blocked_patterns)
+    
     async def is_browser_alive(self):
         """检查浏览器是否仍然活跃"""
         if not self._browser or not self._page:
@@ -131,14 +222,16 @@ class BrowserController:
     async def ensure_browser_ready(self):
         """确保浏览器处于可用状态"""
         if not await self.is_browser_alive():
-            print("🔧 [检测] 浏览器连接已断开，正在重新启动...")
+            logger.info("🔧 [检测] 浏览器连接已断开，正在重新启动...")
+            if self._browser is not None:
+                self.watchdog.browser_restarted("disconnected")
             # 清理旧的浏览器实例
             self._browser = None
             self._page = None
             # 重新启动浏览器
             await self.launch_browser()
         else:
-            print("✅ [检测] 浏览器连接正常")
+            logger.debug("✅ [检测] 浏览器连接正常")
     
     async def close_browser(self):
         """关闭浏览器"""
@@ -146,11 +239,13 @@ class BrowserController:
             try:
                 await self._browser.close()
             except Exception as e:
-                print(f"关闭浏览器时出错: {e}")
+                logger.warning("关闭浏览器时出错: %s", e)
             finally:
                 self._browser = None
                 self._page = None
-                print("浏览器已关闭")
+                logger.info("浏览器已关闭")
+        if self.response_cache is not None:
+            await self.response_cache.close()
     
     async def goto_website(self, url: str):
         """导航到指定网站"""
@@ -158,131 +253,155 @@ class BrowserController:
         await self.ensure_browser_ready()
         
         try:
-            print(f"🌐 [步骤1] 正在导航到: {url}")
-            await self._page.goto(url, {'waitUntil': 'domcontentloaded', 'timeout': 60000})
+            logger.debug("🌐 [步骤1] 正在导航到: %s", url)
+            await self._page.goto(url, self._goto_options())
             
             # 获取页面信息
             page_title = await self._page.title()
             current_url = self._page.url
-            print(f"📄 [页面信息] 标题: {page_title}")
-            print(f"📄 [页面信息] 当前URL: {current_url}")
+            logger.debug("📄 [页面信息] 标题: %s", page_title)
+            logger.debug("📄 [页面信息] 当前URL: %s", current_url)
             
-            print("⏳ [步骤2] 等待页面完全加载...")
-            await asyncio.sleep(2)
+            logger.debug("⏳ [步骤2] 等待页面完全加载...")
+            await self.wait_until_ready(url)
             
             # 检查页面是否加载完成
             ready_state = await self._page.evaluate('document.readyState')
-            print(f"📊 [页面状态] ReadyState: {ready_state}")
+            logger.debug("📊 [页面状态] ReadyState: %s", ready_state)
             
-            print(f"✅ [步骤3] 网站打开成功: {url}")
+            logger.debug("✅ [步骤3] 网站打开成功: %s", url)
         except Exception as e:
-            print(f"❌ 打开网站失败: {e}")
+            logger.error("❌ 打开网站失败: %s", e)
             # 如果是连接错误，尝试重新启动浏览器后重试一次
-            if "Target closed" in str(e) or "Protocol error" in str(e):
-                print("🔄 [重试] 检测到连接错误，重新启动浏览器后重试...")
+            # 隔离任务的页面属于旧浏览器，不能在这里替换，交给任务失败处理
+            if ("Target closed" in str(e) or "Protocol error" in str(e)) and _task_page.get() is None:
+                logger.info("🔄 [重试] 检测到连接错误，重新启动浏览器后重试...")
+                self.watchdog.browser_restarted("protocol_error")
                 self._browser = None
                 self._page = None
                 await self.ensure_browser_ready()
                 try:
-                    await self._page.goto(url, {'waitUntil': 'domcontentloaded', 'timeout': 60000})
+                    await self._page.goto(url, self._goto_options())
                     page_title = await self._page.title()
                     current_url = self._page.url
-                    print(f"📄 [页面信息] 标题: {page_title}")
-                    print(f"📄 [页面信息] 当前URL: {current_url}")
-                    print(f"✅ [步骤3] 网站打开成功: {url}")
+                    logger.debug("📄 [页面信息] 标题: %s", page_title)
+                    logger.debug("📄 [页面信息] 当前URL: %s", current_url)
+                    logger.debug("✅ [步骤3] 网站打开成功: %s", url)
                     return
                 except Exception as retry_e:
-                    print(f"❌ 重试后仍然失败: {retry_e}")
+                    logger.error("❌ 重试后仍然失败: %s", retry_e)
                     raise retry_e
             raise
     
-    async def find_element_with_debug(self, selectors: list, element_type: str, timeout: int = 10000):
+    async def wait_until_ready(self, url: str, page: Optional["Page"] = None):
+        """
+        等待页面可操作：网站有就绪信号时等到它出现，否则固定等待 settle_ms
+        """
+        page = page or self._page
+        site = self.sites.for_url(url)
+        if site and site.ready_selector:
+            try:
+                await page.waitForSelector(site.ready_selector, {'timeout': self.browser_config.element_timeout_ms})
+                logger.debug("✅ [就绪] 检测到就绪信号: %s", site.ready_selector)
+                return
+            except Exception:
+                logger.debug("⚠️  [就绪] 未检测到就绪信号 %s，改为固定等待", site.ready_selector)
+        await asyncio.sleep(self.browser_config.settle_ms / 1000)
+    
+    def _goto_options(self) -> Dict:
+        return {
+            'waitUntil': self.browser_config.wait_until,
+            'timeout': self.browser_config.navigation_timeout_ms
+        }
+    
+    async def find_element_with_debug(self, selectors: list, element_type: str, timeout: Optional[int] = None):
         """带调试信息的元素查找"""
-        print(f"🔍 [思考] 正在查找{element_type}...")
-        print(f"🧠 [策略] 将尝试以下选择器: {selectors[:3]}..." if len(selectors) > 3 else f"🧠 [策略] 将尝试以下选择器: {selectors}")
+        timeout = timeout or self.browser_config.element_timeout_ms
+        logger.debug("🔍 [思考] 正在查找%s...", element_type)
+        if logger.isEnabledFor(logging.DEBUG):
+            # 每次查找元素都会经过这里，未开启调试日志时不构造参数
+            logger.debug("🧠 [策略] 将尝试以下选择器: %s%s", selectors[:3], "..." if len(selectors) > 3 else "")
         
+        started = time.monotonic()
         for i, selector in enumerate(selectors, 1):
             try:
-                print(f"🎯 [尝试{i}/{len(selectors)}] 测试选择器: {selector}")
+                logger.debug("🎯 [尝试%s/%s] 测试选择器: %s", i, len(selectors), selector)
                 await self._page.waitForSelector(selector, {'timeout': timeout // len(selectors)})
-                print(f"✅ [成功] 找到{element_type}: {selector}")
+                logger.debug("✅ [成功] 找到%s: %s", element_type, selector)
+                _selector_lookups.inc(element=element_type, outcome="hit")
+                record_selector(element_type, selectors[:i], selector, time.monotonic() - started)
                 return selector
             except Exception as e:
-                print(f"⚠️  [失败] 选择器 {selector} 未找到元素")
+                logger.debug("⚠️  [失败] 选择器 %s 未找到元素", selector)
                 continue
         
         # 如果所有选择器都失败，进行智能分析
-        print(f"❌ [失败] 所有选择器都未找到{element_type}")
+        logger.error("❌ [失败] 所有选择器都未找到%s", element_type)
+        _selector_lookups.inc(element=element_type, outcome="miss")
+        record_selector(element_type, selectors, None, time.monotonic() - started)
         
-        # 针对密码框的特殊处理
-        if "密码" in element_type:
-            await self.analyze_login_form()
-        else:
-            await self.debug_page_elements()
+        # 页面分析要额外执行脚本并输出大量内容，只在开启 LOG_DEBUG_DUMPS 时进行
+        if debug_dumps_enabled():
+            if "密码" in element_type:
+                await self.analyze_login_form()
+            else:
+                await self.debug_page_elements()
         
         raise Exception(f"找不到{element_type}")
     
+    async def find_by_text(self, needles: list, max_results: int = TEXT_SEARCH_MAX_RESULTS,
+                           page: Optional["Page"] = None, exact: bool = False) -> list:
+        """
+        在可见的可交互元素中按文字查找，返回带 ref 句柄的匹配列表
+        
+        扫描的节点数和返回数量都有上限，页面再大开销也基本不变；文字以参数传入，不拼接进脚本。
+        exact 为真时要求元素文字与某个needle完全相同（不区分大小写），否则包含即可
+        """
+        return await (page or self._page).evaluate(FIND_BY_TEXT_JS, {
+            'refAttribute': REF_ATTRIBUTE,
+            'needles': needles,
+            'maxResults': max_results,
+            'maxNodes': TEXT_SEARCH_MAX_NODES,
+            'maxTextLength': TEXT_SEARCH_MAX_TEXT_LENGTH,
+            'exact': exact
+        })
+    
     async def analyze_login_form(self):
         """分析登录表单结构"""
-        print("🔍 [深度分析] 分析登录表单结构...")
+        logger.debug("🔍 [深度分析] 分析登录表单结构...")
         try:
             # 检查是否有多个登录Tab
-            tabs_info = await self._page.evaluate('''
-                () => {
-                    const tabs = Array.from(document.querySelectorAll('div, span, a, button')).filter(el => 
-                        el.textContent && (
-                            el.textContent.includes('密码') || 
-                            el.textContent.includes('验证码') ||
-                            el.textContent.includes('短信') ||
-                            el.textContent.includes('Password') ||
-                            el.textContent.includes('SMS')
-                        )
-                    );
-                    return tabs.map(tab => ({
-                        text: tab.textContent.trim(),
-                        tagName: tab.tagName,
-                        className: tab.className,
-                        id: tab.id
-                    }));
-                }
-            ''')
+            tabs_info = await self.find_by_text(['密码', '验证码', '短信', 'Password', 'SMS'])
             
             if tabs_info:
-                print(f"📊 [分析] 找到登录选项卡: {len(tabs_info)} 个")
+                logger.debug("📊 [分析] 找到登录选项卡: %s 个", len(tabs_info))
                 for i, tab in enumerate(tabs_info[:3]):
-                    print(f"   {i+1}. {tab['text']} ({tab['tagName']}.{tab['className']})")
+                    logger.debug("   %s. %s (%s.%s)", i+1, tab['text'], tab['tagName'], tab['className'])
                 
-                # 尝试点击密码相关的tab
+                # 尝试点击密码相关的tab（按句柄点击，不再按文字重新扫描整个DOM）
                 password_tabs = [tab for tab in tabs_info if '密码' in tab['text'] or 'Password' in tab['text']]
                 if password_tabs:
-                    print(f"🔄 [尝试] 点击密码登录选项卡: {password_tabs[0]['text']}")
-                    await self._page.evaluate(f'''
-                        () => {{
-                            const tabs = Array.from(document.querySelectorAll('div, span, a, button'));
-                            const target = tabs.find(el => el.textContent && el.textContent.includes('{password_tabs[0]['text']}'));
-                            if (target) target.click();
-                        }}
-                    ''')
-                    await asyncio.sleep(2)
+                    logger.debug("🔄 [尝试] 点击密码登录选项卡: %s", password_tabs[0]['text'])
+                    await self._page.click(password_tabs[0]['ref'])
                     
                     # 再次检查密码框
                     try:
-                        await self._page.waitForSelector("input[type='password']", {'timeout': 3000})
-                        print("✅ [成功] 切换后找到密码框")
+                        await self._page.waitForSelector("input[type='password']", {'visible': True, 'timeout': 3000})
+                        logger.debug("✅ [成功] 切换后找到密码框")
                         return
                     except:
-                        print("❌ [失败] 切换后仍未找到密码框")
+                        logger.warning("❌ [失败] 切换后仍未找到密码框")
             
             # 输出所有input元素进行分析
             await self.debug_page_elements()
             
         except Exception as e:
-            print(f"⚠️  [分析失败] 登录表单分析出错: {e}")
+            logger.warning("⚠️  [分析失败] 登录表单分析出错: %s", e)
             await self.debug_page_elements()
     
     async def debug_page_elements(self):
         """输出页面调试信息"""
-        print("🔍 [调试] 分析页面元素...")
+        logger.debug("🔍 [调试] 分析页面元素...")
         try:
             # 获取所有input元素
             inputs = await self._page.evaluate('''
@@ -298,9 +417,9 @@ class BrowserController:
                     }));
                 }
             ''')
-            print(f"📝 [页面分析] 找到 {len(inputs)} 个input元素:")
+            logger.debug("📝 [页面分析] 找到 %s 个input元素:", len(inputs))
             for i, inp in enumerate(inputs[:5]):  # 只显示前5个
-                print(f"   {i+1}. type='{inp.get('type')}' name='{inp.get('name')}' id='{inp.get('id')}' placeholder='{inp.get('placeholder')}'")
+                logger.debug("   %s. type='%s' name='%s' id='%s' placeholder='%s'", i+1, inp.get('type'), inp.get('name'), inp.get('id'), inp.get('placeholder'))
             
             # 获取所有button元素
             buttons = await self._page.evaluate('''
@@ -314,19 +433,19 @@ class BrowserController:
                     }));
                 }
             ''')
-            print(f"🔘 [页面分析] 找到 {len(buttons)} 个按钮元素:")
+            logger.debug("🔘 [页面分析] 找到 %s 个按钮元素:", len(buttons))
             for i, btn in enumerate(buttons[:3]):  # 只显示前3个
-                print(f"   {i+1}. text='{btn.get('textContent')}' id='{btn.get('id')}' type='{btn.get('type')}'")
+                logger.debug("   %s. text='%s' id='%s' type='%s'", i+1, btn.get('textContent'), btn.get('id'), btn.get('type'))
                 
         except Exception as e:
-            print(f"⚠️  [调试失败] 无法分析页面元素: {e}")
+            logger.warning("⚠️  [调试失败] 无法分析页面元素: %s", e)
 
     async def search_in_website(self, url: str, search_query: str):
         """在指定网站中搜索内容"""
         try:
             # 确保浏览器连接正常
             await self.ensure_browser_ready()
-            print(f"🔍 [搜索任务] 开始在网站搜索: {search_query}")
+            logger.info("🔍 [搜索任务] 开始在网站搜索: %s", search_query)
             
             # 获取搜索框选择器
             default_selectors = [
@@ -341,140 +460,201 @@ class BrowserController:
                 "[data-testid*='search']"
             ]
             
-            specific_selector = self.search_selectors.get(url)
+            site = self.sites.for_url(url)
+            specific_selector = site.search_input if site else None
             if specific_selector:
                 selectors = [specific_selector] + default_selectors
-                print(f"🎯 [策略] 网站有专用选择器: {specific_selector}")
+                logger.debug("🎯 [策略] 网站有专用选择器: %s", specific_selector)
             else:
                 selectors = default_selectors
-                print(f"🤔 [策略] 使用通用搜索选择器")
+                logger.debug("🤔 [策略] 使用通用搜索选择器")
             
             # 查找搜索框
-            search_selector = await self.find_element_with_debug(selectors, "搜索框", 10000)
+            search_selector = await self.find_element_with_debug(selectors, "搜索框")
             
-            print(f"⌨️  [步骤1] 清空搜索框并输入内容...")
-            await self._page.click(search_selector)
-            await self._page.keyboard.down('Control')
-            await self._page.keyboard.press('KeyA')
-            await self._page.keyboard.up('Control')
-            await self._page.type(search_selector, search_query)
-            print(f"✅ [步骤1] 已输入搜索内容: {search_query}")
+            logger.debug("⌨️  [步骤1] 清空搜索框并输入内容...")
+            await self.fill_input(search_selector, search_query, site)
+            logger.debug("✅ [步骤1] 已输入搜索内容: %s", search_query)
             
             # 查找搜索按钮
-            search_button_selector = self.search_button_selectors.get(url)
+            search_button_selector = site.search_button if site else None
             if search_button_selector:
-                print(f"🔘 [步骤2] 尝试点击专用搜索按钮: {search_button_selector}")
+                logger.debug("🔘 [步骤2] 尝试点击专用搜索按钮: %s", search_button_selector)
                 try:
                     await self._page.click(search_button_selector)
-                    print(f"✅ [步骤2] 成功点击搜索按钮")
+                    logger.debug("✅ [步骤2] 成功点击搜索按钮")
                 except Exception as e:
-                    print(f"⚠️  [步骤2] 搜索按钮点击失败: {e}")
-                    print(f"🔄 [备用方案] 使用回车键搜索")
+                    logger.debug("⚠️  [步骤2] 搜索按钮点击失败: %s", e)
+                    logger.info("🔄 [备用方案] 使用回车键搜索")
                     await self._page.keyboard.press('Enter')
             else:
-                print(f"⌨️  [步骤2] 使用回车键执行搜索")
+                logger.debug("⌨️  [步骤2] 使用回车键执行搜索")
                 await self._page.keyboard.press('Enter')
             
-            print(f"⏳ [步骤3] 等待搜索结果加载...")
-            await asyncio.sleep(3)
+            logger.debug("⏳ [步骤3] 等待搜索结果加载...")
+            await self.wait_for_results(site)
             
             # 检查是否有搜索结果
             current_url = self._page.url
-            print(f"📍 [结果] 当前页面: {current_url}")
-            print(f"✅ [完成] 搜索任务执行完毕: {search_query}")
+            logger.debug("📍 [结果] 当前页面: %s", current_url)
+            logger.info("✅ [完成] 搜索任务执行完毕: %s", search_query)
             
         except Exception as e:
-            print(f"❌ [错误] 搜索失败: {e}")
+            logger.error("❌ [错误] 搜索失败: %s", e)
             raise
     
-    async def detect_login_mode(self):
-        """检测当前登录模式并切换到密码登录"""
-        print("🔍 [分析] 检测登录页面模式...")
-        
-        # 检查是否有模式切换按钮
-        mode_switch_selectors = [
-            # 常见的切换到密码登录的按钮
-            "button:contains('密码登录')",
-            "a:contains('密码登录')", 
-            "span:contains('密码登录')",
-            "div:contains('密码登录')",
-            "[data-testid*='password']",
-            ".password-login",
-            ".pwd-login",
-            "#password-login",
-            "button:contains('账号密码登录')",
-            "a:contains('账号密码登录')",
-            # 英文版本
-            "button:contains('Password')",
-            "a:contains('Password')",
-            "button:contains('Sign in with password')",
-            # 通用切换按钮
-            ".tab:contains('密码')",
-            ".switch-mode",
-            ".login-tab:contains('密码')"
-        ]
+    async def wait_for_results(self, site: Optional[SiteAdapter], page: Optional["Page"] = None):
+        """等待搜索结果条目出现；网站没有结果选择器或等待超时时退回固定等待"""
+        page = page or self._page
+        if site and site.result_selector:
+            try:
+                await page.waitForSelector(site.result_selector, {'timeout': self.browser_config.element_timeout_ms})
+                return
+            except Exception:
+                logger.debug("⚠️  [等待] 未等到搜索结果 %s，改为固定等待", site.result_selector)
+        await asyncio.sleep(self.browser_config.result_wait_ms / 1000)
+    
+    async def extract_search_results(self, site: Optional[SiteAdapter], max_results: Optional[int] = None,
+                                     pages: Optional[int] = None, page: Optional["Page"] = None) -> List[SearchResult]:
+        """
+        从当前搜索结果页提取结构化结果（标题、链接、摘要、排名）
         
-        # 检查当前是否已经在密码登录模式
-        password_input_exists = False
+        每页一次 evaluate，数量达到 max_results 即停止；pages>1 时点击下一页继续提取
+        """
+        if not site or not site.result_selector:
+            logger.warning("⚠️  [提取] 网站没有配置结果选择器，跳过结果提取")
+            return []
+        max_results = self.browser_config.max_results if max_results is None else max_results
+        pages = pages or self.browser_config.result_pages
+        page = page or self._page
+        
+        results: List[SearchResult] = []
+        for page_index in range(pages):
+            remaining = max_results - len(results)
+            if remaining <= 0:
+                break
+            items = await page.evaluate(EXTRACT_RESULTS_JS, {
+                'itemSelector': site.result_selector,
+                'titleSelector': site.result_title_selector,
+                'linkSelector': site.result_link_selector,
+                'snippetSelector': site.result_snippet_selector,
+                'maxResults': remaining,
+                'startRank': len(results) + 1,
+                'maxSnippetLength': RESULT_SNIPPET_MAX_LENGTH
+            })
+            results.extend(SearchResult.from_dict(item, site=site.name) for item in items)
+            logger.debug("📄 [提取] 第%s页提取到 %s 条结果", page_index+1, len(items))
+            if page_index + 1 < pages and len(results) < max_results:
+                if not await self.goto_next_results_page(site, page):
+                    break
+        return results
+    
+    async def goto_next_results_page(self, site: SiteAdapter, page: Optional["Page"] = None) -> bool:
+        """点击下一页并等待结果加载，找不到下一页时返回False"""
+        page = page or self._page
+        selector = site.next_page_selector
+        if not selector:
+            matches = await self.find_by_text(NEXT_PAGE_TEXTS, max_results=1, page=page)
+            selector = matches[0]['ref'] if matches else None
+        if not selector:
+            logger.debug("ℹ️  [翻页] 没有找到下一页")
+            return False
         try:
-            await self._page.waitForSelector("input[type='password']", {'timeout': 2000})
-            password_input_exists = True
-            print("✅ [检测] 当前已经是密码登录模式")
-        except:
-            print("⚠️  [检测] 当前不是密码登录模式，尝试切换...")
-        
-        if not password_input_exists:
-            # 尝试点击切换按钮
-            for selector in mode_switch_selectors:
-                try:
-                    print(f"🔄 [尝试] 查找切换按钮: {selector}")
-                    # 使用JavaScript查找包含文本的元素
-                    if "contains" in selector:
-                        text = selector.split("'")[1]
-                        element_type = selector.split(":")[0]
-                        elements = await self._page.evaluate(f'''
-                            () => {{
-                                const elements = Array.from(document.querySelectorAll('{element_type}'));
-                                return elements.filter(el => el.textContent.includes('{text}'));
-                            }}
-                        ''')
-                        if elements:
-                            await self._page.evaluate(f'''
-                                () => {{
-                                    const elements = Array.from(document.querySelectorAll('{element_type}'));
-                                    const target = elements.find(el => el.textContent.includes('{text}'));
-                                    if (target) target.click();
-                                }}
-                            ''')
-                            print(f"✅ [成功] 点击切换按钮: {text}")
-                            await asyncio.sleep(2)  # 等待页面更新
-                            break
-                    else:
-                        await self._page.waitForSelector(selector, {'timeout': 1000})
-                        await self._page.click(selector)
-                        print(f"✅ [成功] 点击切换按钮: {selector}")
-                        await asyncio.sleep(2)  # 等待页面更新
-                        break
-                except Exception as e:
-                    print(f"❌ [失败] 切换按钮未找到: {selector}")
-                    continue
-            
-            # 再次检查是否成功切换到密码模式
+            await page.click(selector)
+        except Exception as e:
+            logger.warning("⚠️  [翻页] 点击下一页失败: %s", e)
+            return False
+        await self.wait_for_results(site, page)
+        return True
+    
+    async def analyze_login_page(self) -> Dict:
+        """
+        一次 evaluate 分析登录表单：登录模式、密码登录选项卡、用户名框、密码框和提交按钮
+        
+        返回的元素都是 [data-agent-ref="..."] 形式的稳定选择器，找不到时为None
+        """
+        site = self.sites.for_url(self._page.url)
+        tab_texts = (site.password_tab_texts if site else []) + DEFAULT_PASSWORD_TAB_TEXTS
+        return await self._page.evaluate(LOGIN_ANALYZER_JS, {
+            'refAttribute': REF_ATTRIBUTE,
+            'passwordTabTexts': tab_texts,
+            'maxResults': 5,
+            'maxNodes': TEXT_SEARCH_MAX_NODES,
+            'maxTextLength': TEXT_SEARCH_MAX_TEXT_LENGTH
+        })
+    
+    def typing_strategy_for(self, site: Optional[SiteAdapter]) -> str:
+        """网站适配器指定的输入方式优先，否则使用全局配置"""
+        if site and site.typing_strategy:
+            return site.typing_strategy
+        return self.browser_config.typing_strategy
+    
+    async def fill_input(self, selector: str, text: str, site: Optional[SiteAdapter] = None,
+                         page: Optional["Page"] = None):
+        """
+        清空输入框并填入文字（page 为空时使用主页面）
+        
+        instant: 一次 evaluate 设置值并派发 input/change 事件
+        insertText: 聚焦选中后用一次 Input.insertText 插入（像输入法提交）
+        human: 逐字按键，带 typing_delay_ms 间隔，用于对机器人敏感的网站
+        前两种方式的耗时与文字长度无关
+        """
+        page = page or self._page
+        strategy = self.typing_strategy_for(site)
+        if strategy == "instant":
+            if await page.evaluate(SET_INPUT_VALUE_JS, selector, text):
+                return
+        elif strategy == "insertText":
+            if await page.evaluate(FOCUS_AND_SELECT_JS, selector):
+                await page.keyboard.sendCharacter(text)
+                return
+        
+        # human 方式，或者前两种方式没找到元素（或元素不是 input/textarea）时逐字输入
+        await page.click(selector)
+        await page.keyboard.down('Control')
+        await page.keyboard.press('KeyA')
+        await page.keyboard.up('Control')
+        await page.type(selector, text, {'delay': self.browser_config.typing_delay_ms})
+    
+    async def detect_login_mode(self) -> Dict:
+        """检测当前登录模式并切换到密码登录，返回登录表单分析结果"""
+        logger.debug("🔍 [分析] 检测登录页面模式...")
+        
+        analysis = await self.analyze_login_page()
+        if analysis['mode'] == 'password':
+            logger.info("✅ [检测] 当前已经是密码登录模式")
+            return analysis
+        
+        logger.info("⚠️  [检测] 当前不是密码登录模式（%s），尝试切换...", analysis['mode'])
+        for tab in analysis['passwordTabs']:
             try:
-                await self._page.waitForSelector("input[type='password']", {'timeout': 3000})
-                print("✅ [成功] 已切换到密码登录模式")
-            except:
-                print("⚠️  [警告] 未能切换到密码模式，将尝试通用登录策略")
+                logger.debug("🔄 [尝试] 点击切换选项卡: %s", tab['text'])
+                await self._page.click(tab['ref'])
+                await self._page.waitForSelector("input[type='password']", {'visible': True, 'timeout': 3000})
+                logger.info("✅ [成功] 已切换到密码登录模式")
+                return await self.analyze_login_page()
+            except Exception:
+                logger.warning("❌ [失败] 点击后未出现密码框: %s", tab['text'])
+        
+        logger.warning("⚠️  [警告] 未能切换到密码模式，将尝试通用登录策略")
+        return analysis
     
     async def login_to_website(self, username: str, password: str):
         """登录网站"""
         try:
             # 确保浏览器连接正常
             await self.ensure_browser_ready()
-            print(f"🔐 [登录任务] 开始登录，用户名: {username}")
+            logger.info("🔐 [登录任务] 开始登录，用户名: %s", username)
             
-            # 首先检测并切换登录模式
-            await self.detect_login_mode()
+            # 首先检测并切换登录模式，同时拿到表单中各元素的句柄
+            started = time.monotonic()
+            analysis = await self.detect_login_mode()
+            elapsed = time.monotonic() - started
+            for key, element_type in (("username", "用户名输入框"), ("password", "密码输入框"), ("submit", "登录按钮")):
+                if analysis[key]:
+                    _selector_lookups.inc(element=element_type, outcome="analyzer")
+                    record_selector(element_type, ["login_analyzer"], analysis[key], elapsed)
+            site = self.sites.for_url(self._page.url)
             
             # 扩展的用户名选择器（包括手机号、邮箱等）
             username_selectors = [
@@ -516,75 +696,64 @@ class BrowserController:
             login_button_selectors = [
                 "button[type='submit']",
                 "input[type='submit']",
-                "button:contains('登录')",
-                "button:contains('Login')",
-                "button:contains('登陆')",
-                "button:contains('Sign in')",
-                "button:contains('SIGN IN')",
                 ".btn-login",
                 "#login-button",
                 ".login-btn",
                 ".submit-btn"
             ]
             
-            print("⏳ [步骤0] 等待页面稳定...")
-            await asyncio.sleep(2)
-            
-            # 查找并填写用户名
-            print("👤 [步骤1] 查找用户名输入框")
-            username_input = await self.find_element_with_debug(username_selectors, "用户名输入框")
+            # 查找并填写用户名（分析结果缺失时才逐个尝试选择器）
+            logger.debug("👤 [步骤1] 查找用户名输入框")
+            username_input = analysis['username'] or await self.find_element_with_debug(username_selectors, "用户名输入框")
             
-            print(f"⌨️  [步骤1] 填写用户名: {username}")
-            await self._page.click(username_input)
-            await self._page.keyboard.down('Control')
-            await self._page.keyboard.press('KeyA')
-            await self._page.keyboard.up('Control')
-            await self._page.type(username_input, username)
-            print("✅ [步骤1] 用户名输入完成")
+            logger.debug("⌨️  [步骤1] 填写用户名: %s", username)
+            await self.fill_input(username_input, username, site)
+            logger.debug("✅ [步骤1] 用户名输入完成")
             
             # 查找并填写密码
-            print("🔑 [步骤2] 查找密码输入框")
-            password_input = await self.find_element_with_debug(password_selectors, "密码输入框")
+            logger.debug("🔑 [步骤2] 查找密码输入框")
+            password_input = analysis['password'] or await self.find_element_with_debug(password_selectors, "密码输入框")
             
-            print(f"⌨️  [步骤2] 填写密码: {'*' * len(password)}")
-            await self._page.click(password_input)
-            await self._page.keyboard.down('Control')
-            await self._page.keyboard.press('KeyA')
-            await self._page.keyboard.up('Control')
-            await self._page.type(password_input, password)
-            print("✅ [步骤2] 密码输入完成")
+            logger.debug("⌨️  [步骤2] 填写密码: %s位", len(password))
+            await self.fill_input(password_input, password, site)
+            logger.debug("✅ [步骤2] 密码输入完成")
             
             # 查找并点击登录按钮
-            print("🔘 [步骤3] 查找登录按钮")
+            logger.debug("🔘 [步骤3] 查找登录按钮")
             try:
-                login_button = await self.find_element_with_debug(login_button_selectors, "登录按钮", 5000)
-                print(f"🖱️  [步骤3] 点击登录按钮: {login_button}")
+                login_button = analysis['submit']
+                if not login_button:
+                    # CSS选择器不能按文字匹配，先按按钮文字找，再尝试常见的选择器
+                    matches = await self.find_by_text(LOGIN_BUTTON_TEXTS, max_results=1, exact=True)
+                    login_button = matches[0]['ref'] if matches else \
+                        await self.find_element_with_debug(login_button_selectors, "登录按钮", 5000)
+                logger.debug("🖱️  [步骤3] 点击登录按钮: %s", login_button)
                 await self._page.click(login_button)
-                print("✅ [步骤3] 成功点击登录按钮")
+                logger.debug("✅ [步骤3] 成功点击登录按钮")
             except Exception as e:
-                print(f"⚠️  [步骤3] 找不到登录按钮: {e}")
-                print("🔄 [备用方案] 使用回车键登录")
+                logger.debug("⚠️  [步骤3] 找不到登录按钮: %s", e)
+                logger.info("🔄 [备用方案] 使用回车键登录")
                 await self._page.keyboard.press('Enter')
             
-            print("⏳ [步骤4] 等待登录处理...")
+            logger.debug("⏳ [步骤4] 等待登录处理...")
             await asyncio.sleep(3)
             
             # 检查登录结果
             current_url = self._page.url
             page_title = await self._page.title()
-            print(f"📍 [结果] 当前页面: {current_url}")
-            print(f"📄 [结果] 页面标题: {page_title}")
+            logger.debug("📍 [结果] 当前页面: %s", current_url)
+            logger.debug("📄 [结果] 页面标题: %s", page_title)
             
             # 简单检查是否登录成功（URL或标题变化）
             if "login" not in current_url.lower() and "signin" not in current_url.lower():
-                print("✅ [成功] 登录可能成功（已离开登录页面）")
+                logger.info("✅ [成功] 登录可能成功（已离开登录页面）")
             else:
-                print("⚠️  [警告] 仍在登录页面，请检查登录结果")
+                logger.warning("⚠️  [警告] 仍在登录页面，请检查登录结果")
             
-            print("✅ [完成] 登录任务执行完毕")
+            logger.info("✅ [完成] 登录任务执行完毕")
             
         except Exception as e:
-            print(f"❌ [错误] 登录失败: {e}")
+            logger.error("❌ [错误] 登录失败: %s", e)
             raise
     
     async def perform_search_task(self, task_info: Dict):
@@ -606,69 +775,456 @@ class BrowserController:
             await self.search_in_website(website_url, search_query)
             
             # 保持浏览器打开一段时间让用户查看结果
-            print("搜索任务完成，浏览器将保持打开状态10秒...")
+            logger.info("搜索任务完成，浏览器将保持打开状态10秒...")
             await asyncio.sleep(10)
             
         except Exception as e:
-            print(f"执行搜索任务失败: {e}")
+            logger.error("执行搜索任务失败: %s", e)
             raise
         finally:
             # 关闭浏览器
             await self.close_browser()
     
-    async def perform_task(self, task_info: Dict):
-        """执行各种类型的任务"""
+    async def perform_task(self, task_info: Dict) -> TaskResult:
+        """
+        执行各种类型的任务（同时执行的任务数受 max_concurrent_tasks 限制）
+        
+        返回 TaskResult；搜索任务会附带从结果页提取的结构化结果。
+        相同任务（意图、网站、搜索词、账号一致）的并发请求只执行一次并共享结果；
+        启用结果缓存时，搜索任务先查缓存，命中时不启动浏览器
+        """
+        started = time.monotonic()
+        status = "error"
+        # 调用方没有设置关联ID时为这个任务生成一个，任务中的所有日志都带上它
+        with correlation(get_correlation_id() or None):
+            try:
+                result = await self._task_flight.do(task_fingerprint(task_info),
+                                                    lambda: self._perform_cached(task_info))
+                status = "cached" if result.cached else result.status
+                return result.copy()
+            finally:
+                _task_latency.observe(time.monotonic() - started, intent=task_info.get("intent") or "",
+                                      site=self._site_label(task_info), status=status)
+    
+    def _site_label(self, task_info: Dict) -> str:
+        """指标中的网站标签：只用已知网站名，避免任意域名造成标签爆炸"""
+        intent = task_info.get("intent")
+        if intent in ("plan", "multi_search"):
+            return intent
+        site = self.sites.for_url(task_info.get("website_url") or "")
+        return site.name if site else "other"
+    
+    async def _perform_cached(self, task_info: Dict) -> TaskResult:
+        site = self.sites.for_url(task_info.get("website_url") or "")
+        query = task_info.get("search_query")
+        ttl = self._cache_ttl(site)
+        if task_info.get("intent") == "open_and_search" and ttl is not None and query:
+            return await self.result_cache.get_or_fetch(
+                site.name, query, lambda: self._run_task(task_info), ttl=ttl)
+        return await self._run_task(task_info)
+    
+    def _cache_ttl(self, site: Optional[SiteAdapter]) -> Optional[float]:
+        """网站搜索结果的缓存新鲜期；未启用缓存或该网站不缓存时返回None"""
+        if self.result_cache is None or site is None:
+            return None
+        ttl = self.config.cache.ttl_seconds if site.cache_ttl is None else site.cache_ttl
+        return ttl if ttl > 0 else None
+    
+    async def _run_task(self, task_info: Dict) -> TaskResult:
+        _task_queue_depth.inc()
         try:
-            intent = task_info.get("intent")
-            website_url = task_info.get("website_url")
-            
-            print(f"🎯 [任务开始] 意图: {intent}")
-            print(f"🌐 [任务参数] 网站: {website_url}")
+            await self._task_semaphore.acquire()
+        finally:
+            _task_queue_depth.dec()
+        try:
+            try:
+                async with self._active_work():
+                    return await self._perform_recorded(task_info)
+            finally:
+                self.watchdog.record_task()
+                # 只在没有其他任务或后台刷新使用浏览器时做回收
+                if self._active_tasks == 0 and self.watchdog.enabled:
+                    await self.run_watchdog()
+        finally:
+            self._task_semaphore.release()
+    
+    @asynccontextmanager
+    async def _active_work(self) -> AsyncIterator[None]:
+        """一段使用浏览器的工作（任务或后台刷新）：看门狗回收期间先等待，执行期间计入活动数"""
+        await self._watchdog_idle.wait()
+        self._active_tasks += 1
+        _tasks_running.set(self._active_tasks)
+        try:
+            yield
+        finally:
+            self._active_tasks -= 1
+            _tasks_running.set(self._active_tasks)
+    
+    async def _perform_recorded(self, task_info: Dict) -> TaskResult:
+        """设置了录制目录时录制这次执行（调用方已开始录制时，如回放，不再重复录制）"""
+        directory = self.config.recording.directory
+        if not directory or current_recorder() is not None:
+            return await self._perform_routed(task_info)
+        
+        recorder = TaskRecorder(task_info, capture_har=self.config.recording.capture_har)
+        recorder.activate()
+        result = None
+        error = None
+        try:
+            result = await self._perform_routed(task_info)
+            return result
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            recorder.deactivate()
+            try:
+                path = await recorder.save(directory, result.to_dict() if result else None, error)
+                logger.info("📼 [录制] 已保存任务录制: %s", path)
+            except Exception as e:
+                logger.warning("⚠️  [录制] 保存任务录制失败: %s", e)
+    
+    async def _perform_routed(self, task_info: Dict) -> TaskResult:
+        if self.context_pool is not None:
+            return await self._perform_isolated(lambda: self._perform_task(task_info))
+        return await self._perform_task(task_info)
+    
+    async def _perform_isolated(self, work: Callable[[], Awaitable[TaskResult]]) -> TaskResult:
+        """在一个独立的隐身上下文中执行 work，结束后销毁该上下文"""
+        await self.ensure_browser_ready()
+        lease = await self.context_pool.acquire(self._browser)
+        page_token = _task_page.set(lease.page)
+        context_token = _task_context.set(lease.context)
+        try:
+            return await work()
+        finally:
+            _task_page.reset(page_token)
+            _task_context.reset(context_token)
+            await self.context_pool.release(lease)
+    
+    async def new_page(self) -> "Page":
+        """打开一个额外的页面：incognito 隔离时放在当前任务的隐身上下文中，与其他任务隔离"""
+        context = _task_context.get()
+        page = await (context or self._browser).newPage()
+        await self.prepare_page(page)
+        recorder = current_recorder()
+        if recorder is not None:
+            recorder.attach(page)
+        return page
+    
+    async def run_watchdog(self):
+        """
+        采样内存，按看门狗的判断回收主页面或关闭浏览器（下一个任务会重新启动）
+        
+        执行期间新的任务和后台刷新等待，回收前再确认没有进行中的工作
+        """
+        self._watchdog_idle.clear()
+        try:
+            action, reason, detail = await self.watchdog.check(self._browser, self._page)
+            if self._active_tasks:
+                logger.debug("ℹ️  [看门狗] 有进行中的任务，跳过本次回收")
+            elif action == RESTART_BROWSER:
+                logger.info("♻️  [看门狗] %s，重启浏览器", detail)
+                await self.close_browser()
+                self.watchdog.browser_restarted(reason)
+            elif action == RECYCLE_PAGE:
+                logger.info("♻️  [看门狗] %s，更换新页面", detail)
+                await self.recycle_page()
+                self.watchdog.page_recycled(reason)
+        except Exception as e:
+            logger.warning("⚠️  [看门狗] 内存检查失败: %s", e)
+        finally:
+            self._watchdog_idle.set()
+    
+    async def recycle_page(self):
+        """打开一个新的主页面并关闭旧页面，释放旧页面累积的内存"""
+        old_page = self._page
+        page = await self._browser.newPage()
+        await self.prepare_page(page)
+        self._page = page
+        if old_page is not None:
+            try:
+                await old_page.close()
+            except Exception:
+                pass
+    
+    async def _perform_task(self, task_info: Dict) -> TaskResult:
+        started = time.monotonic()
+        intent = task_info.get("intent")
+        website_url = task_info.get("website_url") or ""
+        result = TaskResult(intent=intent, website_url=website_url)
+        try:
+            logger.info("🎯 [任务开始] 意图: %s", intent)
             
-            if not website_url:
-                raise ValueError("缺少必要的参数: website_url")
+            if intent == "plan":
+                steps = task_info.get("steps") or []
+                logger.debug("🧩 [任务参数] 共%s步", len(steps))
+                if not steps:
+                    raise ValueError("多步任务缺少步骤")
+            elif intent == "multi_search":
+                websites = task_info.get("websites") or []
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("🌐 [任务参数] 网站: %s",
+                                 [website.get('website_name') or website.get('website_url') for website in websites])
+                if not websites:
+                    raise ValueError("多网站搜索缺少网站")
+            else:
+                logger.debug("🌐 [任务参数] 网站: %s", website_url)
+                if not website_url:
+                    raise ValueError("缺少必要的参数: website_url")
             
             # 确保浏览器处于可用状态
-            print("🚀 [初始化] 准备浏览器...")
+            logger.debug("🚀 [初始化] 准备浏览器...")
             await self.ensure_browser_ready()
+            recorder = current_recorder()
+            if recorder is not None:
+                recorder.attach(self._page)
             
-            # 打开网站
-            await self.goto_website(website_url)
-            
-            # 根据意图执行不同操作
-            print(f"🧠 [思考] 根据意图 '{intent}' 选择执行策略...")
-            
-            if intent == "open_website":
-                print("✅ [完成] 网站打开任务完成")
-                
-            elif intent == "open_and_search":
-                search_query = task_info.get("search_query")
-                print(f"🔍 [参数] 搜索内容: {search_query}")
-                if not search_query:
-                    raise ValueError("搜索任务缺少搜索内容")
-                await self.search_in_website(website_url, search_query)
-                
-            elif intent in ["login", "open_and_login"]:
-                username = task_info.get("username")
-                password = task_info.get("password")
-                print(f"👤 [参数] 用户名: {username}")
-                print(f"🔐 [参数] 密码: {'*' * len(password) if password else 'None'}")
-                if not username or not password:
-                    raise ValueError("登录任务缺少用户名或密码")
-                await self.login_to_website(username, password)
-                
+            if intent == "plan":
+                await self._execute_plan(steps, result)
+            elif intent == "multi_search":
+                await self._execute_multi_search(task_info, result)
             else:
-                raise ValueError(f"不支持的任务类型: {intent}")
+                await self._execute_step(task_info, result)
             
             # 保持浏览器打开
-            print("🎉 [完成] 任务执行成功！")
-            print("💡 [提示] 浏览器将保持打开状态，可以继续手动操作")
-            print("💡 [提示] 或在系统中输入新的指令执行其他任务")
+            if result.status == "ok":
+                logger.info("🎉 [完成] 任务执行成功！")
+            logger.debug("💡 [提示] 浏览器将保持打开状态，可以继续手动操作")
+            logger.debug("💡 [提示] 或在系统中输入新的指令执行其他任务")
             
         except Exception as e:
-            print(f"❌ [失败] 执行任务失败: {e}")
-            print("🔍 [建议] 请检查网络连接、网站可用性或指令格式")
+            logger.error("❌ [失败] 执行任务失败: %s", e)
+            logger.info("🔍 [建议] 请检查网络连接、网站可用性或指令格式")
             raise
+        
+        result.final_url = self._page.url if self._page else ""
+        result.elapsed = time.monotonic() - started
+        return result
+    
+    async def _execute_plan(self, steps: List[Dict], result: TaskResult):
+        """
+        在同一个页面中依次执行多步计划，后面的步骤复用前面步骤的导航状态
+        
+        某一步失败时停止执行，计划和该步骤标记为 error，已完成步骤的结果保留
+        """
+        for index, step in enumerate(steps, 1):
+            logger.debug("📌 [计划] 第%s/%s步: %s @ %s", index, len(steps), step.get('intent'), step.get('website_name') or step.get('website_url'))
+            step_started = time.monotonic()
+            step_result = TaskResult(intent=step.get("intent"), website_url=step.get("website_url") or "")
+            result.steps.append(step_result)
+            try:
+                await self._execute_step(step, step_result, reuse_page=True)
+            except Exception as e:
+                logger.warning("❌ [计划] 第%s步失败: %s，跳过后续步骤", index, e)
+                step_result.status = "error"
+                step_result.error = str(e)
+                result.status = "error"
+                result.error = f"第{index}步失败: {e}"
+                break
+            finally:
+                step_result.final_url = self._page.url if self._page else ""
+                step_result.elapsed = time.monotonic() - step_started
+        result.results = [item for step_result in result.steps for item in step_result.results]
+    
+    async def _execute_multi_search(self, task_info: Dict, result: TaskResult):
+        """
+        多网站并行搜索：每个网站一个独立页面同时搜索，再合并结果
+        
+        总耗时约等于最慢的网站；同时打开的页面数受 max_parallel_pages 限制。
+        单个网站失败只记录在它自己的结果中，全部失败时整个任务标记为 error
+        """
+        query = task_info.get("search_query")
+        logger.debug("🔍 [参数] 搜索内容: %s", query)
+        if not query:
+            raise ValueError("搜索任务缺少搜索内容")
+        websites = [website.get("website_url") for website in task_info.get("websites") or []]
+        limit = asyncio.Semaphore(self.config.execution.max_parallel_pages)
+        
+        async def search(website_url: str) -> TaskResult:
+            async with limit:
+                return await self._search_site(website_url, query)
+        
+        logger.debug("⚡ [并行搜索] 同时在%s个网站搜索...", len(websites))
+        result.steps = list(await asyncio.gather(*(search(url) for url in websites)))
+        for site_result in result.steps:
+            name = site_result.website_url
+            if site_result.status == "ok":
+                source = "缓存" if site_result.cached else f"{site_result.elapsed:.2f}秒"
+                logger.info("📊 [并行搜索] %s: %s条结果（%s）", name, len(site_result.results), source)
+            else:
+                logger.warning("📊 [并行搜索] %s: 失败 %s", name, site_result.error)
+        result.results = merge_search_results([site_result.results for site_result in result.steps])
+        if all(site_result.status != "ok" for site_result in result.steps):
+            result.status = "error"
+            result.error = "所有网站搜索失败"
+    
+    async def _search_site(self, website_url: str, query: str) -> TaskResult:
+        """在独立页面中搜索一个网站（启用缓存时先查缓存）"""
+        site = self.sites.for_url(website_url)
+        ttl = self._cache_ttl(site)
+        if ttl is not None:
+            return await self.result_cache.get_or_fetch(
+                site.name, query, lambda: self._search_in_new_page(site, website_url, query), ttl=ttl,
+                refresher=lambda: self._refresh_search(site, website_url, query))
+        return await self._search_in_new_page(site, website_url, query)
+    
+    async def _refresh_search(self, site: SiteAdapter, website_url: str, query: str) -> TaskResult:
+        """
+        后台刷新一个网站的搜索结果缓存
+        
+        运行在干净的上下文中（没有当前任务的隐身上下文和录制器），incognito 隔离时租用自己的隐身上下文；
+        刷新不经过 _run_task，单独计入活动数，看门狗不会在刷新期间关闭浏览器
+        """
+        async with self._active_work():
+            if self.context_pool is not None:
+                return await self._perform_isolated(lambda: self._search_in_new_page(site, website_url, query))
+            await self.ensure_browser_ready()
+            return await self._search_in_new_page(site, website_url, query)
+    
+    async def _search_in_new_page(self, site: Optional[SiteAdapter], website_url: str, query: str) -> TaskResult:
+        """
+        新开一个页面搜索并提取结果，结束后关闭页面；失败记录在返回值中，不抛出异常
+        
+        搜索方式与单网站搜索一致：search_strategy 为 url 且有搜索URL模板时直接打开结果页，
+        否则在首页输入搜索；网站没有搜索框选择器时退回搜索URL模板
+        """
+        started = time.monotonic()
+        result = TaskResult(intent="open_and_search", website_url=website_url)
+        page = None
+        try:
+            page = await self.new_page()
+            search_url = site.search_url(query) if site else None
+            use_form = bool(site and site.search_input) and (
+                self.browser_config.search_strategy != "url" or not search_url)
+            if search_url and not use_form:
+                with record_step("navigate", url=search_url):
+                    await page.goto(search_url, self._goto_options())
+            elif use_form:
+                with record_step("navigate", url=website_url):
+                    await page.goto(website_url, self._goto_options())
+                    await self.wait_until_ready(website_url, page)
+                with record_step("search", site=site.name):
+                    await self.fill_input(site.search_input, query, site, page)
+                    if site.search_button:
+                        await page.click(site.search_button)
+                    else:
+                        await page.keyboard.press('Enter')
+            else:
+                raise ValueError(f"没有 {website_url} 的搜索配置")
+            with record_step("wait_for_results", site=site.name):
+                await self.wait_for_results(site, page)
+            with record_step("extract", site=site.name):
+                result.results = await self.extract_search_results(site, page=page)
+            result.final_url = page.url
+        except Exception as e:
+            result.status = "error"
+            result.error = str(e)
+        finally:
+            result.elapsed = time.monotonic() - started
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+        return result
+    
+    async def _execute_step(self, task_info: Dict, result: TaskResult, reuse_page: bool = False):
+        """
+        执行单个操作；reuse_page 为 True 时，页面已在目标位置则跳过导航
+        """
+        intent = task_info.get("intent")
+        website_url = task_info.get("website_url")
+        if not website_url:
+            raise ValueError("缺少必要的参数: website_url")
+        site = self.sites.for_url(website_url)
+        navigate = self._navigate if reuse_page else self.goto_website
+        
+        # 根据意图执行不同操作
+        logger.debug("🧠 [思考] 根据意图 '%s' 选择执行策略...", intent)
+        
+        if intent == "open_website":
+            with record_step("navigate", url=website_url):
+                await navigate(website_url)
+            logger.info("✅ [完成] 网站打开任务完成")
+            
+        elif intent == "open_and_search":
+            search_query = task_info.get("search_query")
+            logger.debug("🔍 [参数] 搜索内容: %s", search_query)
+            if not search_query:
+                raise ValueError("搜索任务缺少搜索内容")
+            search_url = site.search_url(search_query) if site else None
+            if self.browser_config.search_strategy == "url" and search_url:
+                # 直接打开搜索结果页，省去首页加载和输入
+                logger.debug("⚡ [策略] 直接打开搜索结果页")
+                with record_step("navigate", url=search_url):
+                    await self.goto_website(search_url)
+                with record_step("wait_for_results", site=site.name):
+                    await self.wait_for_results(site)
+            else:
+                if reuse_page and await self._has_search_input(site):
+                    # 当前页面就在该网站且有搜索框（如登录后的首页），直接搜索
+                    logger.debug("⏭️  [导航] 当前页面已有%s搜索框，跳过导航", site.name)
+                else:
+                    with record_step("navigate", url=website_url):
+                        await navigate(website_url)
+                with record_step("search", site=site.name if site else ""):
+                    await self.search_in_website(website_url, search_query)
+            try:
+                with record_step("extract", site=site.name if site else ""):
+                    result.results = await self.extract_search_results(site)
+            except Exception as e:
+                # 提取失败不影响搜索本身
+                logger.warning("⚠️  [提取] 搜索结果提取失败: %s", e)
+            
+        elif intent in ["login", "open_and_login"]:
+            username = task_info.get("username")
+            password = task_info.get("password")
+            logger.debug("👤 [参数] 用户名: %s", username)
+            logger.debug("🔐 [参数] 密码: %s位", len(password or ""))
+            if not username or not password:
+                raise ValueError("登录任务缺少用户名或密码")
+            # 网站有独立登录页时直接打开登录页
+            login_url = site.login_url if site and site.login_url else website_url
+            with record_step("navigate", url=login_url):
+                await navigate(login_url)
+            with record_step("login", site=site.name if site else ""):
+                await self.login_to_website(username, password)
+            
+        else:
+            raise ValueError(f"不支持的任务类型: {intent}")
+    
+    async def _navigate(self, url: str):
+        """页面已在目标URL时跳过导航，否则同 goto_website"""
+        if self._page is not None and same_page_url(self._page.url, url):
+            logger.debug("⏭️  [导航] 已在目标页面，跳过导航: %s", url)
+            return
+        await self.goto_website(url)
+    
+    async def _has_search_input(self, site: Optional[SiteAdapter]) -> bool:
+        """当前页面是否属于该网站且存在搜索框"""
+        if self._page is None or site is None or not site.search_input:
+            return False
+        if self.sites.for_url(self._page.url) is not site:
+            return False
+        try:
+            return await self._page.querySelector(site.search_input) is not None
+        except Exception:
+            return False
+
+def same_page_url(current: str, target: str) -> bool:
+    """
+    两个URL是否指向同一页面（忽略协议、www前缀、末尾斜杠和锚点）
+    """
+    def normalize(url: str):
+        parsed = urllib.parse.urlparse(url.strip())
+        host = (parsed.hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        return host, parsed.path.rstrip("/"), parsed.query
+    if not current or not target:
+        return False
+    return normalize(current) == normalize(target)
 
 # 便捷函数
 async def search_in_website(url: str, search_query: str):
@@ -6,12 +6,9 @@ import asyncio
 import os
 import time
 from pyppeteer import launch
-from dotenv import load_dotenv
+from config import get_env
 
-# 加载环境变量
-load_dotenv()
-
-CHROME_PATH = os.getenv("CHROME_PATH", r"C:\Program Files\Google\Chrome\Application\chrome.exe")
+CHROME_PATH = get_env("CHROME_PATH", r"C:\Program Files\Google\Chrome\Application\chrome.exe")
 
 async def test_config_1():
     """测试配置1: 最小参数"""
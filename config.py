@@ -0,0 +1,419 @@
+"""
+统一的配置加载入口
+
+所有可调参数集中在 AppConfig 中，进程启动时加载一次，再显式传给各组件
+"""
+import os
+from dataclasses import dataclass, field
+from typing import List, Mapping, Optional
+
+_env_loaded = False
+_config: Optional["AppConfig"] = None
+
+# goto 支持的等待策略
+WAIT_UNTIL_OPTIONS = ("load", "domcontentloaded", "networkidle0", "networkidle2")
+
+# 搜索方式：form 在首页输入框中输入并提交，url 直接打开搜索结果页
+SEARCH_STRATEGIES = ("form", "url")
+
+# 输入方式：instant 一次性设置值并派发事件，insertText 模拟输入法一次插入，human 逐字按键
+TYPING_STRATEGIES = ("instant", "insertText", "human")
+
+# 浏览器启动方案：desktop 有界面、大视口，便于本地调试；
+# production 无头、小视口、精简的Chrome参数和单标签页内存上限，用于服务器部署
+BROWSER_PROFILES = ("desktop", "production")
+
+# 各启动方案的默认值（对应的环境变量仍可单独覆盖）
+PROFILE_DEFAULTS = {
+    "desktop": {"headless": False, "viewport": (1920, 1080), "tab_heap_limit_mb": 0,
+                "page_max_tasks": 0, "page_heap_limit_mb": 0, "browser_rss_limit_mb": 0},
+    "production": {"headless": True, "viewport": (1280, 800), "tab_heap_limit_mb": 512,
+                   "page_max_tasks": 50, "page_heap_limit_mb": 256, "browser_rss_limit_mb": 2048},
+}
+
+# 任务隔离方式：shared 所有任务共用主页面；incognito 每个任务一个隐身上下文，任务结束即销毁
+TASK_ISOLATION_MODES = ("shared", "incognito")
+
+# 响应缓存模式：off 关闭；static 缓存并在新鲜期内本地应答静态资源；
+# record 额外保存页面和接口响应，供离线模式使用；offline 所有请求都用缓存应答，未缓存的请求直接中止
+RESPONSE_CACHE_MODES = ("off", "static", "record", "offline")
+
+# 日志级别和输出格式：console 与原来的输出一致，json 每行一条结构化日志
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+LOG_FORMATS = ("console", "json")
+
+# 可拦截的资源类型（与 Chrome 的 resourceType 一致）
+RESOURCE_TYPES = ("document", "stylesheet", "image", "media", "font", "script", "texttrack",
+                  "xhr", "fetch", "eventsource", "websocket", "manifest", "other")
+
+class ConfigError(ValueError):
+    """配置项格式错误"""
+
+def load_env(path: Optional[str] = None):
+    """
+    把 .env 加载到环境变量，整个进程只加载一次
+
+    python-dotenv 未安装时静默跳过，只使用已有的环境变量
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv(path)
+
+def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """读取配置项（首次调用时加载 .env）"""
+    load_env()
+    return os.getenv(name, default)
+
+@dataclass
+class QwenConfig:
+    """千问API调用配置"""
+    api_key: Optional[str] = None
+    base_url: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+    model: str = "qwen-turbo-latest"
+    # 逗号分隔的 "模型:超时秒数"，从便宜到强；为空时只用 model 一层
+    model_tiers: str = ""
+    timeout: float = 15.0
+    max_retries: int = 2
+    hedge_enabled: bool = False
+    breaker_threshold: int = 5
+    breaker_cooldown: float = 30.0
+
+@dataclass
+class BrowserConfig:
+    """浏览器启动与页面操作配置"""
+    profile: str = "desktop"
+    headless: bool = False
+    # 为空时使用 pyppeteer 自带的 Chromium
+    chrome_path: Optional[str] = None
+    launch_timeout_ms: int = 30000
+    launch_retries: int = 3
+    viewport_width: int = 1920
+    viewport_height: int = 1080
+    extra_args: List[str] = field(default_factory=list)
+    # 关闭站点隔离可以减少渲染进程，但会削弱隐身上下文之间的隔离，默认不关闭
+    disable_site_isolation: bool = False
+    # 每个标签页的JS堆上限（MB），0 表示不限制
+    tab_heap_limit_mb: int = 0
+    # 页面导航
+    navigation_timeout_ms: int = 60000
+    wait_until: str = "domcontentloaded"
+    settle_ms: int = 2000
+    # 元素查找与搜索结果等待
+    element_timeout_ms: int = 10000
+    result_wait_ms: int = 3000
+    search_strategy: str = "form"
+    # 网站适配器没有指定输入方式时使用
+    typing_strategy: str = "insertText"
+    # human 输入方式的按键间隔
+    typing_delay_ms: int = 50
+    # 搜索结果提取：每次最多提取的条数和翻页数
+    max_results: int = 10
+    result_pages: int = 1
+    # 拦截规则：按资源类型和URL片段屏蔽请求
+    blocked_resource_types: List[str] = field(default_factory=list)
+    blocked_url_patterns: List[str] = field(default_factory=list)
+
+@dataclass
+class ExecutionConfig:
+    """任务执行的并发控制"""
+    max_concurrent_tasks: int = 1
+    # 多网站并行搜索时同时打开的页面数上限
+    max_parallel_pages: int = 4
+    task_isolation: str = "shared"
+    # incognito 隔离时预热的隐身上下文数
+    context_pool_size: int = 2
+
+@dataclass
+class WatchdogConfig:
+    """页面回收与内存看门狗（各项为 0 表示不检查）"""
+    # 主页面执行多少个任务后换新页面
+    page_max_tasks: int = 0
+    # 主页面JS堆超过该值（MB）时换新页面
+    page_heap_limit_mb: int = 0
+    # Chrome进程树RSS超过该值（MB）时重启浏览器
+    browser_rss_limit_mb: int = 0
+
+@dataclass
+class CacheConfig:
+    """搜索结果缓存（默认关闭）"""
+    enabled: bool = False
+    # 新鲜期，网站适配器中的 cache_ttl 优先
+    ttl_seconds: float = 300.0
+    # 过期后仍可返回旧结果并后台刷新的时间窗口
+    stale_seconds: float = 600.0
+    max_entries: int = 256
+
+@dataclass
+class IntentCacheConfig:
+    """千问解析结果的意图缓存（默认关闭）"""
+    enabled: bool = False
+    # 相似命中所需的最低余弦相似度（0~1），1 表示模板必须完全相同
+    threshold: float = 0.5
+    max_entries: int = 1024
+
+@dataclass
+class ResponseCacheConfig:
+    """请求拦截层的磁盘响应缓存（默认关闭）"""
+    mode: str = "off"
+    directory: str = ".response_cache"
+    # 缓存总大小上限（MB），超出后按最近最少使用淘汰
+    max_size_mb: int = 256
+
+@dataclass
+class LoggingConfig:
+    """结构化日志"""
+    level: str = "INFO"
+    format: str = "console"
+    # 日志文件，为空时输出到标准输出
+    file: str = ""
+    # 找不到元素时输出页面上所有输入框和按钮（需要额外执行脚本，默认关闭）
+    debug_dumps: bool = False
+
+@dataclass
+class MetricsConfig:
+    """Prometheus 指标导出（端口为 0 且文件为空时不导出）"""
+    port: int = 0
+    host: str = "127.0.0.1"
+    # 定时写入的指标文件，供 node_exporter 的 textfile 采集器读取
+    file: str = ""
+    file_interval_seconds: float = 15.0
+
+@dataclass
+class RecordingConfig:
+    """任务录制（directory 为空表示不录制）"""
+    directory: str = ""
+    # 同时录制HAR（含响应体），回放时可以不联网
+    capture_har: bool = False
+
+@dataclass
+class SitesConfig:
+    """网站适配器配置"""
+    # 额外的网站配置JSON文件，会覆盖同名的内置网站
+    config_paths: List[str] = field(default_factory=list)
+
+@dataclass
+class AppConfig:
+    qwen: QwenConfig = field(default_factory=QwenConfig)
+    browser: BrowserConfig = field(default_factory=BrowserConfig)
+    execution: ExecutionConfig = field(default_factory=ExecutionConfig)
+    sites: SitesConfig = field(default_factory=SitesConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    intent_cache: IntentCacheConfig = field(default_factory=IntentCacheConfig)
+    watchdog: WatchdogConfig = field(default_factory=WatchdogConfig)
+    recording: RecordingConfig = field(default_factory=RecordingConfig)
+    response_cache: ResponseCacheConfig = field(default_factory=ResponseCacheConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    logging: LoggingConfig = field(default_factory=LoggingConfig)
+
+class _EnvReader:
+    """带类型校验的环境变量读取"""
+
+    def __init__(self, env: Mapping[str, str]):
+        self.env = env
+
+    def str(self, name: str, default: Optional[str]) -> Optional[str]:
+        value = self.env.get(name)
+        if value is None or value.strip() == "":
+            return default
+        return value.strip()
+
+    def bool(self, name: str, default: bool) -> bool:
+        value = self.str(name, None)
+        if value is None:
+            return default
+        lowered = value.lower()
+        if lowered in ("1", "true", "yes", "on"):
+            return True
+        if lowered in ("0", "false", "no", "off"):
+            return False
+        raise ConfigError(f"{name} 应为 true/false，实际为 {value!r}")
+
+    def int(self, name: str, default: int, minimum: int = 0) -> int:
+        value = self.str(name, None)
+        if value is None:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise ConfigError(f"{name} 应为整数，实际为 {value!r}")
+        if number < minimum:
+            raise ConfigError(f"{name} 不能小于 {minimum}，实际为 {number}")
+        return number
+
+    def float(self, name: str, default: float, minimum: float = 0.0) -> float:
+        value = self.str(name, None)
+        if value is None:
+            return default
+        try:
+            number = float(value)
+        except ValueError:
+            raise ConfigError(f"{name} 应为数字，实际为 {value!r}")
+        if number < minimum:
+            raise ConfigError(f"{name} 不能小于 {minimum}，实际为 {number}")
+        return number
+
+    def list(self, name: str, choices: Optional[tuple] = None) -> List[str]:
+        value = self.str(name, None)
+        if value is None:
+            return []
+        items = [item.strip() for item in value.split(",") if item.strip()]
+        if choices is not None:
+            unknown = [item for item in items if item not in choices]
+            if unknown:
+                raise ConfigError(f"{name} 包含未知取值 {unknown}，可选: {list(choices)}")
+        return items
+
+    def choice(self, name: str, default: str, choices: tuple) -> str:
+        value = self.str(name, default)
+        if value not in choices:
+            raise ConfigError(f"{name} 应为 {list(choices)} 之一，实际为 {value!r}")
+        return value
+
+def _parse_viewport(reader: _EnvReader, default_width: int, default_height: int):
+    value = reader.str("BROWSER_VIEWPORT", None)
+    if value is None:
+        return default_width, default_height
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise ConfigError(f"BROWSER_VIEWPORT 应为 宽x高，例如 1280x720，实际为 {value!r}")
+    return width, height
+
+def _join_switch_values(items: List[str]) -> List[str]:
+    """BROWSER_ARGS 按逗号切分后，不以 - 开头的片段是上一个参数取值的一部分（如 --disable-features=A,B）"""
+    args: List[str] = []
+    for item in items:
+        if args and not item.startswith("-"):
+            args[-1] += "," + item
+        else:
+            args.append(item)
+    return args
+
+def load_config(env: Optional[Mapping[str, str]] = None) -> AppConfig:
+    """
+    从环境变量构建并校验配置；env 为空时读取 .env 和进程环境变量
+    """
+    if env is None:
+        load_env()
+        env = os.environ
+    reader = _EnvReader(env)
+
+    qwen = QwenConfig(
+        api_key=reader.str("QWEN_API_KEY", None),
+        base_url=reader.str("QWEN_BASE_URL", QwenConfig.base_url),
+        model=reader.str("QWEN_MODEL", QwenConfig.model),
+        model_tiers=reader.str("QWEN_MODEL_TIERS", ""),
+        timeout=reader.float("QWEN_TIMEOUT", QwenConfig.timeout, minimum=0.1),
+        max_retries=reader.int("QWEN_MAX_RETRIES", QwenConfig.max_retries),
+        hedge_enabled=reader.bool("QWEN_HEDGE_ENABLED", QwenConfig.hedge_enabled),
+        breaker_threshold=reader.int("QWEN_BREAKER_THRESHOLD", QwenConfig.breaker_threshold, minimum=1),
+        breaker_cooldown=reader.float("QWEN_BREAKER_COOLDOWN", QwenConfig.breaker_cooldown),
+    )
+
+    profile = reader.choice("BROWSER_PROFILE", BrowserConfig.profile, BROWSER_PROFILES)
+    profile_defaults = PROFILE_DEFAULTS[profile]
+    width, height = _parse_viewport(reader, *profile_defaults["viewport"])
+    browser = BrowserConfig(
+        profile=profile,
+        headless=reader.bool("BROWSER_HEADLESS", profile_defaults["headless"]),
+        chrome_path=reader.str("CHROME_PATH", None),
+        launch_timeout_ms=reader.int("BROWSER_LAUNCH_TIMEOUT", BrowserConfig.launch_timeout_ms, minimum=1000),
+        launch_retries=reader.int("BROWSER_LAUNCH_RETRIES", BrowserConfig.launch_retries, minimum=1),
+        viewport_width=width,
+        viewport_height=height,
+        extra_args=_join_switch_values(reader.list("BROWSER_ARGS")),
+        disable_site_isolation=reader.bool("BROWSER_DISABLE_SITE_ISOLATION", BrowserConfig.disable_site_isolation),
+        tab_heap_limit_mb=reader.int("BROWSER_TAB_HEAP_MB", profile_defaults["tab_heap_limit_mb"]),
+        navigation_timeout_ms=reader.int("BROWSER_TIMEOUT", BrowserConfig.navigation_timeout_ms, minimum=1000),
+        wait_until=reader.choice("BROWSER_WAIT_UNTIL", BrowserConfig.wait_until, WAIT_UNTIL_OPTIONS),
+        settle_ms=reader.int("BROWSER_SETTLE_MS", BrowserConfig.settle_ms),
+        element_timeout_ms=reader.int("BROWSER_ELEMENT_TIMEOUT", BrowserConfig.element_timeout_ms, minimum=100),
+        result_wait_ms=reader.int("BROWSER_RESULT_WAIT_MS", BrowserConfig.result_wait_ms),
+        search_strategy=reader.choice("BROWSER_SEARCH_STRATEGY", BrowserConfig.search_strategy, SEARCH_STRATEGIES),
+        typing_strategy=reader.choice("BROWSER_TYPING_STRATEGY", BrowserConfig.typing_strategy, TYPING_STRATEGIES),
+        typing_delay_ms=reader.int("BROWSER_TYPING_DELAY_MS", BrowserConfig.typing_delay_ms),
+        max_results=reader.int("BROWSER_MAX_RESULTS", BrowserConfig.max_results),
+        result_pages=reader.int("BROWSER_RESULT_PAGES", BrowserConfig.result_pages, minimum=1),
+        blocked_resource_types=reader.list("BROWSER_BLOCK_RESOURCES", RESOURCE_TYPES),
+        blocked_url_patterns=reader.list("BROWSER_BLOCK_URLS"),
+    )
+
+    execution = ExecutionConfig(
+        max_concurrent_tasks=reader.int("MAX_CONCURRENT_TASKS", ExecutionConfig.max_concurrent_tasks, minimum=1),
+        max_parallel_pages=reader.int("MAX_PARALLEL_PAGES", ExecutionConfig.max_parallel_pages, minimum=1),
+        task_isolation=reader.choice("TASK_ISOLATION", ExecutionConfig.task_isolation, TASK_ISOLATION_MODES),
+        context_pool_size=reader.int("CONTEXT_POOL_SIZE", ExecutionConfig.context_pool_size),
+    )
+    if execution.max_concurrent_tasks > 1 and execution.task_isolation != "incognito":
+        # shared 隔离时所有任务共用主页面，并发执行会互相覆盖导航和输入
+        raise ConfigError(f"MAX_CONCURRENT_TASKS={execution.max_concurrent_tasks} 需要 TASK_ISOLATION=incognito，"
+                          f"shared 隔离时任务共用同一个页面，只能为 1")
+
+    sites = SitesConfig(
+        config_paths=reader.list("SITE_CONFIG_PATHS"),
+    )
+
+    cache = CacheConfig(
+        enabled=reader.bool("RESULT_CACHE_ENABLED", CacheConfig.enabled),
+        ttl_seconds=reader.float("RESULT_CACHE_TTL", CacheConfig.ttl_seconds),
+        stale_seconds=reader.float("RESULT_CACHE_STALE", CacheConfig.stale_seconds),
+        max_entries=reader.int("RESULT_CACHE_MAX_ENTRIES", CacheConfig.max_entries, minimum=1),
+    )
+
+    intent_cache = IntentCacheConfig(
+        enabled=reader.bool("INTENT_CACHE_ENABLED", IntentCacheConfig.enabled),
+        threshold=reader.float("INTENT_CACHE_THRESHOLD", IntentCacheConfig.threshold),
+        max_entries=reader.int("INTENT_CACHE_MAX_ENTRIES", IntentCacheConfig.max_entries, minimum=1),
+    )
+    if intent_cache.threshold > 1:
+        raise ConfigError(f"INTENT_CACHE_THRESHOLD 不能大于 1，实际为 {intent_cache.threshold}")
+
+    watchdog = WatchdogConfig(
+        page_max_tasks=reader.int("PAGE_RECYCLE_TASKS", profile_defaults["page_max_tasks"]),
+        page_heap_limit_mb=reader.int("PAGE_HEAP_LIMIT_MB", profile_defaults["page_heap_limit_mb"]),
+        browser_rss_limit_mb=reader.int("BROWSER_RSS_LIMIT_MB", profile_defaults["browser_rss_limit_mb"]),
+    )
+
+    recording = RecordingConfig(
+        directory=reader.str("TASK_RECORD_DIR", RecordingConfig.directory),
+        capture_har=reader.bool("TASK_RECORD_HAR", RecordingConfig.capture_har),
+    )
+
+    response_cache = ResponseCacheConfig(
+        mode=reader.choice("RESPONSE_CACHE_MODE", ResponseCacheConfig.mode, RESPONSE_CACHE_MODES),
+        directory=reader.str("RESPONSE_CACHE_DIR", ResponseCacheConfig.directory),
+        max_size_mb=reader.int("RESPONSE_CACHE_MAX_MB", ResponseCacheConfig.max_size_mb, minimum=1),
+    )
+
+    metrics = MetricsConfig(
+        port=reader.int("METRICS_PORT", MetricsConfig.port),
+        host=reader.str("METRICS_HOST", MetricsConfig.host),
+        file=reader.str("METRICS_FILE", MetricsConfig.file),
+        file_interval_seconds=reader.float("METRICS_FILE_INTERVAL", MetricsConfig.file_interval_seconds, minimum=1.0),
+    )
+
+    logging = LoggingConfig(
+        level=reader.choice("LOG_LEVEL", LoggingConfig.level, LOG_LEVELS),
+        format=reader.choice("LOG_FORMAT", LoggingConfig.format, LOG_FORMATS),
+        file=reader.str("LOG_FILE", LoggingConfig.file),
+        debug_dumps=reader.bool("LOG_DEBUG_DUMPS", LoggingConfig.debug_dumps),
+    )
+
+    return AppConfig(qwen=qwen, browser=browser, execution=execution, sites=sites, cache=cache,
+                     intent_cache=intent_cache, watchdog=watchdog, recording=recording, response_cache=response_cache, metrics=metrics,
+                     logging=logging)
+
+def get_config() -> AppConfig:
+    """
+    进程级配置（首次调用时加载并校验）
+    """
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
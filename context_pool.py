@@ -0,0 +1,133 @@
+"""
+隐身浏览器上下文池
+
+每个任务使用一个独立的隐身上下文（cookie、localStorage、缓存互相隔离），任务结束即销毁，
+不会复用给下一个任务。池中预先创建好若干个带空白页面的上下文，任务开始时直接取用，
+取走或归还后在后台补足，创建上下文的开销不落在任务的关键路径上
+"""
+import asyncio
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional
+
+import metrics
+from structured_log import get_logger
+
+if TYPE_CHECKING:
+    from pyppeteer.browser import Browser, BrowserContext
+    from pyppeteer.page import Page
+
+logger = get_logger("context_pool")
+
+_pool_idle = metrics.gauge("context_pool_idle", "预热好、等待使用的隐身上下文数")
+_pool_in_use = metrics.gauge("context_pool_in_use", "正在被任务使用的隐身上下文数")
+_pool_utilization = metrics.gauge("context_pool_utilization", "正在使用的隐身上下文占池容量的比例")
+_pool_acquires = metrics.counter("context_pool_acquires_total", "获取隐身上下文的次数（warm=预热命中，cold=现场创建）")
+_pool_acquire_latency = metrics.histogram("context_pool_acquire_seconds", "获取隐身上下文的耗时")
+
+class ContextLease:
+    """一次任务借用的隐身上下文及其页面"""
+
+    def __init__(self, context: "BrowserContext", page: "Page"):
+        self.context = context
+        self.page = page
+
+class ContextPool:
+    """
+    预热的隐身上下文池
+
+    prepare_page 用于新页面的通用设置（视口、请求拦截），与主页面一致
+    """
+
+    def __init__(self, size: int, prepare_page: Callable[["Page"], Awaitable[None]]):
+        self.size = size
+        self.prepare_page = prepare_page
+        self._browser: Optional["Browser"] = None
+        self._idle: List[ContextLease] = []
+        self._in_use = 0
+        self._creating = 0
+        self._tasks = set()
+
+    def utilization(self) -> float:
+        """正在使用的上下文占池容量的比例"""
+        return self._in_use / self.size if self.size else 0.0
+
+    def _update_gauges(self):
+        _pool_idle.set(len(self._idle))
+        _pool_in_use.set(self._in_use)
+        _pool_utilization.set(self.utilization())
+
+    async def _create(self, browser: "Browser") -> ContextLease:
+        context = await browser.createIncognitoBrowserContext()
+        try:
+            page = await context.newPage()
+            await self.prepare_page(page)
+        except Exception:
+            await context.close()
+            raise
+        return ContextLease(context, page)
+
+    def _bind(self, browser: "Browser"):
+        """浏览器重启后，旧浏览器的上下文已随之关闭，直接丢弃"""
+        if browser is not self._browser:
+            self._browser = browser
+            self._idle.clear()
+            self._update_gauges()
+
+    def warm(self, browser: "Browser"):
+        """在后台把空闲上下文补足到池大小"""
+        self._bind(browser)
+        missing = self.size - len(self._idle) - self._creating
+        for _ in range(max(0, missing)):
+            self._creating += 1
+            task = asyncio.ensure_future(self._fill(browser))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fill(self, browser: "Browser"):
+        try:
+            lease = await self._create(browser)
+        except Exception as e:
+            logger.warning("⚠️  [上下文池] 预热隐身上下文失败: %s", e)
+            return
+        finally:
+            self._creating -= 1
+        if browser is self._browser and len(self._idle) < self.size:
+            self._idle.append(lease)
+            self._update_gauges()
+        else:
+            await lease.context.close()
+
+    async def acquire(self, browser: "Browser") -> ContextLease:
+        """取一个隐身上下文；没有预热好的就现场创建"""
+        started = time.monotonic()
+        self._bind(browser)
+        if self._idle:
+            lease = self._idle.pop()
+            _pool_acquires.inc(source="warm")
+        else:
+            lease = await self._create(browser)
+            _pool_acquires.inc(source="cold")
+        self._in_use += 1
+        self._update_gauges()
+        _pool_acquire_latency.observe(time.monotonic() - started)
+        self.warm(browser)
+        return lease
+
+    async def release(self, lease: ContextLease):
+        """任务结束：销毁上下文（连同其中所有页面和存储），不放回池中"""
+        self._in_use -= 1
+        self._update_gauges()
+        try:
+            await lease.context.close()
+        except Exception as e:
+            logger.warning("⚠️  [上下文池] 关闭隐身上下文失败: %s", e)
+
+    async def close(self):
+        """关闭所有空闲上下文"""
+        idle, self._idle = self._idle, []
+        self._update_gauges()
+        for lease in idle:
+            try:
+                await lease.context.close()
+            except Exception:
+                pass
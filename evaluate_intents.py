@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+离线意图识别评测：用带版本的标注集比较各解析后端的准确率、延迟和成本
+
+用法:
+    python evaluate_intents.py                               # 默认用回退解析评测 golden/intents_v1.jsonl
+    python evaluate_intents.py --backend llm --workers 8 --price-in 0.0008 --price-out 0.002
+    python evaluate_intents.py --backend predictions --predictions outputs.jsonl
+    python evaluate_intents.py --backend standalone --failures --output report.json
+    python evaluate_intents.py --backend cache --predictions outputs.jsonl --cache-threshold 0.6 --workers 1
+
+标注集每行一条: {"id", "input", "expected", "tags"}，expected 只写需要评分的字段：
+- intent 精确比较，website_url 按主机名比较（忽略协议、www 和路径）
+- search_query 忽略大小写、空白和标点，username/password 精确比较
+- plan 比较步骤数和每一步的字段，multi_search 比较网站集合和搜索词
+修改标注集时新建 intents_v2.jsonl 而不是改旧文件，报告中带有标注集的文件名和sha256，保证结果可比
+"""
+import argparse
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from structured_log import get_logger, set_level
+from utils import SUPPORTED_INTENTS
+
+DEFAULT_GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "intents_v1.jsonl")
+
+# 解析后端：名称 -> 工厂函数（接收命令行参数，返回 指令 -> task_info 的解析函数）
+Parser = Callable[[str], Dict]
+BACKENDS: Dict[str, Callable[[argparse.Namespace], Parser]] = {}
+
+logger = get_logger("evaluate")
+
+def register_backend(name: str):
+    """注册一个解析后端，新的解析方案（如本地分类器）注册后即可用 --backend 评测"""
+    def decorator(factory: Callable[[argparse.Namespace], Parser]):
+        BACKENDS[name] = factory
+        return factory
+    return decorator
+
+@register_backend("fallback")
+def _fallback_backend(args: argparse.Namespace) -> Parser:
+    from config import get_config
+    from qwen_agent import QwenAgent
+    return QwenAgent(dataclasses.replace(get_config().qwen, api_key="")).parse_user_input
+
+def _llm_backend_config():
+    from config import get_config
+    config = get_config().qwen
+    if not config.api_key:
+        raise SystemExit("❌ 调用千问API需要设置 QWEN_API_KEY")
+    return config
+
+@register_backend("llm")
+def _llm_backend(args: argparse.Namespace) -> Parser:
+    from qwen_agent import QwenAgent
+    return QwenAgent(_llm_backend_config()).parse_user_input
+
+@register_backend("standalone")
+def _standalone_backend(args: argparse.Namespace) -> Parser:
+    from standalone_test import parse_user_input_standalone
+    return parse_user_input_standalone
+
+@register_backend("predictions")
+def _predictions_backend(args: argparse.Namespace) -> Parser:
+    """回放事先保存的解析结果（每行 {"input", "task_info"}），用于评测外部模型或固定一次LLM输出"""
+    if not args.predictions:
+        raise SystemExit("❌ predictions 后端需要 --predictions 文件")
+    return predictions_parser(args.predictions)
+
+@register_backend("cache")
+def _cache_backend(args: argparse.Namespace) -> Parser:
+    """
+    意图缓存挡在千问API前面（有 --predictions 时挡在回放结果前面）：未命中的结果写入缓存，
+    报告中带有精确命中和相似命中的比例；用例按顺序依次进入缓存，用 --workers 1 结果可复现
+    """
+    from config import get_config
+    from intent_cache import IntentCache
+    config = get_config().intent_cache
+    threshold = config.threshold if args.cache_threshold is None else args.cache_threshold
+    cache = IntentCache(threshold=threshold, max_entries=config.max_entries)
+    if not args.predictions:
+        from qwen_agent import QwenAgent
+        return QwenAgent(_llm_backend_config(), intent_cache=cache).parse_user_input
+
+    parse = predictions_parser(args.predictions)
+
+    def cached_parse(user_input: str) -> Dict:
+        result = cache.lookup(user_input)
+        if result is None:
+            result = parse(user_input)
+            cache.store(user_input, result)
+        return result
+    return cached_parse
+
+def predictions_parser(path: str) -> Parser:
+    predictions = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                predictions[row["input"]] = row["task_info"]
+
+    def parse(user_input: str) -> Dict:
+        if user_input not in predictions:
+            raise KeyError(f"没有该指令的预测结果: {user_input}")
+        return dict(predictions[user_input])
+    return parse
+
+def load_golden(path: str) -> Tuple[List[Dict], Dict]:
+    """读取标注集，返回 (用例列表, 版本信息)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    cases = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+    version = {
+        "name": os.path.basename(path),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "cases": len(cases),
+    }
+    return cases, version
+
+def normalize_host(url: Optional[str]) -> str:
+    """https://www.zhihu.com/search?q=1 -> zhihu.com"""
+    url = (url or "").strip().lower()
+    if not url:
+        return ""
+    host = urlparse(url if "://" in url else f"https://{url}").netloc
+    return host[4:] if host.startswith("www.") else host
+
+_QUERY_NOISE = re.compile(r'[\s\W_]+', re.UNICODE)
+
+def normalize_query(text: Optional[str]) -> str:
+    """搜索词比较时忽略大小写、空白和标点"""
+    return _QUERY_NOISE.sub("", (text or "").lower())
+
+def _field_matches(field: str, expected, actual) -> bool:
+    if field == "website_url":
+        return normalize_host(expected) == normalize_host(actual)
+    if field == "search_query":
+        return normalize_query(expected) == normalize_query(actual)
+    return (expected or "") == (actual or "")
+
+def score_case(expected: Dict, actual: Dict) -> Dict[str, bool]:
+    """
+    逐字段评分，返回 {字段: 是否正确}
+
+    plan 的步骤字段记为 steps.字段名（每一步各算一次），步骤数记为 steps；
+    multi_search 的网站集合记为 websites
+    """
+    scores = {}
+    for field, value in expected.items():
+        if field == "steps":
+            steps = actual.get("steps") or []
+            scores["steps"] = len(steps) == len(value)
+            for index, expected_step in enumerate(value):
+                actual_step = steps[index] if index < len(steps) else {}
+                for step_field, step_value in expected_step.items():
+                    key = f"steps.{step_field}"
+                    # 同名字段在多个步骤中出现时，有一步错就算错
+                    ok = _field_matches(step_field, step_value, actual_step.get(step_field))
+                    scores[key] = scores.get(key, True) and ok
+        elif field == "websites":
+            hosts = {normalize_host(website.get("website_url")) for website in actual.get("websites") or []}
+            scores["websites"] = hosts == {normalize_host(website["website_url"]) for website in value}
+        else:
+            scores[field] = _field_matches(field, value, actual.get(field))
+    return scores
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+def _token_usage() -> Dict[str, float]:
+    """千问API累计消耗的token数（按 prompt/completion 汇总所有模型）"""
+    usage = {"prompt": 0.0, "completion": 0.0}
+    for labels, value in metrics.counter("qwen_tokens_total").samples():
+        kind = dict(labels).get("kind")
+        if kind in usage:
+            usage[kind] += value
+    return usage
+
+def _cache_lookups() -> Dict[str, float]:
+    """意图缓存累计的查询次数（按 exact/similar/miss）"""
+    return {dict(labels).get("outcome"): value
+            for labels, value in metrics.counter("intent_cache_lookups_total").samples()}
+
+def evaluate_case(parse: Parser, case: Dict) -> Dict:
+    started = time.perf_counter()
+    error = None
+    try:
+        actual = parse(case["input"])
+    except Exception as e:
+        actual = {}
+        error = f"{type(e).__name__}: {e}"
+    latency = time.perf_counter() - started
+    scores = score_case(case["expected"], actual)
+    return {
+        "id": case["id"],
+        "input": case["input"],
+        "tags": case.get("tags", []),
+        "expected": case["expected"],
+        "actual": actual,
+        "scores": scores,
+        "correct": error is None and all(scores.values()),
+        "latency": latency,
+        "error": error,
+    }
+
+def run_evaluation(parse: Parser, cases: List[Dict], workers: int = 4) -> Tuple[List[Dict], float, Dict[str, float]]:
+    """并发评测所有用例，返回 (逐条结果, 总耗时, token消耗)"""
+    tokens_before = _token_usage()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(lambda case: evaluate_case(parse, case), cases))
+    elapsed = time.perf_counter() - started
+    tokens_after = _token_usage()
+    tokens = {kind: tokens_after[kind] - tokens_before[kind] for kind in tokens_after}
+    return results, elapsed, tokens
+
+def summarize(results: List[Dict], elapsed: float, tokens: Dict[str, float],
+              price_in: float = 0.0, price_out: float = 0.0, cache: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    汇总准确率、延迟分位数和成本
+
+    price_in/price_out 为每千个输入/输出token的价格，成本按每千条指令计；
+    cache 为评测期间意图缓存各结果的查询次数
+    """
+    total = len(results)
+    per_intent: Dict[str, Dict] = {}
+    per_field: Dict[str, Dict] = {}
+    for result in results:
+        intent = result["expected"]["intent"]
+        stats = per_intent.setdefault(intent, {"cases": 0, "correct": 0, "intent_correct": 0})
+        stats["cases"] += 1
+        stats["correct"] += result["correct"]
+        stats["intent_correct"] += result["actual"].get("intent") == intent
+        for field, ok in result["scores"].items():
+            field_stats = per_field.setdefault(field, {"cases": 0, "correct": 0})
+            field_stats["cases"] += 1
+            field_stats["correct"] += ok
+    for stats in list(per_intent.values()) + list(per_field.values()):
+        stats["accuracy"] = stats["correct"] / stats["cases"]
+
+    latencies = [result["latency"] for result in results]
+    prompt_tokens, completion_tokens = tokens.get("prompt", 0.0), tokens.get("completion", 0.0)
+    cost = (prompt_tokens * price_in + completion_tokens * price_out) / 1000
+    return {
+        "cases": total,
+        "accuracy": sum(result["correct"] for result in results) / total if total else 0.0,
+        "errors": sum(result["error"] is not None for result in results),
+        "per_intent": per_intent,
+        "per_field": per_field,
+        "latency": {
+            "mean": sum(latencies) / total if total else None,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        "elapsed": elapsed,
+        "throughput": total / elapsed if elapsed > 0 else None,
+        "tokens_per_1k": {kind: value * 1000 / total for kind, value in tokens.items()} if total else {},
+        "cost_per_1k": cost * 1000 / total if total else 0.0,
+        "cache": _cache_summary(cache or {}),
+    }
+
+def _cache_summary(lookups: Dict[str, float]) -> Dict:
+    total = sum(lookups.values())
+    return {
+        "lookups": total,
+        "exact_rate": lookups.get("exact", 0.0) / total if total else 0.0,
+        "similar_rate": lookups.get("similar", 0.0) / total if total else 0.0,
+    }
+
+def print_report(backend: str, version: Dict, summary: Dict, results: List[Dict], show_failures: bool):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.1f}ms"
+
+    print("\n" + "=" * 72)
+    print(f"📊 [评测] 后端 {backend}，标注集 {version['name']}（{version['cases']} 条，sha256 {version['sha256'][:12]}）")
+    print(f"   完全正确: {summary['accuracy']:.1%}，解析异常: {summary['errors']} 条")
+    print(f"\n{'意图':<18}{'用例':>6}{'意图正确':>10}{'完全正确':>10}")
+    for intent in SUPPORTED_INTENTS:
+        stats = summary["per_intent"].get(intent)
+        if stats:
+            print(f"{intent:<18}{stats['cases']:>6}{stats['intent_correct'] / stats['cases']:>10.1%}"
+                  f"{stats['accuracy']:>10.1%}")
+    print(f"\n{'字段':<22}{'用例':>6}{'正确率':>10}")
+    for field, stats in sorted(summary["per_field"].items()):
+        print(f"{field:<22}{stats['cases']:>6}{stats['accuracy']:>10.1%}")
+    latency = summary["latency"]
+    print(f"\n⏱️  延迟 p50 {ms(latency['p50'])} / p90 {ms(latency['p90'])} / p99 {ms(latency['p99'])}，"
+          f"平均 {ms(latency['mean'])}，吞吐 {summary['throughput'] or 0:.1f} 条/秒")
+    tokens = summary["tokens_per_1k"]
+    print(f"💰 每千条指令: 输入 {tokens.get('prompt', 0):.0f} tokens，输出 {tokens.get('completion', 0):.0f} tokens，"
+          f"成本 {summary['cost_per_1k']:.4f}")
+    cache = summary.get("cache") or {}
+    if cache.get("lookups"):
+        print(f"💾 意图缓存: 查询 {cache['lookups']:.0f} 次，精确命中 {cache['exact_rate']:.1%}，"
+              f"相似命中 {cache['similar_rate']:.1%}")
+    print("=" * 72)
+
+    if show_failures:
+        for result in results:
+            if result["correct"]:
+                continue
+            wrong = [field for field, ok in result["scores"].items() if not ok]
+            print(f"\n❌ {result['id']} {result['input']}")
+            print(f"   错误字段: {wrong or '-'}{'，异常: ' + result['error'] if result['error'] else ''}")
+            print(f"   期望: {json.dumps(result['expected'], ensure_ascii=False)}")
+            print(f"   实际: {json.dumps(result['actual'], ensure_ascii=False)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="离线评测意图识别的准确率、延迟和成本")
+    parser.add_argument("--backend", default="fallback", choices=sorted(BACKENDS), help="要评测的解析后端")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN, help="标注集（JSONL）")
+    parser.add_argument("--predictions", help="predictions 后端使用的解析结果文件（JSONL）")
+    parser.add_argument("--workers", type=int, default=4, help="并发解析的线程数")
+    parser.add_argument("--cache-threshold", type=float, help="cache 后端相似命中的最低相似度（默认取 INTENT_CACHE_THRESHOLD）")
+    parser.add_argument("--tags", help="只评测带有这些标签的用例（逗号分隔）")
+    parser.add_argument("--price-in", type=float, default=0.0, help="每千个输入token的价格")
+    parser.add_argument("--price-out", type=float, default=0.0, help="每千个输出token的价格")
+    parser.add_argument("--failures", action="store_true", help="列出所有未完全正确的用例")
+    parser.add_argument("--verbose", action="store_true", help="显示解析过程中的日志")
+    parser.add_argument("--output", help="把汇总和逐条结果写入JSON文件")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        set_level(logging.WARNING)
+    from config import get_config
+    from sites import get_registry
+    # 解析后端使用 SITE_CONFIG_PATHS 中配置的网站
+    get_registry(get_config().sites)
+
+    cases, version = load_golden(args.golden)
+    if args.tags:
+        tags = {tag.strip() for tag in args.tags.split(",") if tag.strip()}
+        cases = [case for case in cases if tags & set(case.get("tags", []))]
+    parse = BACKENDS[args.backend](args)
+    lookups_before = _cache_lookups()
+    results, elapsed, tokens = run_evaluation(parse, cases, args.workers)
+    cache = {outcome: value - lookups_before.get(outcome, 0.0) for outcome, value in _cache_lookups().items()}
+    summary = summarize(results, elapsed, tokens, args.price_in, args.price_out, cache)
+    print_report(args.backend, version, summary, results, args.failures)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"backend": args.backend, "dataset": version, "summary": summary, "cases": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+HAR（HTTP Archive 1.2）录制与回放
+
+HarRecorder 监听页面的请求和响应，生成带响应体的HAR（会话凭据和请求体脱敏）；
+HarReplayer 作为请求拦截器，用HAR中的响应应答页面请求，实现不联网的确定性回放
+"""
+import asyncio
+import base64
+import json
+import time
+import urllib.parse
+from collections import deque
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from pyppeteer.network_manager import Request, Response
+    from pyppeteer.page import Page
+
+HAR_VERSION = "1.2"
+
+# 回放时不能原样返回的响应头：响应体已解压，长度由 respond 重新计算
+SKIP_REPLAY_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+# 携带会话凭据的请求/响应头，录制时不保存
+SENSITIVE_HEADERS = {"cookie", "set-cookie", "authorization", "proxy-authorization"}
+
+# 请求体（如登录表单）和URL中的密码在HAR中替换为该文字
+REDACTED = "[REDACTED]"
+
+def _header_list(headers: Dict[str, str]) -> List[Dict[str, str]]:
+    return [{"name": name, "value": value} for name, value in (headers or {}).items()
+            if name.lower() not in SENSITIVE_HEADERS]
+
+def header_dict(headers: List[Dict[str, str]]) -> Dict[str, str]:
+    return {item["name"]: item["value"] for item in headers or []}
+
+def entry_body(entry: Dict) -> bytes:
+    """HAR条目中的响应体"""
+    content = entry["response"].get("content", {})
+    text = content.get("text") or ""
+    if content.get("encoding") == "base64":
+        return base64.b64decode(text)
+    return text.encode("utf-8")
+
+def entry_response(entry: Dict) -> Dict:
+    """把HAR条目转换为 request.respond 的参数"""
+    headers = {name: value for name, value in header_dict(entry["response"].get("headers")).items()
+               if name.lower() not in SKIP_REPLAY_HEADERS}
+    return {"status": entry["response"]["status"], "headers": headers, "body": entry_body(entry)}
+
+def load_har(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_har(har: Dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(har, f, ensure_ascii=False)
+
+class HarRecorder:
+    """
+    录制一个或多个页面的网络请求
+
+    请求体只记录类型和长度，Cookie/Authorization/Set-Cookie 等头不保存；
+    secrets（如任务中的密码）出现在URL中时替换为 REDACTED
+    """
+
+    def __init__(self, secrets: Iterable[str] = ()):
+        self._secrets = [secret for secret in secrets if secret]
+        self.entries: List[Dict] = []
+        self._started: Dict[int, Tuple[float, str]] = {}
+        self._pending = set()
+        self._pages: List["Page"] = []
+
+    def attach(self, page: "Page"):
+        page.on("request", self._on_request)
+        page.on("response", self._on_response)
+        self._pages.append(page)
+
+    def detach(self):
+        """停止录制（主页面会被后续任务继续使用，必须移除监听）"""
+        for page in self._pages:
+            page.remove_listener("request", self._on_request)
+            page.remove_listener("response", self._on_response)
+        self._pages = []
+
+    def _redact(self, text: str) -> str:
+        for secret in self._secrets:
+            for form in {secret, urllib.parse.quote(secret, safe=""), urllib.parse.quote_plus(secret)}:
+                text = text.replace(form, REDACTED)
+        return text
+
+    def _on_request(self, request: "Request"):
+        self._started[id(request)] = (time.monotonic(), datetime.now(timezone.utc).isoformat())
+
+    def _on_response(self, response: "Response"):
+        task = asyncio.ensure_future(self._capture(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _capture(self, response: "Response"):
+        request = response.request
+        started, started_at = self._started.pop(id(request), (time.monotonic(), datetime.now(timezone.utc).isoformat()))
+        try:
+            body = await response.buffer()
+        except Exception:
+            # 重定向、被中止的请求没有响应体
+            body = b""
+        elapsed_ms = (time.monotonic() - started) * 1000
+        request_entry = {
+            "method": request.method,
+            "url": self._redact(request.url),
+            "httpVersion": "HTTP/1.1",
+            "headers": _header_list(request.headers),
+            "queryString": [],
+            "cookies": [],
+            "headersSize": -1,
+            "bodySize": len(request.postData or ""),
+        }
+        if request.postData:
+            # 请求体可能是带明文密码的登录表单，回放只按方法和URL匹配，不需要它
+            request_entry["postData"] = {"mimeType": request.headers.get("content-type", ""), "text": REDACTED}
+        self.entries.append({
+            "startedDateTime": started_at,
+            "time": elapsed_ms,
+            "request": request_entry,
+            "response": {
+                "status": response.status,
+                "statusText": "",
+                "httpVersion": "HTTP/1.1",
+                "headers": _header_list(response.headers),
+                "cookies": [],
+                "content": {
+                    "size": len(body),
+                    "mimeType": response.headers.get("content-type", ""),
+                    "text": base64.b64encode(body).decode("ascii"),
+                    "encoding": "base64",
+                },
+                "redirectURL": self._redact(response.headers.get("location", "")),
+                "headersSize": -1,
+                "bodySize": len(body),
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": elapsed_ms, "receive": 0},
+            "_resourceType": request.resourceType,
+        })
+
+    async def finish(self) -> Dict:
+        """停止录制，等待未读完的响应体，返回HAR"""
+        self.detach()
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        entries = sorted(self.entries, key=lambda entry: entry["startedDateTime"])
+        return {"log": {
+            "version": HAR_VERSION,
+            "creator": {"name": "browser-agent-qwen", "version": "1.0"},
+            "pages": [],
+            "entries": entries,
+        }}
+
+class HarReplayer:
+    """
+    用HAR应答页面请求的拦截器
+
+    同一URL录到多次时按录制顺序依次返回，用完后重复最后一次；
+    allow_network 为 False 时未录到的请求直接中止，保证回放不联网
+    """
+
+    def __init__(self, har: Dict, allow_network: bool = False):
+        self.allow_network = allow_network
+        self._entries: Dict[Tuple[str, str], Deque[Dict]] = {}
+        for entry in har["log"]["entries"]:
+            key = (entry["request"]["method"], entry["request"]["url"])
+            self._entries.setdefault(key, deque()).append(entry)
+        self.served = 0
+        self.missed: List[str] = []
+
+    def lookup(self, method: str, url: str) -> Optional[Dict]:
+        entries = self._entries.get((method, url))
+        if not entries:
+            return None
+        return entries.popleft() if len(entries) > 1 else entries[0]
+
+    async def handle(self, request: "Request") -> bool:
+        """请求拦截器：应答或中止请求时返回True，放行给后续处理时返回False"""
+        entry = self.lookup(request.method, request.url)
+        if entry is not None:
+            self.served += 1
+            await request.respond(entry_response(entry))
+            return True
+        self.missed.append(request.url)
+        if self.allow_network:
+            return False
+        await request.abort()
+        return True
@@ -0,0 +1,259 @@
+"""
+意图缓存：在千问API之前按指令的相似度复用解析结果
+
+相同的句式（“去知乎搜大模型”、“去知乎搜深度学习”、“去知乎搜索Python教程”）只是搜索词和措辞不同，
+精确匹配的缓存几乎不会命中。这里把指令转成“模板”再比较：
+- 用本地规则解析器（见 rule_parser）找出网站名和搜索词，分别替换为占位符，
+  动作词按类别归一（“搜”、“搜索一下”、“查一下”都是搜索动作词），如 “去⟨网站⟩⟨搜索⟩⟨搜索词⟩”
+- 模板按字符 1~3-gram 哈希成定长的 NumPy 向量（L2 归一化），所有缓存条目组成一个矩阵，
+  一次矩阵乘法得到与全部条目的余弦相似度
+- 命中要求相似度不低于阈值，并且意图和网站集合与缓存条目相同；搜索词由本地规则重新提取
+- 只有千问的结果与本地规则在该条目上一致（意图、网站、搜索词）时才允许相似命中，
+  说明这种句式本地规则能正确切出搜索词；不一致的条目只做精确匹配
+
+带用户名或密码的结果不缓存。NumPy 在创建缓存时才导入，未安装时只做精确匹配
+"""
+import copy
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import metrics
+from config import IntentCacheConfig
+from singleflight import input_fingerprint
+from sites import registrable_domain
+from structured_log import get_logger
+from utils import clean_search_query
+
+logger = get_logger("intent_cache")
+
+_cache_lookups = metrics.counter("intent_cache_lookups_total", "意图缓存查询次数（outcome: exact/similar/miss）")
+_cache_entries = metrics.gauge("intent_cache_entries", "意图缓存条目数")
+
+# 允许相似命中的意图（多步计划和登录只做精确匹配或不缓存）
+TEMPLATE_INTENTS = {"open_website", "open_and_search", "multi_search"}
+
+# float32 点积的舍入误差
+_EPSILON = 1e-6
+
+# 模板中的占位符（私有区字符，不会出现在正常输入中）
+SITE_SLOT = "\ue000"
+QUERY_SLOT = "\ue001"
+# 同一类动作词在规则解析器中的作用相同，模板中归一为一个占位符
+KIND_SLOTS = {"search": "\ue002", "info": "\ue003", "open": "\ue004", "filler": "\ue005"}
+
+NGRAM_SIZES = (1, 2, 3)
+
+TemplateKey = Tuple[str, Tuple[str, ...]]
+
+class Template(NamedTuple):
+    """指令的模板：占位后的文本、匹配键（意图和网站集合）和本地规则的解析结果"""
+    text: str
+    key: TemplateKey
+    local: Dict
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    result: Dict
+    # 为空表示只做精确匹配
+    key: Optional[TemplateKey]
+    row: int
+
+def _domains(result: Dict) -> Tuple[str, ...]:
+    urls = [website.get("website_url") or "" for website in result.get("websites") or []] \
+        or [result.get("website_url") or ""]
+    return tuple(sorted({registrable_domain(url) for url in urls}))
+
+def _same_query(a: Optional[str], b: Optional[str]) -> bool:
+    def normalize(query):
+        return "".join(clean_search_query(query or "").split()).lower()
+    return normalize(a) == normalize(b)
+
+def _has_credentials(result: Dict) -> bool:
+    return any(step.get("username") or step.get("password") for step in [result] + list(result.get("steps") or []))
+
+def make_template(text: str) -> Optional[Template]:
+    """用本地规则解析器生成模板；多步计划和登录指令返回 None"""
+    # rule_parser 在首次使用时才导入，避免 utils -> rule_parser 的循环
+    from rule_parser import get_parser
+
+    parser = get_parser()
+    local = parser.parse(text)
+    if local["intent"] not in TEMPLATE_INTENTS:
+        return None
+    parts = []
+    position = 0
+    for token in parser.tokenize(text):
+        if token.kind in ("site", "url"):
+            parts.append(text[position:token.start])
+            parts.append(SITE_SLOT)
+            position = token.end
+        elif token.kind in ("login", "username", "password"):
+            return None
+    parts.append(text[position:])
+    template = "".join(parts)
+    query = local.get("search_query")
+    if query:
+        template = template.replace(query, QUERY_SLOT, 1)
+    # 搜索词已经替换掉，剩下的动作词按类别归一
+    parts = []
+    position = 0
+    for token in parser.tokenize(template):
+        slot = KIND_SLOTS.get(token.kind)
+        if slot is not None:
+            parts.append(template[position:token.start])
+            parts.append(slot)
+            position = token.end
+    parts.append(template[position:])
+    template = " ".join("".join(parts).lower().split())
+    return Template(template, (local["intent"], _domains(local)), local)
+
+def _load_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def vectorize(text: str, dimensions: int):
+    """字符 1~3-gram 哈希成 dimensions 维向量并做 L2 归一化（需要 NumPy）"""
+    import numpy as np
+
+    indexes = [zlib.crc32(text[i:i + n].encode("utf-8")) % dimensions
+               for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+    vector = np.bincount(np.asarray(indexes, dtype=np.int64), minlength=dimensions).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class IntentCache:
+    """
+    进程内的意图缓存（线程安全），超出容量时按最近最少使用淘汰
+
+    threshold 是相似命中所需的最低余弦相似度，1.0 表示模板必须完全相同
+    """
+
+    def __init__(self, threshold: float = 0.5, max_entries: int = 1024, dimensions: int = 1024):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._rows: List[Optional[_Entry]] = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._key_ids: Dict[TemplateKey, int] = {}
+        self._np = np = _load_numpy()
+        self.similarity_enabled = np is not None
+        if self.similarity_enabled:
+            self._matrix = np.zeros((max_entries, dimensions), dtype=np.float32)
+            # 每行的模板键编号，-1 表示空行或只做精确匹配
+            self._row_keys = np.full(max_entries, -1, dtype=np.int32)
+        else:
+            logger.warning("⚠️  [意图缓存] 未安装 numpy，只做精确匹配")
+
+    @classmethod
+    def from_config(cls, config: IntentCacheConfig) -> "IntentCache":
+        return cls(threshold=config.threshold, max_entries=config.max_entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = [None] * self.max_entries
+            self._free_rows = list(range(self.max_entries - 1, -1, -1))
+            if self.similarity_enabled:
+                self._row_keys.fill(-1)
+        _cache_entries.set(0)
+
+    def lookup(self, user_input: str) -> Optional[Dict]:
+        """查询缓存，未命中时返回 None；返回的结果是副本"""
+        fingerprint = input_fingerprint(user_input)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                self._entries.move_to_end(fingerprint)
+                _cache_lookups.inc(outcome="exact")
+                logger.info("💾 [意图缓存] 精确命中: '%s'", user_input)
+                return copy.deepcopy(entry.result)
+
+        template = make_template(user_input) if self.similarity_enabled else None
+        if template is not None:
+            vector = vectorize(template.text, self.dimensions)
+            with self._lock:
+                key_id = self._key_ids.get(template.key)
+                if key_id is not None:
+                    scores = self._matrix @ vector
+                    scores[self._row_keys != key_id] = -1.0
+                    row = int(self._np.argmax(scores))
+                    score = float(scores[row])
+                    entry = self._rows[row]
+                    if score >= self.threshold - _EPSILON and entry is not None:
+                        self._entries.move_to_end(entry.fingerprint)
+                        result = copy.deepcopy(entry.result)
+                        _cache_lookups.inc(outcome="similar")
+                        logger.info("💾 [意图缓存] 相似命中(%.2f): '%s' ≈ '%s'", score, user_input, entry.fingerprint)
+                        return self._fill_slots(result, template.local)
+
+        _cache_lookups.inc(outcome="miss")
+        return None
+
+    def store(self, user_input: str, result: Dict):
+        """写入千问的解析结果；与本地规则一致的结果允许相似命中"""
+        if _has_credentials(result):
+            return
+        template = make_template(user_input) if self.similarity_enabled else None
+        key = None
+        if template is not None and self._agrees(template.local, result):
+            key = template.key
+        vector = vectorize(template.text, self.dimensions) if key is not None else None
+        fingerprint = input_fingerprint(user_input)
+
+        with self._lock:
+            previous = self._entries.pop(fingerprint, None)
+            if previous is not None:
+                row = previous.row
+            elif self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                # 淘汰最近最少使用的条目，复用它的行
+                _, evicted = self._entries.popitem(last=False)
+                row = evicted.row
+            entry = _Entry(fingerprint, copy.deepcopy(result), key, row)
+            self._entries[fingerprint] = entry
+            self._rows[row] = entry
+            if self.similarity_enabled:
+                if vector is not None:
+                    self._matrix[row] = vector
+                    self._row_keys[row] = self._key_ids.setdefault(key, len(self._key_ids))
+                else:
+                    self._row_keys[row] = -1
+            _cache_entries.set(len(self._entries))
+
+    @staticmethod
+    def _agrees(local: Dict, result: Dict) -> bool:
+        """千问的结果与本地规则的意图、网站集合和搜索词都一致"""
+        return (result.get("intent") == local["intent"]
+                and _domains(result) == _domains(local)
+                and _same_query(result.get("search_query"), local.get("search_query")))
+
+    @staticmethod
+    def _fill_slots(result: Dict, local: Dict) -> Dict:
+        """相似命中时搜索词换成本地规则从新指令中提取的搜索词"""
+        if "search_query" in result:
+            result["search_query"] = local.get("search_query", "")
+        return result
+
+_cache: Optional[IntentCache] = None
+
+def get_intent_cache(config: IntentCacheConfig) -> Optional[IntentCache]:
+    """全局意图缓存，配置中未开启时返回 None"""
+    global _cache
+    if not config.enabled:
+        return None
+    if _cache is None:
+        _cache = IntentCache.from_config(config)
+    return _cache
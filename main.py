@@ -1,7 +1,11 @@
 import asyncio
 import sys
-from qwen_agent import parse_user_input
+import metrics
+from config import ConfigError, MetricsConfig, get_config
+from structured_log import correlation, flush_logs, setup_logging
+from qwen_agent import get_agent
 from browser_controller import perform_browser_task, BrowserController
+from utils import SUPPORTED_INTENTS, get_missing_fields, is_user_supplied_field
 
 def print_welcome():
     """打印欢迎信息"""
@@ -18,6 +22,16 @@ def print_task_info(task_info):
     """打印任务信息"""
     print("\n📋 任务解析结果:")
     print(f"   意图: {task_info.get('intent', 'unknown')}")
+    if task_info.get('intent') == "plan":
+        for index, step in enumerate(task_info.get('steps') or [], 1):
+            detail = step.get('search_query') or step.get('username') or ''
+            print(f"   步骤{index}: {step.get('intent')} @ {step.get('website_name') or step.get('website_url')} {detail}")
+        return _check_missing_fields(task_info)
+    if task_info.get('intent') == "multi_search":
+        names = [website.get('website_name') or website.get('website_url') for website in task_info.get('websites') or []]
+        print(f"   网站: {'、'.join(names)}")
+        print(f"   搜索: {task_info.get('search_query', 'unknown')}")
+        return _check_missing_fields(task_info)
     print(f"   网站: {task_info.get('website_name', 'unknown')}")
     print(f"   链接: {task_info.get('website_url', 'unknown')}")
     
@@ -31,35 +45,71 @@ def print_task_info(task_info):
     elif intent == "open_website":
         print(f"   操作: 仅打开网站")
     
+    return _check_missing_fields(task_info)
+
+def _check_missing_fields(task_info):
+    """验证必要字段"""
     print("-" * 60)
-    
-    # 验证必要字段
-    required_fields = ['intent', 'website_url']
-    missing_fields = []
-    
-    for field in required_fields:
-        if field not in task_info or not task_info[field]:
-            missing_fields.append(field)
-    
-    # 根据任务类型验证特定字段
-    if intent == "open_and_search":
-        if not task_info.get('search_query'):
-            missing_fields.append('search_query')
-    elif intent in ["login", "open_and_login"]:
-        if not task_info.get('username'):
-            missing_fields.append('username')
-        if not task_info.get('password'):
-            missing_fields.append('password')
+    missing_fields = get_missing_fields(task_info)
     
     if missing_fields:
-        print(f"⚠️  警告: 缺少字段 {missing_fields}")
+        credentials = [field for field in missing_fields if is_user_supplied_field(field)]
+        if credentials:
+            print(f"🔑 登录需要在指令中提供用户名和密码，缺少 {credentials}")
+        if len(credentials) < len(missing_fields):
+            print(f"⚠️  警告: 缺少字段 {[field for field in missing_fields if field not in credentials]}")
         return False
     
     return True
 
+def print_task_result(result):
+    """打印任务结果摘要（搜索任务显示前几条结果）"""
+    if result.cached:
+        print(f"💾 结果来自缓存（未打开浏览器），原页面: {result.final_url}")
+    else:
+        print(f"⏱️  耗时 {result.elapsed:.2f} 秒，当前页面: {result.final_url}")
+    for item in result.results[:5]:
+        source = f"[{item.site}] " if result.intent == "multi_search" else ""
+        print(f"   {item.rank}. {source}{item.title}")
+        print(f"      {item.url}")
+    if len(result.results) > 5:
+        print(f"   ... 共 {len(result.results)} 条结果")
+    for index, step in enumerate(result.steps, 1):
+        status = "✅" if step.status == "ok" else f"❌ {step.error}"
+        print(f"   步骤{index} {step.intent} {step.website_url}: {status}（{step.elapsed:.2f} 秒）")
+
+async def run_command(agent, app_config, command: str):
+    """解析并执行一条指令"""
+    task_info = agent.parse_user_input(command)
+    # 日志在后台线程写出，打印解析结果前先等它们写完，避免输出错位
+    flush_logs()
+    print("=" * 50)
+    
+    # 显示解析结果并验证
+    is_valid = print_task_info(task_info)
+    
+    if not is_valid:
+        print("❌ 任务信息不完整，无法执行")
+        return
+    
+    # 执行任务
+    print("\n🚀 开始执行任务...")
+    
+    intent = task_info.get("intent")
+    if intent in SUPPORTED_INTENTS:
+        controller = BrowserController(app_config)
+        result = await controller.perform_task(task_info)
+        flush_logs()
+        print("✅ 任务执行完成！")
+        print_task_result(result)
+    else:
+        print("⚠️  暂不支持此类型的任务")
+
 async def main():
     """主函数"""
     print_welcome()
+    app_config = get_config()
+    agent = get_agent(app_config.qwen, app_config.intent_cache, app_config.sites)
     
     while True:
         try:
@@ -79,37 +129,27 @@ async def main():
             print(f"\n🔍 正在解析指令: {user_input}")
             print("=" * 50)
             
-            # 解析用户输入
-            task_info = parse_user_input(user_input)
-            
-            print("=" * 50)
-            
-            
-            # 显示解析结果并验证
-            is_valid = print_task_info(task_info)
-            
-            if not is_valid:
-                print("❌ 任务信息不完整，无法执行")
-                continue
-            
-            # 执行任务
-            print("\n🚀 开始执行任务...")
-            
-            intent = task_info.get("intent")
-            if intent in ["open_website", "open_and_search", "login", "open_and_login"]:
-                controller = BrowserController()
-                await controller.perform_task(task_info)
-                print("✅ 任务执行完成！")
-            else:
-                print("⚠️  暂不支持此类型的任务")
+            # 同一条指令的解析和执行日志使用同一个关联ID
+            with correlation():
+                await run_command(agent, app_config, user_input)
                 
         except KeyboardInterrupt:
             print("\n\n👋 程序被中断，再见！")
             break
         except Exception as e:
+            flush_logs()
             print(f"❌ 执行任务时发生错误: {e}")
             print("请检查网络连接和API配置")
 
+def start_metrics_export(metrics_config: MetricsConfig):
+    """按配置启动 Prometheus 指标端点和/或指标文件"""
+    if metrics_config.port:
+        metrics.start_http_server(metrics_config.port, metrics_config.host)
+        print(f"📈 [指标] http://{metrics_config.host}:{metrics_config.port}/metrics")
+    if metrics_config.file:
+        metrics.start_textfile_writer(metrics_config.file, metrics_config.file_interval_seconds)
+        print(f"📈 [指标] 每{metrics_config.file_interval_seconds:g}秒写入 {metrics_config.file}")
+
 def run_single_command(command: str):
     """
     执行单个命令（用于测试）
@@ -117,27 +157,25 @@ def run_single_command(command: str):
     async def single_task():
         try:
             print(f"执行命令: {command}")
-            task_info = parse_user_input(command)
-            is_valid = print_task_info(task_info)
-            
-            if not is_valid:
-                print("❌ 任务信息不完整，无法执行")
-                return
-            
-            intent = task_info.get("intent")
-            if intent in ["open_website", "open_and_search", "login", "open_and_login"]:
-                controller = BrowserController()
-                await controller.perform_task(task_info)
-                print("✅ 任务执行完成！")
-            else:
-                print("⚠️  暂不支持此类型的任务")
-                
+            app_config = get_config()
+            with correlation():
+                await run_command(get_agent(app_config.qwen, app_config.intent_cache, app_config.sites), app_config, command)
         except Exception as e:
+            flush_logs()
             print(f"❌ 执行任务时发生错误: {e}")
     
     asyncio.run(single_task())
 
 if __name__ == "__main__":
+    # 启动前校验配置
+    try:
+        app_config = get_config()
+    except ConfigError as e:
+        print(f"❌ 配置错误: {e}")
+        sys.exit(1)
+    setup_logging(app_config.logging)
+    start_metrics_export(app_config.metrics)
+    
     # 检查是否有命令行参数
     if len(sys.argv) > 1:
         # 如果有参数，执行单个命令
@@ -0,0 +1,77 @@
+"""
+浏览器内存采样：Chrome进程树的常驻内存（RSS）和页面JS堆（CDP Performance.getMetrics）
+"""
+import os
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from pyppeteer.page import Page
+
+MB = 1024 * 1024
+
+def _children_by_parent() -> Dict[int, list]:
+    children: Dict[int, list] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格和括号，从最后一个 ')' 之后解析
+        fields = stat[stat.rfind(")") + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    return children
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def process_tree_rss_mb(pid: Optional[int]) -> Optional[float]:
+    """
+    进程及其所有子进程（Chrome的渲染、GPU等进程）的RSS之和（MB）
+
+    Linux 直接读取 /proc；其他平台安装了 psutil 时使用 psutil，否则返回None
+    """
+    if not pid:
+        return None
+    if os.path.isdir("/proc/self"):
+        children = _children_by_parent()
+        total_kb = 0
+        pending = [pid]
+        while pending:
+            current = pending.pop()
+            total_kb += _rss_kb(current)
+            pending.extend(children.get(current, []))
+        return total_kb / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        process = psutil.Process(pid)
+        processes = [process] + process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) / MB
+    except psutil.Error:
+        return None
+
+def browser_pid(browser) -> Optional[int]:
+    """pyppeteer 启动的浏览器进程号（连接到已有浏览器时为None）"""
+    process = getattr(browser, "process", None)
+    return getattr(process, "pid", None)
+
+async def page_heap_mb(page: "Page") -> Optional[float]:
+    """页面已使用的JS堆大小（MB），页面已关闭或不可用时返回None"""
+    try:
+        metrics = await page.metrics()
+    except Exception:
+        return None
+    used = metrics.get("JSHeapUsedSize")
+    return used / MB if used is not None else None
@@ -0,0 +1,75 @@
+"""
+页面回收与内存看门狗
+
+长时间运行时主页面会随导航不断累积内存。每个任务结束后采样页面JS堆和Chrome进程树RSS：
+- 页面执行的任务数达到上限，或JS堆超过阈值时，换一个新页面
+- 整个浏览器的RSS超过阈值时，关闭浏览器，下一个任务重新启动
+"""
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import metrics
+from config import WatchdogConfig
+from memory_stats import browser_pid, page_heap_mb, process_tree_rss_mb
+
+if TYPE_CHECKING:
+    from pyppeteer.browser import Browser
+    from pyppeteer.page import Page
+
+_browser_rss = metrics.gauge("browser_rss_mb", "Chrome进程树的常驻内存（MB）")
+_page_heap = metrics.gauge("page_js_heap_mb", "主页面已使用的JS堆（MB）")
+_page_recycles = metrics.counter("page_recycles_total", "主页面被回收的次数")
+_browser_restarts = metrics.counter("browser_restarts_total", "浏览器被重启的次数")
+
+# 看门狗给出的处理动作
+KEEP = "keep"
+RECYCLE_PAGE = "recycle_page"
+RESTART_BROWSER = "restart_browser"
+
+class MemoryWatchdog:
+    """根据任务数和内存采样决定是否回收页面或重启浏览器"""
+
+    def __init__(self, config: WatchdogConfig):
+        self.config = config
+        self.page_tasks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.page_max_tasks or self.config.page_heap_limit_mb or self.config.browser_rss_limit_mb)
+
+    def record_task(self):
+        self.page_tasks += 1
+
+    def page_recycled(self, reason: str):
+        self.page_tasks = 0
+        _page_recycles.inc(reason=reason)
+
+    def browser_restarted(self, reason: str):
+        self.page_tasks = 0
+        _browser_restarts.inc(reason=reason)
+
+    async def check(self, browser: Optional["Browser"], page: Optional["Page"]) -> Tuple[str, str, str]:
+        """
+        采样内存并返回 (动作, 原因, 说明)，原因为 tasks/heap/rss；浏览器重启优先于页面回收
+        """
+        config = self.config
+        if browser is None:
+            return KEEP, "", ""
+
+        if config.browser_rss_limit_mb:
+            rss = process_tree_rss_mb(browser_pid(browser))
+            if rss is not None:
+                _browser_rss.set(rss)
+                if rss > config.browser_rss_limit_mb:
+                    return RESTART_BROWSER, "rss", f"浏览器内存 {rss:.0f}MB 超过 {config.browser_rss_limit_mb}MB"
+
+        if page is None:
+            return KEEP, "", ""
+        if config.page_heap_limit_mb:
+            heap = await page_heap_mb(page)
+            if heap is not None:
+                _page_heap.set(heap)
+                if heap > config.page_heap_limit_mb:
+                    return RECYCLE_PAGE, "heap", f"页面JS堆 {heap:.0f}MB 超过 {config.page_heap_limit_mb}MB"
+        if config.page_max_tasks and self.page_tasks >= config.page_max_tasks:
+            return RECYCLE_PAGE, "tasks", f"页面已执行 {self.page_tasks} 个任务"
+        return KEEP, "", ""
@@ -0,0 +1,259 @@
+"""
+注入页面执行的JavaScript脚本
+
+脚本通过 page.evaluate(脚本, 参数) 调用，参数以JSON传入，不做字符串拼接。
+需要在Python侧继续操作的元素会被打上 data-agent-ref 标记，
+返回 [data-agent-ref="..."] 形式的选择器作为稳定句柄，可直接用于 page.click / page.type
+"""
+
+# 元素句柄使用的标记属性
+REF_ATTRIBUTE = "data-agent-ref"
+
+# 切换到密码登录的常见选项卡文字（网站适配器中的文字优先）
+DEFAULT_PASSWORD_TAB_TEXTS = ["密码登录", "账号密码登录", "账号登录", "Password", "Sign in with password"]
+
+# 文本搜索的默认上限：最多返回的匹配数、最多访问的节点数、匹配元素的最大文字长度
+TEXT_SEARCH_MAX_RESULTS = 10
+TEXT_SEARCH_MAX_NODES = 5000
+TEXT_SEARCH_MAX_TEXT_LENGTH = 30
+
+# 搜索结果翻页：网站适配器没有下一页选择器时按文字查找
+NEXT_PAGE_TEXTS = ["下一页", "下页", "Next"]
+
+# 登录按钮的文字（CSS选择器不能按文字匹配，按文字查找时整段文字须与其一相同，不区分大小写）
+LOGIN_BUTTON_TEXTS = ["登录", "登 录", "登陆", "Login", "Log in", "Sign in"]
+
+# 搜索结果摘要的最大长度
+RESULT_SNIPPET_MAX_LENGTH = 200
+
+# 各脚本共用的辅助函数（在脚本函数体内展开）：
+#   ref(el)            给元素打标记并返回稳定选择器
+#   visible(el)        元素是否可见
+#   findByText(needles, limits)
+#       用 TreeWalker 在可交互元素中按文字查找；跳过隐藏子树和 script/style 等，
+#       访问节点数和结果数都有上限，达到上限立即停止；limits.exact 为真时要求文字与某个needle完全相同（不区分大小写）
+_HELPERS_JS = """
+    const attr = options.refAttribute;
+    window.__agentRefSeq = window.__agentRefSeq || 0;
+    const ref = (el) => {
+        if (!el) return null;
+        let value = el.getAttribute(attr);
+        if (!value) {
+            value = 'r' + (++window.__agentRefSeq);
+            el.setAttribute(attr, value);
+        }
+        return '[' + attr + '="' + value + '"]';
+    };
+    const visible = (el) => {
+        if (!el.getClientRects().length) return false;
+        const style = window.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const SKIP_TAGS = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'SVG', 'svg', 'IFRAME', 'HEAD']);
+    const INTERACTIVE_TAGS = new Set(['A', 'BUTTON', 'LI', 'LABEL', 'SPAN', 'DIV', 'INPUT']);
+    const INTERACTIVE_ROLES = new Set(['tab', 'button', 'link', 'menuitem', 'option', 'radio']);
+    const isInteractive = (el) => {
+        const role = el.getAttribute('role');
+        if (role && INTERACTIVE_ROLES.has(role)) return true;
+        if (!INTERACTIVE_TAGS.has(el.tagName)) return false;
+        if (el.tagName === 'INPUT') return el.type === 'submit' || el.type === 'button';
+        if (el.tagName === 'SPAN' || el.tagName === 'DIV') {
+            // 普通容器只在看起来可点击时才算
+            return el.hasAttribute('onclick') || el.hasAttribute('tabindex') || el.hasAttribute('data-tab')
+                || /tab|btn|button|switch|login|mode/i.test(el.className || '');
+        }
+        return true;
+    };
+    const findByText = (needles, limits) => {
+        const results = [];
+        if (!document.body || !needles.length) return results;
+        let visited = 0;
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT, {
+            acceptNode: (el) => {
+                if (SKIP_TAGS.has(el.tagName) || el.hidden || el.getAttribute('aria-hidden') === 'true') {
+                    return NodeFilter.FILTER_REJECT;
+                }
+                return NodeFilter.FILTER_ACCEPT;
+            }
+        });
+        // 跳过当前元素的子孙，移到文档顺序中的下一个元素
+        const nextAfterSubtree = () => {
+            let node = walker.nextSibling();
+            while (!node && walker.parentNode()) {
+                node = walker.nextSibling();
+            }
+            return node;
+        };
+        let el = walker.nextNode();
+        while (el && visited < limits.maxNodes && results.length < limits.maxResults) {
+            visited++;
+            let matched = false;
+            if (isInteractive(el)) {
+                const text = (el.tagName === 'INPUT' ? el.value : el.textContent || '').trim();
+                const hit = limits.exact
+                    ? needles.some(needle => text.toLowerCase() === needle.toLowerCase())
+                    : needles.some(needle => text.includes(needle));
+                if (text && text.length <= limits.maxTextLength && hit && visible(el)) {
+                    results.push({
+                        text: text,
+                        tagName: el.tagName,
+                        className: typeof el.className === 'string' ? el.className : '',
+                        id: el.id,
+                        ref: ref(el)
+                    });
+                    matched = true;
+                }
+            }
+            // 匹配元素的子孙文字相同，不必再看
+            el = matched ? nextAfterSubtree() : walker.nextNode();
+        }
+        return results;
+    };
+"""
+
+# 按文字查找可见的可交互元素，参数: {refAttribute, needles, maxResults, maxNodes, maxTextLength, exact}
+FIND_BY_TEXT_JS = """
+(options) => {
+""" + _HELPERS_JS + """
+    return findByText(options.needles, options);
+}
+"""
+
+# 一次 evaluate 完成登录表单分析：
+# 判断当前是密码登录还是短信登录，找出切换选项卡、用户名框、密码框和提交按钮
+LOGIN_ANALYZER_JS = """
+(options) => {
+""" + _HELPERS_JS + """
+    const attrs = (el) => [el.name, el.id, el.placeholder, el.getAttribute('aria-label'), el.autocomplete]
+        .filter(Boolean).join(' ').toLowerCase();
+    const textOf = (el) => (el.innerText || el.value || '').trim();
+
+    const inputs = Array.from(document.querySelectorAll('input')).filter(visible);
+    const password = inputs.find(el => el.type === 'password') || null;
+
+    // 用户名框：按属性关键词打分，优先选择密码框之前的输入框
+    const userHints = ['username', 'user', 'account', 'email', 'phone', 'mobile', 'login',
+                       '用户名', '用户', '账号', '手机', '邮箱'];
+    let username = null;
+    let bestScore = 0;
+    for (const el of inputs) {
+        if (el === password) break;
+        if (!['text', 'tel', 'email', ''].includes(el.type)) continue;
+        const text = attrs(el);
+        let score = 1;
+        for (const hint of userHints) {
+            if (text.includes(hint)) score += 2;
+        }
+        if (text.includes('search') || text.includes('搜索') || text.includes('验证码') || text.includes('code')) {
+            score = 0;
+        }
+        if (score > bestScore) {
+            bestScore = score;
+            username = el;
+        }
+    }
+
+    const smsInput = inputs.find(el => /验证码|短信|verification|code/i.test(attrs(el))) || null;
+
+    // 提交按钮：优先和密码框同一个表单
+    const scope = (password && password.form) || document;
+    const buttons = Array.from(scope.querySelectorAll('button, input[type="submit"], [role="button"], a'))
+        .filter(visible);
+    const submitPattern = /^(登录|登 录|登陆|login|log in|sign in)$/i;
+    const submit = buttons.find(el => el.type === 'submit' && submitPattern.test(textOf(el)))
+        || buttons.find(el => submitPattern.test(textOf(el)))
+        || buttons.find(el => el.type === 'submit')
+        || null;
+
+    // 切换到密码登录的选项卡（短文本、可见、可点击）
+    const tabs = password ? [] : findByText(options.passwordTabTexts, options)
+        .map(item => ({ text: item.text, ref: item.ref }));
+
+    let mode = 'unknown';
+    if (password) mode = 'password';
+    else if (smsInput) mode = 'sms';
+
+    return {
+        mode: mode,
+        username: ref(username),
+        password: ref(password),
+        submit: ref(submit),
+        smsInput: ref(smsInput),
+        passwordTabs: tabs,
+        inputCount: inputs.length
+    };
+}
+"""
+
+# 一次调用写入输入框：聚焦、用原生 setter 设置值（兼容 React/Vue 受控组件），再派发 input/change 事件；
+# 原生 setter 只能用于对应类型的元素，input/textarea 以外的元素（如 contenteditable）返回 false，由调用方逐字输入
+SET_INPUT_VALUE_JS = """
+(selector, value) => {
+    const el = document.querySelector(selector);
+    if (!el) return false;
+    let proto;
+    if (el instanceof HTMLInputElement) {
+        proto = HTMLInputElement.prototype;
+    } else if (el instanceof HTMLTextAreaElement) {
+        proto = HTMLTextAreaElement.prototype;
+    } else {
+        return false;
+    }
+    el.focus();
+    const setter = Object.getOwnPropertyDescriptor(proto, 'value').set;
+    setter.call(el, value);
+    el.dispatchEvent(new Event('input', { bubbles: true }));
+    el.dispatchEvent(new Event('change', { bubbles: true }));
+    return true;
+}
+"""
+
+# 聚焦输入框并选中已有内容，之后的 Input.insertText 会替换选中内容
+FOCUS_AND_SELECT_JS = """
+(selector) => {
+    const el = document.querySelector(selector);
+    if (!el) return false;
+    el.focus();
+    if (typeof el.select === 'function') el.select();
+    return true;
+}
+"""
+
+# 一次 evaluate 提取搜索结果列表，参数:
+#   {itemSelector, titleSelector, linkSelector, snippetSelector, maxResults, startRank, maxSnippetLength}
+# 标题/链接/摘要选择器为空时使用通用规则
+EXTRACT_RESULTS_JS = """
+(options) => {
+    const clean = (text) => (text || '').replace(/\\s+/g, ' ').trim();
+    const pick = (root, selector, fallback) => {
+        if (selector) return root.querySelector(selector);
+        for (const candidate of fallback) {
+            const el = root.querySelector(candidate);
+            if (el) return el;
+        }
+        return null;
+    };
+    const items = document.querySelectorAll(options.itemSelector);
+    const results = [];
+    for (let i = 0; i < items.length && results.length < options.maxResults; i++) {
+        const item = items[i];
+        const titleEl = pick(item, options.titleSelector, ['h3', 'h2', 'h4', 'a[title]', 'a']);
+        const title = clean(titleEl ? (titleEl.getAttribute('title') || titleEl.textContent) : '');
+        if (!title) continue;
+        let linkEl = options.linkSelector ? item.querySelector(options.linkSelector) : null;
+        if (!linkEl && titleEl) linkEl = titleEl.closest('a') || titleEl.querySelector('a');
+        if (!linkEl) linkEl = item.querySelector('a[href]');
+        const url = linkEl && linkEl.href ? linkEl.href : '';
+        const snippetEl = options.snippetSelector ? item.querySelector(options.snippetSelector) : null;
+        let snippet = clean(snippetEl ? snippetEl.textContent : item.textContent);
+        if (!snippetEl && snippet.startsWith(title)) snippet = snippet.slice(title.length).trim();
+        results.push({
+            title: title,
+            url: url,
+            snippet: snippet.slice(0, options.maxSnippetLength),
+            rank: options.startRank + results.length
+        });
+    }
+    return results;
+}
+"""
@@ -1,32 +1,248 @@
-import os
 import json
-import requests
-from dotenv import load_dotenv
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional, Tuple
 
-# 加载环境变量
-load_dotenv()
+import metrics
+from config import IntentCacheConfig, QwenConfig, SitesConfig, get_config
+from intent_cache import IntentCache, get_intent_cache
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, RetryableError, RetryPolicy
+from rule_parser import get_parser
+from singleflight import SingleFlight, input_fingerprint
+from sites import SiteRegistry, get_registry
+from structured_log import get_logger
+from utils import SUPPORTED_INTENTS, fill_plan_websites, get_missing_fields, is_user_supplied_field
 
-QWEN_API_KEY = os.getenv("QWEN_API_KEY")
-QWEN_BASE_URL = os.getenv("QWEN_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-QWEN_MODEL = os.getenv("QWEN_MODEL", "qwen-turbo-latest")
+# 这些状态码视为服务端暂时不可用，可以重试
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+logger = get_logger("qwen")
+
+_tier_requests = metrics.counter("qwen_tier_requests_total", "各模型层的解析结果（accepted/escalated/incomplete/rejected/invalid_json/error）")
+_tier_latency = metrics.histogram("qwen_tier_latency_seconds", "各模型层从请求到校验完成的耗时")
+_parse_latency = metrics.histogram("parse_latency_seconds", "指令解析耗时（source: llm/fallback/shared/cache）")
+_tokens = metrics.counter("qwen_tokens_total", "千问API消耗的token数（kind: prompt/completion）")
+
+def parse_model_tiers(spec: str, default_model: str, default_timeout: float) -> List[Tuple[str, float]]:
+    """
+    解析 QWEN_MODEL_TIERS 配置，返回 [(模型, 超时秒数), ...]
+    """
+    tiers = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, timeout = item.partition(":")
+        tiers.append((model.strip(), float(timeout) if timeout.strip() else default_timeout))
+    return tiers or [(default_model, default_timeout)]
+
+class ModelTier:
+    """路由中的一层模型，拥有独立的超时、熔断器和指标"""
+    
+    def __init__(self, model: str, timeout: float, max_retries: int = 2,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 30.0, hedge_enabled: bool = False):
+        self.model = model
+        self.timeout = timeout
+        self.caller = ResilientCaller(
+            f"qwen_api:{model}",
+            attempt_timeout=timeout,
+            retry_policy=RetryPolicy(max_attempts=max_retries + 1),
+            breaker=CircuitBreaker(f"qwen_api:{model}", breaker_threshold, breaker_cooldown),
+            hedge_enabled=hedge_enabled
+        )
 
 class QwenAgent:
-    def __init__(self):
-        if not QWEN_API_KEY:
-            raise ValueError("QWEN_API_KEY environment variable is not set")
+    def __init__(self, config: Optional[QwenConfig] = None, intent_cache: Optional[IntentCache] = None,
+                 sites: Optional[SiteRegistry] = None):
+        config = config or get_config().qwen
+        self.config = config
+        self.api_key = config.api_key
+        self.base_url = config.base_url
+        self.tiers = [
+            ModelTier(
+                model, timeout,
+                max_retries=config.max_retries,
+                breaker_threshold=config.breaker_threshold,
+                breaker_cooldown=config.breaker_cooldown,
+                hedge_enabled=config.hedge_enabled
+            )
+            for model, timeout in parse_model_tiers(config.model_tiers, config.model, config.timeout)
+        ]
+        self.model = self.tiers[-1].model
+        # 相同指令的并发解析只调用一次API
+        self._flight = SingleFlight("parse_user_input")
+        # 相似指令复用之前的解析结果（见 intent_cache），为空时每次都调用API
+        self.intent_cache = intent_cache
+        # 提示词中的网站列表和本地规则解析使用的注册表，为空时使用已加载的全局注册表
+        self.sites = sites if sites is not None else get_registry()
         
-        self.api_key = QWEN_API_KEY
-        self.base_url = QWEN_BASE_URL
-        self.model = QWEN_MODEL
+        if not self.api_key:
+            logger.warning("⚠️  [配置] 未设置 QWEN_API_KEY，将只使用本地规则解析")
+    
+    def health(self) -> Dict:
+        """千问API的健康状态（每层模型的熔断器状态和延迟分位数）"""
+        return {tier.model: tier.caller.health() for tier in self.tiers}
         
     def parse_user_input(self, user_input: str) -> Dict:
         """
         解析用户输入的自然语言命令，识别意图和参数
+        
+        按配置的模型层从便宜到强依次尝试，结果通过意图校验即返回，
+        校验失败或字段缺失时升级到下一层；所有层都不可用时使用回退解析。
+        相同指令的并发调用共享一次解析；开启意图缓存时相似的指令直接复用之前的解析结果
+        """
+        started = time.monotonic()
+        leader = []
+        
+        def parse():
+            leader.append(True)
+            return self._parse_user_input(user_input)
+        
+        result, source = self._flight.do(input_fingerprint(user_input), parse)
+        # 共享其他调用方解析结果的记为 shared
+        _parse_latency.observe(time.monotonic() - started, source=source if leader else "shared")
+        return dict(result)
+    
+    def _parse_user_input(self, user_input: str) -> Tuple[Dict, str]:
+        """返回 (解析结果, 来源)，来源为 llm、fallback 或 cache"""
+        logger.info("🧠 [AI分析] 正在解析用户指令: '%s'", user_input)
+        logger.debug("🤔 [AI思考] 分析指令中的关键词和意图...")
+        if not self.api_key:
+            return self._fallback_parse(user_input), "fallback"
+        if self.intent_cache is not None:
+            cached = self.intent_cache.lookup(user_input)
+            if cached is not None:
+                return cached, "cache"
+        
+        prompt = self._build_prompt(user_input)
+        best_result = None
+        
+        for index, tier in enumerate(self.tiers):
+            is_last = index == len(self.tiers) - 1
+            parsed_result = self._parse_with_tier(tier, prompt)
+            if parsed_result is None:
+                continue
+            
+            # 缺少账号密码说明指令中没有给出，换更强的模型也提取不出来，由调用方提示用户
+            problems = [field for field in get_missing_fields(parsed_result) if not is_user_supplied_field(field)]
+            if parsed_result.get("intent") not in SUPPORTED_INTENTS:
+                problems.append("intent")
+            if not problems:
+                _tier_requests.inc(model=tier.model, outcome="accepted")
+                if self.intent_cache is not None:
+                    self.intent_cache.store(user_input, parsed_result)
+                return parsed_result, "llm"
+            
+            best_result = parsed_result
+            if not is_last:
+                _tier_requests.inc(model=tier.model, outcome="escalated")
+                logger.info("⬆️  [升级] %s 结果校验未通过 %s，交给更强的模型...", tier.model, problems)
+            else:
+                _tier_requests.inc(model=tier.model, outcome="incomplete")
+        
+        if best_result is not None:
+            return best_result, "llm"
+        logger.info("🔄 [备用方案] 使用回退解析方法...")
+        return self._fallback_parse(user_input), "fallback"
+
+    def _parse_with_tier(self, tier: ModelTier, prompt: str) -> Optional[Dict]:
+        """
+        用某一层模型解析，失败时返回None
+        """
+        content = ""
+        started = time.monotonic()
+        try:
+            logger.debug("🔗 [AI调用] 正在调用千问API...")
+            logger.debug("🌐 [API信息] 模型: %s", tier.model)
+            
+            content = tier.caller.call(lambda timeout: self._request_completion(prompt, timeout, tier.model))
+            
+            logger.debug("🤖 [AI回复] 原始响应: %s", content)
+            
+            # 清理响应内容，确保只包含JSON
+            if content.startswith("```json"):
+                content = content[7:-3]
+                logger.debug("🧹 [清理] 移除了markdown代码块标记")
+            elif content.startswith("```"):
+                content = content[3:-3]
+                logger.debug("🧹 [清理] 移除了代码块标记")
+            
+            logger.debug("📝 [清理后] 内容: %s", content)
+            
+            # 解析JSON
+            parsed_result = json.loads(content)
+            if not isinstance(parsed_result, dict):
+                raise json.JSONDecodeError("响应不是JSON对象", content, 0)
+            
+            fill_plan_websites(parsed_result)
+            logger.info("✅ [解析成功] AI识别的意图: %s", parsed_result.get('intent'))
+            logger.debug("📊 [解析结果] 完整JSON: %s", parsed_result)
+            
+            return parsed_result
+            
+        except CircuitOpenError as e:
+            logger.warning("⛔ [熔断] %s，跳过该模型", e)
+            _tier_requests.inc(model=tier.model, outcome="rejected")
+            return None
+        except json.JSONDecodeError as e:
+            logger.warning("❌ [JSON错误] 解析失败: %s", e)
+            logger.debug("📄 [原始内容] %s", content)
+            _tier_requests.inc(model=tier.model, outcome="invalid_json")
+            return None
+        except Exception as e:
+            logger.warning("❌ [API错误] 千问API调用失败: %s", e)
+            _tier_requests.inc(model=tier.model, outcome="error")
+            return None
+        finally:
+            _tier_latency.observe(time.monotonic() - started, model=tier.model)
+
+    def _request_completion(self, prompt: str, timeout: float, model: str) -> str:
         """
-        print(f"🧠 [AI分析] 正在解析用户指令: '{user_input}'")
-        print(f"🤔 [AI思考] 分析指令中的关键词和意图...")
-        prompt = f"""
+        发送一次补全请求，返回模型输出文本；可重试的失败抛出 RetryableError
+        """
+        import requests
+        
+        try:
+            # 使用兼容模式API
+            response = requests.post(
+                f"{self.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": model,
+                    "messages": [
+                        {"role": "user", "content": prompt}
+                    ],
+                    "temperature": 0.1,
+                    "max_tokens": 1000
+                },
+                timeout=timeout
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise RetryableError(f"网络错误: {e}")
+        
+        logger.debug("📡 [API响应] 状态码: %s", response.status_code)
+        
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            retry_after = response.headers.get("Retry-After")
+            raise RetryableError(
+                f"API暂时不可用: {response.status_code}",
+                status_code=response.status_code,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+        if response.status_code != 200:
+            raise Exception(f"API请求失败: {response.status_code}, {response.text}")
+        
+        result = response.json()
+        usage = result.get("usage") or {}
+        _tokens.inc(usage.get("prompt_tokens", 0), model=model, kind="prompt")
+        _tokens.inc(usage.get("completion_tokens", 0), model=model, kind="completion")
+        return result["choices"][0]["message"]["content"].strip()
+
+    def _build_prompt(self, user_input: str) -> str:
+        """构建意图识别提示词"""
+        return f"""
 你是一个网页浏览助手，请根据用户输入的自然语言命令，识别任务类型和参数，并输出为JSON格式。
 
 支持的任务类型：
@@ -34,13 +250,11 @@ class QwenAgent:
 2. open_and_search: 打开网站并搜索内容
 3. login: 登录网站（需要用户名和密码）
 4. open_and_login: 打开网站并登录
+5. plan: 多步任务，一句话包含多个先后执行的操作（如"登录豆瓣然后搜索电影"），按顺序拆成steps，每一步是以上1-4中的一种
+6. multi_search: 在多个网站搜索同一内容（如"在知乎、百度和B站搜索大模型"），网站列在websites中
 
 常见网站：
-- 知乎: https://www.zhihu.com
-- 百度: https://www.baidu.com
-- 微博: https://weibo.com
-- B站: https://www.bilibili.com
-- 豆瓣: https://www.douban.com
+{self.sites.prompt_site_list()}
 
 任务识别规则：
 - 如果用户只是说"打开网站"、"访问网站"、"去网站"等，且没有任何具体信息需求，则为open_website
@@ -52,6 +266,8 @@ class QwenAgent:
   * 任何包含具体查询内容的请求
 - 如果用户说"登录"、"登陆"、"用户名"、"密码"等，则为login或open_and_login
 - 如果用户提供了具体的网站URL，使用该URL；否则根据关键词匹配常见网站
+- 如果用户用"然后"、"接着"、"再"等连接了多个操作，则为plan；后面的步骤没有说网站时沿用前一步的网站
+- 如果用户要在两个及以上网站搜索同一内容，则为multi_search
 
 重要原则：只要用户想要获取任何具体信息，都应该识别为open_and_search，而不是open_website
 
@@ -83,227 +299,73 @@ class QwenAgent:
     "password": "密码（如果不是登录任务则为空字符串）"
 }}
 
+多步任务（plan）的输出格式，steps中每一步的字段与上面相同：
+{{
+    "intent": "plan",
+    "steps": [
+        {{"intent": "open_and_login", "website_name": "豆瓣", "website_url": "https://www.douban.com", "search_query": "", "username": "用户名", "password": "密码"}},
+        {{"intent": "open_and_search", "website_name": "豆瓣", "website_url": "https://www.douban.com", "search_query": "电影", "username": "", "password": ""}}
+    ]
+}}
+
+多网站搜索（multi_search）的输出格式：
+{{
+    "intent": "multi_search",
+    "search_query": "搜索内容",
+    "websites": [
+        {{"website_name": "知乎", "website_url": "https://www.zhihu.com"}},
+        {{"website_name": "百度", "website_url": "https://www.baidu.com"}}
+    ]
+}}
+
 用户输入：{user_input}
 """
-
-        try:
-            print(f"🔗 [AI调用] 正在调用千问API...")
-            print(f"🌐 [API信息] 模型: {self.model}")
-            
-            # 使用兼容模式API
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model,
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.1,
-                    "max_tokens": 1000
-                }
-            )
-            
-            print(f"📡 [API响应] 状态码: {response.status_code}")
-            
-            if response.status_code != 200:
-                raise Exception(f"API请求失败: {response.status_code}, {response.text}")
-            
-            result = response.json()
-            content = result["choices"][0]["message"]["content"].strip()
-            
-            print(f"🤖 [AI回复] 原始响应: {content}")
-            
-            # 清理响应内容，确保只包含JSON
-            if content.startswith("```json"):
-                content = content[7:-3]
-                print(f"🧹 [清理] 移除了markdown代码块标记")
-            elif content.startswith("```"):
-                content = content[3:-3]
-                print(f"🧹 [清理] 移除了代码块标记")
-            
-            print(f"📝 [清理后] 内容: {content}")
-            
-            # 解析JSON
-            parsed_result = json.loads(content)
-            
-            print(f"✅ [解析成功] AI识别的意图: {parsed_result.get('intent')}")
-            print(f"📊 [解析结果] 完整JSON: {parsed_result}")
-            
-            return parsed_result
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ [JSON错误] 解析失败: {e}")
-            print(f"📄 [原始内容] {content}")
-            print(f"🔄 [备用方案] 使用回退解析方法...")
-            return self._fallback_parse(user_input)
-        except Exception as e:
-            print(f"❌ [API错误] 千问API调用失败: {e}")
-            print(f"🔄 [备用方案] 使用回退解析方法...")
-            return self._fallback_parse(user_input)
     
     def _fallback_parse(self, user_input: str) -> Dict:
         """
-        简单的回退解析方法
+        回退解析：使用本地规则解析器（见 rule_parser）
+
+        指令中有“然后”、“接着”等连接词时拆成多步计划，提到多个网站的搜索为多网站搜索
         """
-        print(f"🛠️  [回退解析] 使用规则引擎分析指令...")
-        print(f"🔍 [关键词检测] 检查用户输入中的网站和操作关键词...")
-        
-        # 检测意图
-        intent = "open_website"  # 默认为最简单的打开网站
-        username = ""
-        password = ""
-        search_query = ""
-        
-        # 检测登录相关关键词
-        login_keywords = ["登录", "登陆", "用户名", "密码", "login", "password"]
-        if any(keyword in user_input for keyword in login_keywords):
-            intent = "open_and_login"
-            print(f"🔐 [意图识别] 检测到登录关键词，意图设为: {intent}")
-            
-            # 提取用户名和密码
-            import re
-            username_match = re.search(r'用户名[：:]?(\w+)', user_input)
-            password_match = re.search(r'密码[：:]?([^\s]+)', user_input)
-            
-            if username_match:
-                username = username_match.group(1)
-                print(f"👤 [提取] 用户名: {username}")
-            if password_match:
-                password = password_match.group(1)
-                print(f"🔑 [提取] 密码: {'*' * len(password)}")
-        else:
-            # 如果不是登录，检查是否是搜索需求
-            # 检测信息查询需求（扩展的关键词）
-            search_keywords = [
-                # 明确搜索词汇
-                "搜索", "搜", "查", "找", "search", "查找", "查询",
-                # 信息查看需求  
-                "查看", "看", "了解", "知道", "获取", "想知道",
-                # 具体信息类型
-                "天气", "新闻", "股价", "汇率", "时间", "地址", "价格",
-                # 学习需求
-                "学习", "教程", "怎么", "如何", "怎样",
-                # 其他查询词汇
-                "什么", "哪里", "为什么", "多少", "几点"
-            ]
-            
-            # 检查是否有信息查询需求
-            has_search = any(keyword in user_input for keyword in search_keywords)
-            
-            # 特殊情况：检查是否包含具体查询内容（非单纯的网站访问）
-            if not has_search:
-                content_indicators = ["今天", "明天", "昨天", "现在", "最新", "热门", "推荐"]
-                has_content = any(indicator in user_input for indicator in content_indicators)
-                if has_content:
-                    has_search = True
-                    print(f"🔍 [内容检测] 发现具体查询内容，判定为搜索需求")
-            
-            # 根据检测结果设置意图
-            if has_search:
-                intent = "open_and_search"
-                print(f"🔍 [意图确认] 检测到信息查询需求，设为搜索任务")
-            else:
-                intent = "open_website"
-                print(f"🌐 [意图确认] 未检测到搜索需求，设为打开网站")
-        
-        # 网站检测
-        print(f"🌐 [网站检测] 分析目标网站...")
-        website_name = ""
-        website_url = ""
-        
-        # 检查是否包含完整URL
-        url_match = re.search(r'https?://[^\s]+', user_input)
-        if url_match:
-            website_url = url_match.group(0)
-            website_name = website_url.split('://')[1].split('/')[0]
-            print(f"🎯 [URL检测] 发现完整URL: {website_url}")
-        else:
-            # 简单的关键词匹配
-            if "知乎" in user_input:
-                website_name = "知乎"
-                website_url = "https://www.zhihu.com"
-            elif "百度" in user_input:
-                website_name = "百度"
-                website_url = "https://www.baidu.com"
-            elif "微博" in user_input:
-                website_name = "微博"
-                website_url = "https://weibo.com"
-            elif "b站" in user_input.lower() or "bilibili" in user_input.lower():
-                website_name = "B站"
-                website_url = "https://www.bilibili.com"
-            elif "豆瓣" in user_input:
-                website_name = "豆瓣"
-                website_url = "https://www.douban.com"
-            else:
-                website_name = "百度"
-                website_url = "https://www.baidu.com"
-                print(f"🔄 [默认选择] 未识别到特定网站，默认使用百度")
-            
-            print(f"🏷️  [网站匹配] 识别网站: {website_name} -> {website_url}")
-        
-        # 提取搜索关键词（仅对搜索任务）
-        if intent == "open_and_search":
-            print(f"📝 [搜索词提取] 分析搜索内容...")
-            search_query = user_input
-            
-            # 使用更智能的搜索词提取
-            import re
-            
-            # 先尝试从动作词后提取
-            action_words = ["搜索", "搜", "查找", "查询", "查看", "看", "了解", "知道", "获取"]
-            for keyword in action_words:
-                if keyword in user_input:
-                    parts = user_input.split(keyword, 1)
-                    if len(parts) > 1 and parts[1].strip():
-                        search_query = parts[1].strip()
-                        break
-            
-            # 如果没有明确的动作词，智能提取核心内容
-            if search_query == user_input:
-                # 移除网站相关词汇
-                site_words = ["去", "到", "在", "打开", website_name]
-                for word in site_words:
-                    search_query = search_query.replace(word, "")
-                search_query = search_query.strip()
-            
-            # 清理搜索词中的URL和网站名
-            search_query = search_query.replace(website_name, "").strip()
-            search_query = re.sub(r'https?://[^\s]+', '', search_query).strip()
-            
-            # 确保搜索词不为空
-            if not search_query or len(search_query.strip()) < 2:
-                search_query = user_input.strip()
-                # 最后的清理
-                for word in ["打开", "去", "访问", "网站"]:
-                    search_query = search_query.replace(word, "")
-                search_query = search_query.strip()
-                
-                if not search_query:
-                    search_query = "搜索"
-            
-            print(f"🔍 [搜索词] 最终搜索内容: '{search_query}'")
-        
-        result = {
-            "intent": intent,
-            "website_name": website_name,
-            "website_url": website_url,
-            "search_query": search_query,
-            "username": username,
-            "password": password
-        }
-        
-        print(f"✅ [回退完成] 解析结果: {result}")
+        result = get_parser(self.sites).parse(user_input)
+        if result["intent"] == "plan":
+            logger.info("🧩 [多步任务] 指令拆分为%s步: %s", len(result["steps"]),
+                        [step["intent"] for step in result["steps"]])
+        elif result["intent"] == "multi_search":
+            logger.info("🌐 [多网站搜索] 网站: %s，搜索内容: '%s'",
+                        [website["website_name"] for website in result["websites"]], result["search_query"])
+        logger.debug("✅ [回退完成] 解析结果: %s", result)
         return result
 
-# 全局实例
-qwen_agent = QwenAgent()
+_agent: Optional[QwenAgent] = None
+
+def get_agent(config: Optional[QwenConfig] = None,
+              intent_cache_config: Optional[IntentCacheConfig] = None,
+              sites_config: Optional[SitesConfig] = None) -> QwenAgent:
+    """
+    获取全局实例（首次使用时才创建）
+
+    三项配置应来自同一份 AppConfig；为空时使用进程配置（只用于兼容模块级的 parse_user_input）
+    """
+    global _agent
+    if _agent is None:
+        if config is None or intent_cache_config is None or sites_config is None:
+            app_config = get_config()
+            config = config or app_config.qwen
+            intent_cache_config = intent_cache_config or app_config.intent_cache
+            sites_config = sites_config or app_config.sites
+        _agent = QwenAgent(config, intent_cache=get_intent_cache(intent_cache_config),
+                           sites=get_registry(sites_config))
+    return _agent
+
+def __getattr__(name: str):
+    # 兼容旧代码中的 `from qwen_agent import qwen_agent`
+    if name == "qwen_agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def parse_user_input(user_input: str) -> Dict:
     """
     便捷函数，用于解析用户输入
     """
-    return qwen_agent.parse_user_input(user_input)
\ No newline at end of file
+    return get_agent().parse_user_input(user_input)
\ No newline at end of file
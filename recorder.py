@@ -0,0 +1,137 @@
+"""
+任务录制
+
+录制一次任务执行的完整信息，用于复现慢任务和失败任务、在同一工作负载上比较性能：
+- 解析出的 task_info（密码脱敏）
+- 每个步骤（导航、搜索、等待结果、提取、登录）的耗时和状态
+- 元素选择器的解析过程（尝试了哪些选择器、最终命中哪个、耗时）
+- 可选的HAR网络录制，回放时用来代替真实网络
+
+录制器通过 ContextVar 传递，控制器各处用 record_step / record_selector 记录，没有录制时不做任何事
+"""
+import copy
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from har import HarRecorder, save_har
+
+if TYPE_CHECKING:
+    from pyppeteer.page import Page
+
+RECORDING_VERSION = 1
+PASSWORD_MASK = "******"
+
+_current: ContextVar[Optional["TaskRecorder"]] = ContextVar("task_recorder", default=None)
+
+def current_recorder() -> Optional["TaskRecorder"]:
+    return _current.get()
+
+def mask_task_info(task_info: Dict) -> Dict:
+    """复制任务信息并隐藏密码（包括多步计划中的每一步）"""
+    masked = copy.deepcopy(task_info)
+    for item in [masked] + list(masked.get("steps") or []):
+        if item.get("password"):
+            item["password"] = PASSWORD_MASK
+    return masked
+
+def _passwords(task_info: Dict) -> List[str]:
+    return [item["password"] for item in [task_info] + list(task_info.get("steps") or []) if item.get("password")]
+
+@contextmanager
+def record_step(name: str, **detail) -> Iterator[None]:
+    """记录一个步骤的耗时；步骤抛出异常时状态记为 error"""
+    recorder = _current.get()
+    if recorder is None:
+        yield
+        return
+    started = time.monotonic()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        recorder.steps.append({
+            "name": name,
+            "offset": started - recorder.started,
+            "elapsed": time.monotonic() - started,
+            "status": status,
+            "detail": detail,
+        })
+
+def record_selector(element_type: str, candidates: List[str], resolved: Optional[str], elapsed: float):
+    """记录一次元素查找：候选选择器、命中的选择器（未找到为None）和耗时"""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.selectors.append({
+            "element": element_type,
+            "candidates": list(candidates),
+            "resolved": resolved,
+            "elapsed": elapsed,
+        })
+
+class TaskRecorder:
+    """一次任务执行的录制"""
+
+    def __init__(self, task_info: Dict, capture_har: bool = False):
+        self.task_info = mask_task_info(task_info)
+        self.started = time.monotonic()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.steps: List[Dict] = []
+        self.selectors: List[Dict] = []
+        self.har = HarRecorder(secrets=_passwords(task_info)) if capture_har else None
+        self._token = None
+
+    def activate(self):
+        """设为当前任务的录制器（同一个 asyncio 任务及其子任务可见）"""
+        self._token = _current.set(self)
+
+    def deactivate(self):
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def attach(self, page: "Page"):
+        """录制该页面的网络请求（只在开启HAR录制时生效）"""
+        if self.har is not None:
+            self.har.attach(page)
+
+    def to_dict(self, result: Optional[Dict] = None, error: Optional[str] = None) -> Dict:
+        return {
+            "version": RECORDING_VERSION,
+            "recorded_at": self.started_at,
+            "task_info": self.task_info,
+            "elapsed": time.monotonic() - self.started,
+            "steps": self.steps,
+            "selectors": self.selectors,
+            "result": result,
+            "error": error,
+        }
+
+    async def save(self, directory: str, result: Optional[Dict] = None, error: Optional[str] = None) -> str:
+        """把录制写入目录，返回录制文件路径；开启HAR录制时同目录写入同名 .har 文件"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base = os.path.join(directory, f"{stamp}_{self.task_info.get('intent') or 'task'}")
+        data = self.to_dict(result, error)
+        if self.har is not None:
+            har_path = base + ".har"
+            save_har(await self.har.finish(), har_path)
+            data["har"] = os.path.basename(har_path)
+        path = base + ".json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
+
+def load_recording(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != RECORDING_VERSION:
+        raise ValueError(f"不支持的录制版本: {data.get('version')}")
+    return data
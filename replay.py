@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+任务回放：按录制的 task_info 重新执行任务，比较每个步骤的耗时
+
+用法:
+    python replay.py recordings/20240101-120000-000000_open_and_search.json
+    python replay.py RECORDING --repeat 5                # 同一任务执行5次，取平均耗时
+    python replay.py RECORDING --live                    # 忽略HAR，访问真实网站
+    python replay.py RECORDING --password xxx            # 登录任务的密码在录制中已脱敏，需要重新提供
+
+录制带有HAR时默认用HAR应答所有请求，未录到的请求直接中止，回放不联网、结果可复现；
+--allow-network 时未录到的请求放行到真实网络
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import load_config
+from har import HarReplayer, load_har
+from recorder import PASSWORD_MASK, TaskRecorder, load_recording
+
+def restore_password(task_info: Dict, password: Optional[str]) -> Dict:
+    """把脱敏的密码替换为命令行提供的密码"""
+    for item in [task_info] + list(task_info.get("steps") or []):
+        if item.get("password") == PASSWORD_MASK:
+            if not password:
+                raise SystemExit("❌ 录制中的密码已脱敏，请用 --password 提供密码")
+            item["password"] = password
+    return task_info
+
+def print_comparison(recorded: Dict, replays: List[Dict]):
+    """按顺序对齐录制和回放的步骤，打印耗时对比"""
+    print("\n" + "=" * 72)
+    print(f"{'步骤':<20}{'录制(秒)':>10}{'回放平均(秒)':>14}{'回放最快(秒)':>14}{'状态':>10}")
+    for index, step in enumerate(recorded["steps"]):
+        timings = [replay["steps"][index] for replay in replays if index < len(replay["steps"])]
+        if timings:
+            elapsed = [item["elapsed"] for item in timings]
+            statuses = "/".join(sorted({item["status"] for item in timings}))
+            print(f"{step['name']:<20}{step['elapsed']:>10.3f}{sum(elapsed) / len(elapsed):>14.3f}"
+                  f"{min(elapsed):>14.3f}{statuses:>10}")
+        else:
+            print(f"{step['name']:<20}{step['elapsed']:>10.3f}{'-':>14}{'-':>14}{'缺失':>10}")
+    totals = [replay["elapsed"] for replay in replays]
+    print(f"{'总计':<20}{recorded['elapsed']:>10.3f}{sum(totals) / len(totals):>14.3f}{min(totals):>14.3f}")
+    print("=" * 72)
+
+    recorded_selectors = {(item["element"], item["resolved"]) for item in recorded["selectors"]}
+    for replay in replays:
+        for item in replay["selectors"]:
+            if (item["element"], item["resolved"]) not in recorded_selectors:
+                print(f"⚠️  [选择器] {item['element']} 回放时命中 {item['resolved']}，与录制不同")
+
+async def replay(args) -> List[Dict]:
+    from browser_controller import BrowserController
+
+    recording = load_recording(args.recording)
+    task_info = restore_password(recording["task_info"], args.password)
+
+    config = load_config()
+    # 回放要真正执行每一次，不走结果缓存，也不再产生新的录制
+    config.cache.enabled = False
+    config.recording.directory = ""
+    controller = BrowserController(config)
+
+    replayer = None
+    if recording.get("har") and not args.live:
+        har_path = os.path.join(os.path.dirname(os.path.abspath(args.recording)), recording["har"])
+        replayer = HarReplayer(load_har(har_path), allow_network=args.allow_network)
+        controller.add_request_interceptor(replayer.handle)
+        print(f"📼 [回放] 使用HAR: {har_path}")
+    else:
+        print("🌐 [回放] 访问真实网站")
+
+    replays = []
+    try:
+        for index in range(args.repeat):
+            print(f"\n▶️  [回放] 第{index+1}/{args.repeat}次")
+            recorder = TaskRecorder(task_info)
+            recorder.activate()
+            result = None
+            error = None
+            try:
+                result = await controller.perform_task(task_info)
+            except Exception as e:
+                error = str(e)
+            finally:
+                recorder.deactivate()
+            replays.append(recorder.to_dict(result.to_dict() if result else None, error))
+    finally:
+        await controller.close_browser()
+
+    print_comparison(recording, replays)
+    if replayer is not None:
+        print(f"📼 [回放] HAR应答 {replayer.served} 个请求，未录到 {len(replayer.missed)} 个")
+        for url in replayer.missed[:10]:
+            print(f"   未录到: {url}")
+    return replays
+
+def main():
+    parser = argparse.ArgumentParser(description="回放任务录制并比较步骤耗时")
+    parser.add_argument("recording", help="任务录制文件（.json）")
+    parser.add_argument("--repeat", type=int, default=1, help="回放次数")
+    parser.add_argument("--live", action="store_true", help="忽略HAR，访问真实网站")
+    parser.add_argument("--allow-network", action="store_true", help="HAR中没有的请求放行到真实网络")
+    parser.add_argument("--password", help="登录任务的密码")
+    parser.add_argument("--output", help="把每次回放的录制写入JSON文件")
+    args = parser.parse_args()
+
+    replays = asyncio.run(replay(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(replays, f, ensure_ascii=False, indent=2)
+        print(f"💾 回放结果已写入 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+远程调用的弹性策略：单次超时、抖动重试、对冲请求和熔断器
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+import metrics
+from structured_log import get_logger
+
+logger = get_logger("resilience")
+
+_breaker_state = metrics.gauge("circuit_breaker_state", "熔断器状态 (0=closed, 1=half_open, 2=open)")
+_breaker_transitions = metrics.counter("circuit_breaker_transitions_total", "熔断器状态切换次数")
+_call_attempts = metrics.counter("remote_call_attempts_total", "远程调用尝试次数")
+_call_hedges = metrics.counter("remote_call_hedges_total", "发出的对冲请求次数")
+_call_latency = metrics.histogram("remote_call_latency_seconds", "单次远程调用耗时")
+
+
+class RetryableError(Exception):
+    """可重试的错误（429、5xx、超时、连接失败）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被直接拒绝"""
+
+
+class CircuitBreaker:
+    """
+    连续失败达到阈值后打开，冷却时间过后进入半开状态放行探测请求
+    """
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        _breaker_state.set(0, name=name)
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            self._state = state
+            _breaker_state.set(self._STATE_VALUES[state], name=self.name)
+            _breaker_transitions.inc(name=self.name, state=state)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self._set_state(self.HALF_OPEN)
+                self._half_open_calls = 0
+            return self._state
+
+    def allow_request(self) -> bool:
+        """判断当前是否允许发起调用"""
+        state = self.state
+        with self._lock:
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._set_state(self.CLOSED)
+
+    def release_probe(self):
+        """
+        调用结束但没有记录成功或失败（如非可重试错误）时归还半开状态的探测名额，
+        否则名额耗尽后熔断器会一直停在半开状态拒绝所有调用
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def snapshot(self) -> Dict:
+        state = self.state
+        return {"name": self.name, "state": state, "consecutive_failures": self._failures}
+
+
+class LatencyWindow:
+    """最近N次成功调用的耗时，用于估算对冲延迟"""
+
+    def __init__(self, size: int = 100):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class RetryPolicy:
+    """指数退避 + 全抖动"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第attempt次失败后的等待时间（attempt从0开始）"""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+class ResilientCaller:
+    """
+    包装一个 fn(timeout) 形式的同步调用，提供单次超时、重试、对冲和熔断
+    """
+
+    def __init__(self, name: str, attempt_timeout: float = 15.0, retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, hedge_enabled: bool = False,
+                 hedge_min_delay: float = 0.5, hedge_min_samples: int = 20, max_workers: int = 4):
+        self.name = name
+        self.attempt_timeout = attempt_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = LatencyWindow()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-call")
+
+    def hedge_delay(self) -> Optional[float]:
+        """对冲延迟取最近成功调用的p95，样本不足时不对冲"""
+        if not self.hedge_enabled or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latencies.percentile(95))
+
+    def call(self, fn: Callable[[float], object]):
+        """执行调用，熔断打开时抛出 CircuitOpenError"""
+        if not self.breaker.allow_request():
+            _call_attempts.inc(name=self.name, outcome="rejected")
+            raise CircuitOpenError(f"{self.name} 熔断器已打开")
+
+        last_error: Optional[RetryableError] = None
+        # 是否已向熔断器记录了本次调用的结果
+        settled = False
+        try:
+            for attempt in range(self.retry_policy.max_attempts):
+                try:
+                    result = self._attempt(fn)
+                except RetryableError as e:
+                    last_error = e
+                    self.breaker.record_failure()
+                    settled = True
+                    _call_attempts.inc(name=self.name, outcome="retryable_error")
+                    if attempt == self.retry_policy.max_attempts - 1:
+                        break
+                    delay = self.retry_policy.backoff(attempt, e.retry_after)
+                    logger.warning("⏳ [重试] %s 第%s次调用失败(%s)，%.2f秒后重试...", self.name, attempt+1, e, delay)
+                    time.sleep(delay)
+                    if not self.breaker.allow_request():
+                        raise CircuitOpenError(f"{self.name} 熔断器已打开") from e
+                    settled = False
+                    continue
+                except Exception:
+                    # 非可重试错误说明服务有响应，不计入熔断
+                    _call_attempts.inc(name=self.name, outcome="error")
+                    raise
+                self.breaker.record_success()
+                settled = True
+                _call_attempts.inc(name=self.name, outcome="success")
+                return result
+            raise last_error
+        finally:
+            if not settled:
+                self.breaker.release_probe()
+
+    def _attempt(self, fn: Callable[[float], object]):
+        """单次尝试（可能包含一个对冲请求），总耗时不超过 attempt_timeout"""
+        started = time.monotonic()
+        futures = [self._executor.submit(self._timed, fn)]
+
+        delay = self.hedge_delay()
+        if delay is not None and delay < self.attempt_timeout:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                _call_hedges.inc(name=self.name)
+                futures.append(self._executor.submit(self._timed, fn))
+
+        pending = set(futures)
+        first_error: Optional[BaseException] = None
+        while pending:
+            remaining = self.attempt_timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                first_error = first_error or error
+        if first_error is not None and not pending:
+            raise first_error
+        raise RetryableError(f"{self.name} 调用超时（{self.attempt_timeout}秒）")
+
+    def _timed(self, fn: Callable[[float], object]):
+        started = time.monotonic()
+        result = fn(self.attempt_timeout)
+        elapsed = time.monotonic() - started
+        self.latencies.add(elapsed)
+        _call_latency.observe(elapsed, name=self.name)
+        return result
+
+    def health(self) -> Dict:
+        """当前健康状态"""
+        snapshot = self.breaker.snapshot()
+        snapshot.update({
+            "p50_latency": self.latencies.percentile(50),
+            "p95_latency": self.latencies.percentile(95),
+            "hedge_delay": self.hedge_delay(),
+        })
+        return snapshot
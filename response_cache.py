@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+请求拦截层的磁盘响应缓存
+
+开启请求拦截（屏蔽资源、HAR回放）后Chrome会关闭自身的HTTP缓存，隐身上下文也不保留缓存，
+反复打开同一个首页时每次都要重新下载相同的静态资源。这里在拦截层补上一个跨进程的磁盘缓存：
+- 按URL保存响应（HAR格式的响应头 + 单独的响应体文件），同时记录 ETag/Last-Modified 校验值
+- 缓存由所有隐身上下文共用：Cache-Control: private 的响应不缓存，Set-Cookie 头不保存也不回放
+- 新鲜期按 Cache-Control/Expires 计算，没有时按 Last-Modified 的启发式规则（距今时长的10%）
+- 在线模式只用缓存应答静态资源（样式、脚本、图片、字体、媒体），页面和接口始终走网络
+- 离线模式用缓存应答所有请求并忽略新鲜期，未缓存的请求直接中止，用于不联网的基准测试
+- 缓存总大小有上限，超出时按最近最少使用淘汰
+- 页面响应的磁盘读写放到线程池，不阻塞事件循环；索引只在内存中标记为已修改，
+  攒够一批或间隔一段时间再写盘，关闭浏览器时写入剩余的修改
+
+用法:
+    python response_cache.py stats
+    python response_cache.py import recordings/xxx.har    # 把任务录制的HAR导入缓存，供离线模式使用
+    python response_cache.py clear
+"""
+import argparse
+import asyncio
+import email.utils
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from har import SKIP_REPLAY_HEADERS, entry_body, header_dict, load_har
+from structured_log import get_logger
+
+if TYPE_CHECKING:
+    from pyppeteer.network_manager import Request, Response
+    from pyppeteer.page import Page
+
+logger = get_logger("response_cache")
+
+_cache_requests = metrics.counter("response_cache_requests_total", "响应缓存处理的请求数（hit/miss/offline_miss）")
+_cache_bytes = metrics.gauge("response_cache_bytes", "响应缓存占用的磁盘空间")
+
+# 在线模式下可以用缓存应答的资源类型
+STATIC_RESOURCE_TYPES = {"stylesheet", "script", "image", "font", "media"}
+
+INDEX_FILE = "index.json"
+
+# 会话相关的响应头：缓存跨隐身上下文共用，回放别的上下文的 Cookie 会破坏隔离
+SESSION_HEADERS = {"set-cookie", "set-cookie2"}
+
+# 索引攒够这么多次修改，或距上次写盘超过这么多秒时写盘
+FLUSH_BATCH = 50
+FLUSH_INTERVAL = 5.0
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """解析 Cache-Control，如 'public, max-age=60' -> {'public': None, 'max-age': '60'}"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def freshness_lifetime(headers: Dict[str, str], now: float) -> Optional[float]:
+    """
+    响应的新鲜期（秒）；不允许缓存时返回None
+
+    优先 max-age，其次 Expires - Date，最后按 Last-Modified 启发式估算（距 Date 时长的10%）
+    """
+    headers = {name.lower(): value for name, value in headers.items()}
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives or "private" in directives:
+        # private 的响应只属于某个用户，不能放进共用的缓存
+        return None
+    vary = {item.strip().lower() for item in headers.get("vary", "").split(",") if item.strip()}
+    if vary - {"accept-encoding"}:
+        # 响应随请求头变化（如 Cookie、User-Agent），按URL缓存会串
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    if directives.get("max-age") is not None:
+        try:
+            return max(0.0, float(directives["max-age"]))
+        except ValueError:
+            return 0.0
+    date = _http_date(headers.get("date")) or now
+    expires = _http_date(headers.get("expires"))
+    if "expires" in headers:
+        return max(0.0, expires - date) if expires is not None else 0.0
+    last_modified = _http_date(headers.get("last-modified"))
+    if last_modified is not None:
+        return max(0.0, (date - last_modified) * 0.1)
+    return 0.0
+
+class ResponseCache:
+    """
+    按URL保存响应的磁盘LRU缓存，handle 作为请求拦截器，attach 监听页面响应写入缓存
+
+    mode 与 RESPONSE_CACHE_MODE 一致：static / record / offline
+    """
+
+    def __init__(self, directory: str, max_bytes: int, mode: str = "static",
+                 clock: Callable[[], float] = time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self._clock = clock
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # 缓存自己应答的请求（按请求对象记录，请求被回收后自动移除）
+        self._served: "weakref.WeakSet[Request]" = weakref.WeakSet()
+        self.total_bytes = 0
+        # 索引自上次写盘以来的修改次数
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.directory, "bodies", key)
+
+    def _load_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = []
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  [响应缓存] 索引损坏，清空缓存: %s", e)
+            entries = []
+        for entry in entries:
+            if os.path.exists(self._body_path(entry["key"])):
+                self._entries[entry["key"]] = entry
+                self.total_bytes += entry["size"]
+        _cache_bytes.set(self.total_bytes)
+
+    @property
+    def dirty(self) -> bool:
+        """索引是否有尚未写盘的修改"""
+        return self._pending > 0
+
+    @staticmethod
+    def _tmp_path(path: str) -> str:
+        # 线程池中可能同时写同一个文件，临时文件名按进程和线程区分
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _write_index(self, entries):
+        path = os.path.join(self.directory, INDEX_FILE)
+        tmp_path = self._tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _snapshot(self):
+        """取出索引的快照（含LRU顺序）并清除修改标记"""
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        return [dict(entry) for entry in self._entries.values()]
+
+    def _mark_dirty(self):
+        self._pending += 1
+
+    def _flush_due(self) -> bool:
+        return self._pending >= FLUSH_BATCH or \
+            (self._pending > 0 and time.monotonic() - self._last_flush >= FLUSH_INTERVAL)
+
+    def flush(self):
+        """把索引写入磁盘（同步，用于命令行和导入）；没有修改时不写"""
+        if self.dirty:
+            self._write_index(self._snapshot())
+
+    async def flush_async(self):
+        """在线程池中把索引写入磁盘；没有修改时不写，写入失败时保留修改标记留待下次"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self.dirty:
+                return
+            pending = self._pending
+            snapshot = self._snapshot()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write_index, snapshot)
+            except OSError as e:
+                self._pending += pending
+                logger.warning("⚠️  [响应缓存] 索引写入失败: %s", e)
+
+    async def close(self):
+        """写入尚未写盘的索引修改"""
+        await self.flush_async()
+
+    def lookup(self, url: str, resource_type: str) -> Optional[Dict]:
+        """
+        查找可用于应答的缓存条目：离线模式忽略新鲜期和资源类型，在线模式只返回新鲜的静态资源
+        """
+        key = self.make_key(url)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.mode != "offline":
+            if resource_type not in STATIC_RESOURCE_TYPES or self._clock() >= entry["expires_at"]:
+                return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def read_body(self, entry: Dict) -> bytes:
+        with open(self._body_path(entry["key"]), "rb") as f:
+            return f.read()
+
+    def _write_body(self, key: str, body: bytes):
+        tmp_path = self._tmp_path(self._body_path(key))
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, self._body_path(key))
+
+    def _remove_bodies(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+
+    def _revalidate(self, key: str, headers: Dict[str, str], lifetime: float) -> Optional[Dict]:
+        """校验值（ETag/Last-Modified）与已有条目一致时只刷新新鲜期并返回该条目"""
+        lowered = {name.lower(): value for name, value in headers.items()}
+        etag = lowered.get("etag")
+        last_modified = lowered.get("last-modified")
+        existing = self._entries.get(key)
+        if existing is not None and (etag or last_modified) and \
+                (existing.get("etag"), existing.get("last_modified")) == (etag, last_modified):
+            existing["expires_at"] = self._clock() + lifetime
+            self._entries.move_to_end(key)
+            self._mark_dirty()
+            return existing
+        return None
+
+    def _add_entry(self, key: str, url: str, status: int, headers: Dict[str, str], resource_type: str,
+                   size: int, lifetime: float) -> Dict:
+        """响应体写入后更新内存中的索引，返回新条目"""
+        lowered = {name.lower(): value for name, value in headers.items()}
+        now = self._clock()
+        existing = self._entries.pop(key, None)
+        if existing is not None:
+            self.total_bytes -= existing["size"]
+        entry = {
+            "key": key,
+            "url": url,
+            "status": status,
+            "headers": {name: value for name, value in headers.items() if name.lower() not in SESSION_HEADERS},
+            "resource_type": resource_type,
+            "size": size,
+            "etag": lowered.get("etag"),
+            "last_modified": lowered.get("last-modified"),
+            "stored_at": now,
+            "expires_at": now + lifetime,
+        }
+        self._entries[key] = entry
+        self.total_bytes += size
+        self._mark_dirty()
+        return entry
+
+    def store(self, url: str, status: int, headers: Dict[str, str], resource_type: str, body: bytes,
+              lifetime: float) -> Optional[Dict]:
+        """
+        写入一条响应（同步，用于命令行和导入）；校验值与已有条目一致时只刷新新鲜期，不重写响应体
+
+        索引只标记为已修改，由调用方在结束时 flush
+        """
+        key = self.make_key(url)
+        existing = self._revalidate(key, headers, lifetime)
+        if existing is not None:
+            return existing
+        if len(body) > self.max_bytes:
+            return None
+        self._write_body(key, body)
+        entry = self._add_entry(key, url, status, headers, resource_type, len(body), lifetime)
+        self._remove_bodies(self._evict())
+        return entry
+
+    async def store_async(self, url: str, status: int, headers: Dict[str, str], resource_type: str, body: bytes,
+                          lifetime: float) -> Optional[Dict]:
+        """同 store，但磁盘读写放到线程池；索引攒够一批或到了写盘间隔时写盘"""
+        key = self.make_key(url)
+        entry = self._revalidate(key, headers, lifetime)
+        if entry is None and len(body) <= self.max_bytes:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_body, key, body)
+            entry = self._add_entry(key, url, status, headers, resource_type, len(body), lifetime)
+            evicted = self._evict()
+            if evicted:
+                await loop.run_in_executor(None, self._remove_bodies, evicted)
+        if self._flush_due():
+            await self.flush_async()
+        return entry
+
+    def _evict(self):
+        """超出大小上限时从内存索引中淘汰最近最少使用的条目，返回被淘汰的键（响应体由调用方删除）"""
+        evicted = []
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry["size"]
+            evicted.append(key)
+        if evicted:
+            self._mark_dirty()
+        _cache_bytes.set(self.total_bytes)
+        return evicted
+
+    def clear(self):
+        for key in list(self._entries):
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+        self._entries.clear()
+        self.total_bytes = 0
+        _cache_bytes.set(0)
+        self._mark_dirty()
+        self.flush()
+
+    def import_har(self, har: Dict) -> int:
+        """导入HAR中所有成功的GET响应（通常来自 TASK_RECORD_HAR 的任务录制），返回导入条数"""
+        count = 0
+        for entry in har["log"]["entries"]:
+            if entry["request"]["method"] != "GET" or entry["response"]["status"] != 200:
+                continue
+            headers = header_dict(entry["response"].get("headers"))
+            lifetime = freshness_lifetime(headers, self._clock())
+            if self.store(entry["request"]["url"], 200, headers, entry.get("_resourceType", "other"),
+                          entry_body(entry), lifetime or 0.0):
+                count += 1
+        self.flush()
+        return count
+
+    async def handle(self, request: "Request") -> bool:
+        """请求拦截器：命中时用缓存应答；离线模式下未命中的请求直接中止"""
+        entry = self.lookup(request.url, request.resourceType) if request.method == "GET" else None
+        if entry is not None:
+            try:
+                body = await asyncio.get_running_loop().run_in_executor(None, self.read_body, entry)
+            except OSError:
+                body = None
+            if body is not None:
+                _cache_requests.inc(outcome="hit")
+                self._served.add(request)
+                await request.respond({
+                    "status": entry["status"],
+                    "headers": {name: value for name, value in entry["headers"].items()
+                                if name.lower() not in SKIP_REPLAY_HEADERS | SESSION_HEADERS},
+                    "body": body,
+                })
+                return True
+        if self.mode == "offline":
+            _cache_requests.inc(outcome="offline_miss")
+            await request.abort()
+            return True
+        _cache_requests.inc(outcome="miss")
+        return False
+
+    def attach(self, page: "Page"):
+        """监听页面响应，把可缓存的响应写入缓存（离线模式不写入）"""
+        if self.mode != "offline":
+            page.on("response", lambda response: asyncio.ensure_future(self._on_response(response)))
+
+    async def _on_response(self, response: "Response"):
+        request = response.request
+        if request in self._served:
+            # 缓存自己应答的响应
+            self._served.discard(request)
+            return
+        if request.method != "GET" or response.status != 200:
+            return
+        if self.mode != "record" and request.resourceType not in STATIC_RESOURCE_TYPES:
+            return
+        lifetime = freshness_lifetime(response.headers, self._clock())
+        if lifetime is None or (lifetime <= 0 and self.mode != "record"):
+            return
+        try:
+            body = await response.buffer()
+        except Exception:
+            return
+        try:
+            await self.store_async(request.url, response.status, dict(response.headers), request.resourceType,
+                                   body, lifetime)
+        except OSError as e:
+            logger.warning("⚠️  [响应缓存] 写入失败: %s", e)
+
+def main():
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="管理请求拦截层的磁盘响应缓存")
+    parser.add_argument("command", choices=["stats", "import", "clear"])
+    parser.add_argument("har", nargs="*", help="import 时要导入的HAR文件")
+    args = parser.parse_args()
+
+    config = load_config().response_cache
+    cache = ResponseCache(config.directory, config.max_size_mb * 1024 * 1024, mode="record")
+    if args.command == "import":
+        for path in args.har:
+            print(f"📥 [响应缓存] {path}: 导入 {cache.import_har(load_har(path))} 条响应")
+    elif args.command == "clear":
+        cache.clear()
+        print("🧹 [响应缓存] 已清空")
+    print(f"📊 [响应缓存] {config.directory}: {len(cache)} 条，{cache.total_bytes / 1024 / 1024:.1f}MB / {config.max_size_mb}MB")
+
+if __name__ == "__main__":
+    main()
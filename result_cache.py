@@ -0,0 +1,128 @@
+"""
+搜索结果缓存
+
+按 (网站, 规范化搜索词) 缓存提取出的搜索结果：
+- 新鲜期内直接返回，不启动浏览器
+- 过期但仍在陈旧窗口内时先返回旧结果，同时在后台刷新（stale-while-revalidate）；
+  后台刷新在全新的 contextvars 上下文中运行，不继承触发它的任务的隐身上下文、录制器等
+- 同一个键的并发未命中共享一次浏览器执行
+"""
+import asyncio
+import contextvars
+import dataclasses
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+import metrics
+from results import TaskResult
+from singleflight import AsyncSingleFlight
+from structured_log import get_logger
+
+logger = get_logger("result_cache")
+
+_cache_lookups = metrics.counter("result_cache_lookups_total", "搜索结果缓存查询次数")
+_cache_entries = metrics.gauge("result_cache_entries", "搜索结果缓存条目数")
+
+CacheKey = Tuple[str, str]
+
+def normalize_query(query: str) -> str:
+    """搜索词规范化：去掉首尾空白、合并连续空白、英文转小写"""
+    return re.sub(r"\s+", " ", query.strip()).lower()
+
+@dataclasses.dataclass
+class CacheEntry:
+    result: TaskResult
+    stored_at: float
+    ttl: float
+
+class ResultCache:
+    """
+    带新鲜期、陈旧窗口和请求合并的LRU缓存
+
+    loader 是无参协程函数，返回 TaskResult；只有成功且带结果的 TaskResult 会被缓存
+    """
+
+    def __init__(self, default_ttl: float = 300.0, stale_ttl: float = 600.0, max_entries: int = 256,
+                 clock: Callable[[], float] = time.monotonic):
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._flight = AsyncSingleFlight("result_cache")
+
+    @staticmethod
+    def make_key(site_name: str, query: str) -> CacheKey:
+        return (site_name, normalize_query(query))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        _cache_entries.set(0)
+
+    async def get_or_fetch(self, site_name: str, query: str, loader: Callable[[], Awaitable[TaskResult]],
+                           ttl: Optional[float] = None,
+                           refresher: Optional[Callable[[], Awaitable[TaskResult]]] = None) -> TaskResult:
+        """
+        查询缓存，未命中时调用 loader；ttl 为空时使用默认新鲜期
+
+        refresher 用于后台刷新，为空时使用 loader。后台刷新比触发它的任务活得久，
+        不能依赖调用方的上下文（如任务结束时就会关闭的隐身上下文），需要自己准备执行环境。
+        返回的 TaskResult 是副本，命中缓存时 cached=True
+        """
+        key = self.make_key(site_name, query)
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self._clock() - entry.stored_at
+            if age < entry.ttl:
+                self._entries.move_to_end(key)
+                _cache_lookups.inc(site=site_name, outcome="hit")
+                logger.info("💾 [缓存] 命中: %s / %s", site_name, key[1])
+                return self._cached_copy(entry)
+            if age < entry.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                _cache_lookups.inc(site=site_name, outcome="stale")
+                logger.info("💾 [缓存] 返回过期结果并在后台刷新: %s / %s", site_name, key[1])
+                self._fetch(key, refresher or loader, ttl, context=contextvars.Context())
+                return self._cached_copy(entry)
+            del self._entries[key]
+
+        if self._flight.in_flight(key):
+            _cache_lookups.inc(site=site_name, outcome="coalesced")
+            logger.debug("🔗 [缓存] 相同搜索正在执行，等待其结果: %s / %s", site_name, key[1])
+        else:
+            _cache_lookups.inc(site=site_name, outcome="miss")
+        # shield: 某个调用方被取消时不影响其他等待者
+        result = await asyncio.shield(self._fetch(key, loader, ttl))
+        return result.copy()
+
+    def _fetch(self, key: CacheKey, loader: Callable[[], Awaitable[TaskResult]], ttl: float,
+               context: Optional[contextvars.Context] = None) -> "asyncio.Task":
+        """执行 loader 并写入缓存；同一个键同时只有一次执行，context 见 AsyncSingleFlight.start"""
+        async def fetch():
+            try:
+                result = await loader()
+            except Exception as e:
+                logger.warning("⚠️  [缓存] 获取搜索结果失败: %s", e)
+                raise
+            if result.status == "ok" and result.results:
+                self._store(key, result, ttl)
+            return result
+
+        return self._flight.start(key, fetch, context=context)
+
+    def _store(self, key: CacheKey, result: TaskResult, ttl: float):
+        self._entries[key] = CacheEntry(result=result, stored_at=self._clock(), ttl=ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        _cache_entries.set(len(self._entries))
+
+    @staticmethod
+    def _cached_copy(entry: CacheEntry) -> TaskResult:
+        return entry.result.copy(cached=True, elapsed=0.0)
@@ -0,0 +1,57 @@
+"""
+任务执行结果的数据结构
+"""
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, List, Optional
+
+@dataclass
+class SearchResult:
+    """一条搜索结果"""
+    title: str
+    url: str
+    snippet: str
+    rank: int
+    # 结果来自的网站名称（多网站搜索合并结果时区分来源）
+    site: str = ""
+
+    @classmethod
+    def from_dict(cls, data: Dict, site: str = "") -> "SearchResult":
+        return cls(
+            title=data.get("title", ""),
+            url=data.get("url", ""),
+            snippet=data.get("snippet", ""),
+            rank=int(data.get("rank", 0)),
+            site=data.get("site", site)
+        )
+
+def merge_search_results(result_lists: List[List[SearchResult]]) -> List[SearchResult]:
+    """
+    合并多个网站的搜索结果：按各自排名交错排列（各网站第1条，再各网站第2条……）
+    """
+    indexed = [(item.rank, order, item) for order, items in enumerate(result_lists) for item in items]
+    return [item for _, _, item in sorted(indexed, key=lambda entry: (entry[0], entry[1]))]
+
+@dataclass
+class TaskResult:
+    """perform_task 的返回值"""
+    intent: str
+    website_url: str
+    # 任务结束时页面所在的URL
+    final_url: str = ""
+    results: List[SearchResult] = field(default_factory=list)
+    elapsed: float = 0.0
+    status: str = "ok"
+    error: Optional[str] = None
+    # 结果来自搜索结果缓存（没有启动浏览器）
+    cached: bool = False
+    # 多步计划中每一步的结果；多网站搜索中每个网站的结果
+    steps: List["TaskResult"] = field(default_factory=list)
+
+    def copy(self, **changes) -> "TaskResult":
+        """浅拷贝（结果列表独立），用于把同一次执行的结果分发给多个调用方"""
+        changes.setdefault("results", list(self.results))
+        changes.setdefault("steps", list(self.steps))
+        return replace(self, **changes)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
@@ -0,0 +1,229 @@
+"""
+规则解析器：不调用API，从自然语言指令中识别意图、网站、搜索词和登录信息
+
+原来回退解析（QwenAgent._fallback_parse）、utils.parse_search_intent 和 standalone_test
+各有一套关键词表和网站映射，同一条指令三处结果不一致，而且每次调用都逐个关键词做子串扫描、反复 replace。
+这里统一为一张关键词表：
+- 网站别名和动作词建成一棵前缀树（见 segmenter），按正向最大匹配取词；前缀树编译成的正则
+  与登录字段、URL 这类带值的字段合成一个正则，一次扫描得到词元序列
+- 意图、网站、搜索词、用户名和密码都从词元序列中取，搜索词是原文的一段（去掉其中的网站名）
+- 前缀树在网站注册表变化时才重建，解析是纯函数，不需要API Key
+
+搜索词从“搜索/查一下/看看”等动作词之后开始，动作词前面只能是“帮我、打开、在知乎”这类前缀；
+没有这样的动作词时（如“百度一下深度学习框架”、“今天广州天气”），去掉开头的前缀后整句作为搜索词
+"""
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+from segmenter import Segmenter
+from sites import SiteAdapter, SiteRegistry, get_registry
+from utils import fill_plan_websites
+
+# 关键词表：词 -> 类别
+# search: 明确的搜索动作词；info: 查看、了解类动作词；topic: 说明是信息查询但不是动作词（搜索词包含它）
+# open: 打开网站的动作词；login: 登录；filler: 动作词前可以出现的客套词和连接词
+KEYWORDS: Dict[str, List[str]] = {
+    "search": ["搜索一下", "搜一搜", "搜一下", "搜索", "搜", "查找", "查询", "查一下", "查一查", "查", "找一下",
+               "找一找", "寻找", "找", "search"],
+    "info": ["查看", "看一下", "看看", "看", "了解一下", "了解", "想知道", "知道", "获取", "学习"],
+    "topic": ["天气", "新闻", "股价", "汇率", "时间", "地址", "价格", "教程", "怎么", "如何", "怎样",
+              "什么", "哪里", "为什么", "多少", "几点", "今天", "明天", "昨天", "现在", "最新", "热门", "推荐"],
+    "open": ["打开", "访问", "进入", "前往", "浏览", "open"],
+    "login": ["登录", "登陆", "login"],
+    "filler": ["帮我", "帮忙", "麻烦", "请", "我想", "我要", "想", "先", "一下", "同时", "分别", "并且", "并"],
+}
+
+# 网站名前后可以带的介词和连接词，作为网站词元的一部分（“在知乎上”、“和B站”、“B站的”），不单独成词，
+# 避免把“上海”、“React 和 Vue”这类搜索内容切开
+SITE_PREFIXES = ["还有", "在", "用", "去", "到", "和", "与", "及", "、"]
+SITE_SUFFIXES = ["上", "里", "中", "的"]
+
+# 动作词之前允许出现的词元类别
+PREFIX_KINDS = {"open", "filler", "site", "url", "login"}
+
+# 多步指令的连接词
+PLAN_SEPARATOR = re.compile(r'[，,；;。]?\s*(?:然后|接着|之后再|随后|再去)\s*')
+
+# 词元之间只有空白和标点时视为相邻
+_GAP = re.compile(r'[\s，,。.！!？?：:；;、“”"\'「」]*')
+# 搜索词首尾去掉的空白、标点和引号
+_QUERY_STRIP = " \t\r\n，,。.！!？?：:；;、“”\"'「」"
+
+# 带值的字段：URL、用户名、密码（先按首字符过滤，大多数位置不用逐个尝试分支）
+_FIELDS = (
+    r'(?=[h用账帐u密p])(?:(?P<url>https?://[^\s，,；;。]+)'
+    r'|(?:用户名|账号|帐号|username)\s*(?:是|为)?\s*[：:]?\s*(?P<username>[^\s，,；;。：:]+?)(?=密码|password|[\s，,；;。]|$)'
+    r'|(?:密码|password)\s*(?:是|为)?\s*[：:]?\s*(?P<password>[^\s，,；;。]+))'
+)
+
+class Token(NamedTuple):
+    kind: str
+    start: int
+    end: int
+    value: str = ""
+    site: Optional[SiteAdapter] = None
+
+class RuleParser:
+    """按网站注册表构建的规则解析器"""
+
+    def __init__(self, registry: SiteRegistry):
+        self.registry = registry
+        self.version = registry.version
+        self._segmenter = Segmenter({word: (kind, None) for kind, words in KEYWORDS.items() for word in words})
+        # 网站名连同前后的介词作为一个词（“在知乎上”），最大匹配时优先于单独的网站名
+        for adapter in registry:
+            for alias in adapter.aliases:
+                for prefix in [""] + SITE_PREFIXES:
+                    for suffix in [""] + SITE_SUFFIXES:
+                        self._segmenter.add(prefix + alias + suffix, ("site", adapter))
+        # 字段在前：“用户名”、“password”不会被当成普通词
+        self._pattern = re.compile(f"{_FIELDS}|(?P<word>{self._segmenter.regex()})", re.IGNORECASE)
+
+    def tokenize(self, text: str) -> List[Token]:
+        """一次扫描得到按位置排列的词元"""
+        tokens = []
+        value = self._segmenter.value
+        for match in self._pattern.finditer(text):
+            group = match.lastgroup
+            word = match.group(group)
+            if group == "word":
+                kind, site = value(word)
+                tokens.append(Token(kind, match.start(), match.end(), word, site))
+            else:
+                tokens.append(Token(group, match.start(), match.end(), word))
+        return tokens
+
+    def parse(self, text: str) -> Dict:
+        """
+        解析完整指令：带连接词的拆成多步计划（plan），提到多个网站的搜索为多网站搜索（multi_search），
+        其余为单步任务
+        """
+        segments = [segment.strip() for segment in PLAN_SEPARATOR.split(text) if segment.strip()]
+        if len(segments) < 2:
+            tokens = self.tokenize(text)
+            result = self._parse_tokens(text, tokens)
+            sites = self._sites(tokens)
+            if result["intent"] == "open_and_search" and len(sites) > 1:
+                return {
+                    "intent": "multi_search",
+                    "search_query": result["search_query"],
+                    "websites": [{"website_name": site.name, "website_url": site.home_url} for site in sites]
+                }
+            return result
+
+        steps = []
+        for segment in segments:
+            # 没有提到网站的步骤不使用默认网站，而是沿用上一步的网站
+            steps.append(self._parse_tokens(segment, self.tokenize(segment), use_default_site=False))
+        return fill_plan_websites({"intent": "plan", "steps": steps})
+
+    def parse_search(self, text: str) -> Dict[str, str]:
+        """只识别网站和搜索词（意图固定为搜索），提取不到搜索词时使用整句"""
+        tokens = self.tokenize(text)
+        site = self._first_site(tokens) or self.registry.default()
+        search_query = self._extract_query(text, tokens) or text.strip()
+        return {
+            "intent": "open_and_search",
+            "website_name": site.name,
+            "website_url": site.home_url,
+            "search_query": search_query
+        }
+
+    def _parse_tokens(self, text: str, tokens: List[Token], use_default_site: bool = True) -> Dict:
+        kinds = {token.kind for token in tokens}
+        username = password = search_query = ""
+        if kinds & {"login", "username", "password"}:
+            intent = "open_and_login"
+            username = next((token.value for token in tokens if token.kind == "username"), "")
+            password = next((token.value for token in tokens if token.kind == "password"), "")
+        elif kinds & {"search", "info", "topic"}:
+            search_query = self._extract_query(text, tokens)
+            # 只有动作词没有内容（如“打开知乎看看”）时只是打开网站
+            intent = "open_and_search" if search_query else "open_website"
+        else:
+            intent = "open_website"
+
+        url = next((token for token in tokens if token.kind == "url"), None)
+        site = self._first_site(tokens)
+        if url is not None:
+            website_url = url.value
+            website_name = website_url.split("://", 1)[1].split("/", 1)[0]
+        elif site is not None or use_default_site:
+            site = site or self.registry.default()
+            website_name, website_url = site.name, site.home_url
+        else:
+            website_name = website_url = ""
+
+        return {
+            "intent": intent,
+            "website_name": website_name,
+            "website_url": website_url,
+            "search_query": search_query,
+            "username": username,
+            "password": password
+        }
+
+    def _extract_query(self, text: str, tokens: List[Token]) -> str:
+        """
+        搜索词：取动作词之后的一段，去掉其中的网站名和URL
+
+        动作词前面只有前缀词元（打开、帮我、在知乎…）时才作为起点，避免“如何学习英语”被从“学习”处截断；
+        没有这样的动作词时退而使用第一个明确的搜索动作词，再没有时去掉开头的前缀后整句作为搜索词
+        """
+        start = None
+        position = 0
+        for token in tokens:
+            if not _is_gap(text, position, token.start):
+                break
+            if token.kind in ("search", "info"):
+                start = token.end
+                break
+            if token.kind not in PREFIX_KINDS:
+                break
+            position = token.end
+        if start is None:
+            start = next((token.end for token in tokens if token.kind == "search"), None)
+        if start is None:
+            start = position
+
+        parts = []
+        for token in tokens:
+            if token.start >= start and token.kind in ("site", "url"):
+                parts.append(text[start:token.start])
+                start = token.end
+        parts.append(text[start:])
+        return "".join(parts).strip(_QUERY_STRIP)
+
+    @staticmethod
+    def _first_site(tokens: List[Token]) -> Optional[SiteAdapter]:
+        return next((token.site for token in tokens if token.kind == "site"), None)
+
+    @staticmethod
+    def _sites(tokens: List[Token]) -> List[SiteAdapter]:
+        """提到的所有网站（按出现顺序去重）"""
+        sites: List[SiteAdapter] = []
+        for token in tokens:
+            if token.kind == "site" and token.site not in sites:
+                sites.append(token.site)
+        return sites
+
+def _is_gap(text: str, start: int, end: int) -> bool:
+    return start == end or _GAP.fullmatch(text, start, end) is not None
+
+_parser: Optional[RuleParser] = None
+
+def get_parser(registry: Optional[SiteRegistry] = None) -> RuleParser:
+    """按网站注册表取解析器，注册表有新网站时重建"""
+    global _parser
+    registry = registry or get_registry()
+    if _parser is None or _parser.registry is not registry or _parser.version != registry.version:
+        _parser = RuleParser(registry)
+    return _parser
+
+def parse_command(text: str) -> Dict:
+    """解析一条自然语言指令（不调用API）"""
+    return get_parser().parse(text)
+
+def parse_search(text: str) -> Dict[str, str]:
+    """只识别网站和搜索词"""
+    return get_parser().parse_search(text)
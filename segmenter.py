@@ -0,0 +1,118 @@
+"""
+轻量的词典分词：前缀树 + 正向最大匹配
+
+词典插入前缀树后编译成一个按公共前缀分解的正则（如 知乎、知乎上 -> 知乎(?:上)?），
+每个位置沿树向下、先尝试更长的分支，取最长的词；扫描在正则引擎中完成，
+代价与句子长度成线性（乘以最长词长），与词典大小无关，也不会像普通的多选分支那样逐个词尝试。
+英文词（首尾是字母数字）只在词边界上匹配，避免 "bili" 命中 "abilities"、"open" 命中 "openai"
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, Match, Optional, Tuple
+
+# 前缀树节点中表示“到此为一个完整词”的键（不会与任何单个字符冲突）
+_END = ""
+
+# 英文词的组成字符，用于判断词边界（匹配不区分大小写）
+_WORD_CHAR = re.compile(r'[a-z0-9]', re.IGNORECASE)
+_NOT_AFTER_WORD = r'(?<![a-z0-9])'
+_NOT_BEFORE_WORD = r'(?![a-z0-9])'
+
+class Segmenter:
+    """
+    词典分词器，词典为 词 -> 值（如词的类别），匹配不区分大小写
+
+    >>> segmenter = Segmenter({"人工智能": "word", "的": "stop"})
+    >>> segmenter.segment("人工智能的发展趋势")
+    [('人工智能', 'word'), ('的', 'stop'), ('发展趋势', None)]
+    """
+
+    def __init__(self, words: Optional[Dict[str, object]] = None):
+        self._root: Dict = {}
+        self._values: Dict[str, object] = {}
+        self._pattern: Optional[re.Pattern] = None
+        for word, value in (words or {}).items():
+            self.add(word, value)
+
+    def add(self, word: str, value: object):
+        """加入一个词，同一个词再次加入时覆盖原来的值"""
+        if not word:
+            return
+        word = word.lower()
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = True
+        self._values[word] = value
+        # 下次扫描时重新编译
+        self._pattern = None
+
+    def update(self, words: Iterable[Tuple[str, object]]):
+        for word, value in words:
+            self.add(word, value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, word: str) -> bool:
+        return word.lower() in self._values
+
+    def value(self, word: str) -> object:
+        """词典词对应的值（不区分大小写）"""
+        return self._values[word.lower()]
+
+    def regex(self) -> str:
+        """
+        前缀树编译成的正则源码（不区分大小写编译），可以嵌入更大的正则与其他模式一起扫描
+
+        开头按首字符过滤：大多数位置不是任何词的开头，不必进入分支
+        """
+        branches = []
+        first_chars = set()
+        for char, child in sorted(self._root.items()):
+            first_chars.add(char)
+            guard = _NOT_AFTER_WORD if _WORD_CHAR.match(char) else ""
+            branches.append(guard + re.escape(char) + _node_pattern(child, char))
+        if not branches:
+            # 空词典不匹配任何位置
+            return r'(?!)'
+        first_chars |= {char.upper() for char in first_chars}
+        return f"(?=[{re.escape(''.join(sorted(first_chars)))}])(?:{'|'.join(branches)})"
+
+    def finditer(self, text: str, start: int = 0, end: Optional[int] = None) -> Iterator[Match]:
+        """在 [start, end) 中从左到右找出不重叠的词典词（每个位置取最长的词），返回正则匹配对象"""
+        if self._pattern is None:
+            self._pattern = re.compile(self.regex(), re.IGNORECASE)
+        return self._pattern.finditer(text, start, len(text) if end is None else end)
+
+    def scan(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int, object]]:
+        """同 finditer，返回 [(起点, 终点, 值)]"""
+        values = self._values
+        return [(match.start(), match.end(), values[match.group().lower()])
+                for match in self.finditer(text, start, end)]
+
+    def segment(self, text: str) -> List[Tuple[str, Optional[object]]]:
+        """切分为 [(片段, 值)]，词典外的连续字符合并为一段，值为 None"""
+        pieces: List[Tuple[str, Optional[object]]] = []
+        position = 0
+        for start, end, value in self.scan(text):
+            if start > position:
+                pieces.append((text[position:start], None))
+            pieces.append((text[start:end], value))
+            position = end
+        if position < len(text):
+            pieces.append((text[position:], None))
+        return pieces
+
+def _node_pattern(node: Dict, char: str) -> str:
+    """前缀树节点（经由 char 到达）之后的正则：先尝试更长的分支，不行时如果到此成词就在此结束"""
+    children = [re.escape(child_char) + _node_pattern(child, child_char)
+                for child_char, child in sorted(node.items()) if child_char != _END]
+    boundary = _NOT_BEFORE_WORD if _WORD_CHAR.match(char) else ""
+    if not children:
+        return boundary
+    longer = children[0] if len(children) == 1 else "(?:" + "|".join(children) + ")"
+    if _END not in node:
+        return longer
+    if boundary:
+        return f"(?:{longer}|{boundary})"
+    return f"(?:{longer})?"
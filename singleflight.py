@@ -0,0 +1,161 @@
+"""
+请求合并（single-flight）
+
+相同键的并发调用只执行一次：第一个调用方执行，其余调用方等待并共享同一个结果或异常。
+执行结束后键立即释放，之后的调用会重新执行（不做缓存）
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import re
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+from urllib.parse import urlsplit
+
+import metrics
+
+_flight_calls = metrics.counter("singleflight_calls_total", "single-flight 调用次数（leader 执行，follower 共享结果）")
+
+def _normalize_text(value: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", (value or "").strip()).lower()
+
+def _normalize_url(url: Optional[str]) -> str:
+    """
+    URL规范化：协议和主机名转小写，去掉开头的 www.、默认端口、末尾的 / 和片段，保留路径和查询参数
+
+    同一网站的不同页面（github.com/a/b 与 github.com/c/d、www.baidu.com 与 news.baidu.com）不会相同
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and (scheme, port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/")
+    return f"{scheme}://{host}{path}" + (f"?{parts.query}" if parts.query else "")
+
+def task_fingerprint(task_info: Dict) -> str:
+    """
+    任务指纹：意图、网站、搜索词和账号相同的任务视为同一个任务；
+    多网站搜索比较网站集合，多步计划还要求每一步相同
+
+    网站按规范化的完整URL比较（同一网站的不同页面是不同的任务）；密码只以摘要参与计算
+    """
+    password = task_info.get("password") or ""
+    normalized = {
+        "intent": task_info.get("intent") or "",
+        "site": _normalize_url(task_info.get("website_url")),
+        "query": _normalize_text(task_info.get("search_query")),
+        "username": task_info.get("username") or "",
+        "password": hashlib.sha256(password.encode("utf-8")).hexdigest() if password else "",
+    }
+    if task_info.get("websites"):
+        normalized["websites"] = sorted(_normalize_url(website.get("website_url"))
+                                        for website in task_info["websites"])
+    if task_info.get("steps"):
+        normalized["steps"] = [task_fingerprint(step) for step in task_info["steps"]]
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def input_fingerprint(user_input: str) -> str:
+    """
+    自然语言指令的指纹（只合并空白）
+
+    保留大小写：指令中的账号、密码和搜索词区分大小写，只差大小写的指令不能共享解析结果
+    """
+    return " ".join(user_input.split())
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """线程版：用于同步调用（如千问API解析）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        _flight_calls.inc(name=self.name, role="leader" if leader else "follower")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+class AsyncSingleFlight:
+    """
+    协程版：用于浏览器任务
+
+    执行放在独立的 Task 中，某个调用方被取消不会中断其他调用方共享的执行
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable],
+              context: Optional[contextvars.Context] = None) -> "asyncio.Task":
+        """
+        开始（或加入）一次执行，返回共享的 Task
+
+        context 为执行所在的 contextvars 上下文，为空时复制调用方的上下文（asyncio 的默认行为）
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            _flight_calls.inc(name=self.name, role="follower")
+            return task
+        _flight_calls.inc(name=self.name, role="leader")
+        if context is None:
+            task = asyncio.ensure_future(fn())
+        else:
+            task = context.run(lambda: asyncio.ensure_future(fn()))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._release(key, task))
+        return task
+
+    def _release(self, key: Hashable, task: "asyncio.Task"):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # 没有调用方等待时（如后台刷新）也要取走异常，避免 "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        return await asyncio.shield(self.start(key, fn))
@@ -0,0 +1,269 @@
+"""
+网站适配器注册表
+
+每个网站一个 SiteAdapter，集中描述域名、别名、搜索URL模板、选择器、
+页面就绪信号和登录流程；按可注册域名建立索引，查找为O(1)
+"""
+import json
+import re
+import urllib.parse
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterable, List, Optional
+
+from config import TYPING_STRATEGIES, SitesConfig
+
+# 需要保留三级的公共后缀（简化版的 Public Suffix List）
+MULTI_PART_SUFFIXES = {
+    "com.cn", "net.cn", "org.cn", "gov.cn", "edu.cn", "ac.cn",
+    "com.hk", "com.tw", "co.uk", "org.uk", "co.jp", "co.kr", "com.au", "com.sg"
+}
+
+# 未识别到网站时使用的默认网站
+DEFAULT_SITE = "百度"
+
+def registrable_domain(url_or_host: str) -> str:
+    """
+    提取可注册域名，例如 https://www.baidu.com/ -> baidu.com，s.weibo.com -> weibo.com
+    """
+    text = url_or_host.strip().lower()
+    if "://" in text:
+        host = urllib.parse.urlparse(text).hostname or ""
+    else:
+        host = text.split("/", 1)[0].split(":", 1)[0]
+    labels = [label for label in host.split(".") if label]
+    if len(labels) <= 2:
+        return ".".join(labels)
+    if ".".join(labels[-2:]) in MULTI_PART_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+@dataclass
+class SiteAdapter:
+    """单个网站的全部站点知识"""
+    name: str
+    home_url: str
+    domains: List[str] = field(default_factory=list)
+    aliases: List[str] = field(default_factory=list)
+    # 直接打开搜索结果页的URL模板，{query} 处填入URL编码后的搜索词
+    search_url_template: Optional[str] = None
+    search_input: Optional[str] = None
+    # 为空时按回车提交搜索
+    search_button: Optional[str] = None
+    # 页面可操作的就绪信号（出现即停止等待）
+    ready_selector: Optional[str] = None
+    # 搜索结果条目的选择器，以及条目内标题/链接/摘要的选择器（为空时使用通用规则）
+    result_selector: Optional[str] = None
+    result_title_selector: Optional[str] = None
+    result_link_selector: Optional[str] = None
+    result_snippet_selector: Optional[str] = None
+    # 下一页链接，为空时按“下一页”文字查找
+    next_page_selector: Optional[str] = None
+    # 登录流程：登录页地址和切换到密码登录的选项卡文字
+    login_url: Optional[str] = None
+    password_tab_texts: List[str] = field(default_factory=list)
+    # 输入方式（instant/insertText/human），为空时使用全局配置
+    typing_strategy: Optional[str] = None
+    # 搜索结果缓存的新鲜期（秒），为空时使用全局配置，0 表示不缓存
+    cache_ttl: Optional[float] = None
+
+    def __post_init__(self):
+        if not self.domains:
+            self.domains = [registrable_domain(self.home_url)]
+        if self.name not in self.aliases:
+            self.aliases = [self.name] + list(self.aliases)
+        if self.typing_strategy is not None and self.typing_strategy not in TYPING_STRATEGIES:
+            raise ValueError(f"网站 {self.name} 的输入方式 {self.typing_strategy!r} 无效，可选: {list(TYPING_STRATEGIES)}")
+
+    def search_url(self, query: str) -> Optional[str]:
+        """生成搜索结果页URL，没有模板时返回None"""
+        if not self.search_url_template:
+            return None
+        return self.search_url_template.format(query=urllib.parse.quote(query))
+
+    def strip_aliases(self, text: str) -> str:
+        """从文本中去掉本网站的名称和别名"""
+        for alias in sorted(self.aliases, key=len, reverse=True):
+            text = re.sub(re.escape(alias), "", text, flags=re.IGNORECASE)
+        return text
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SiteAdapter":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"网站配置 {data.get('name')} 包含未知字段: {sorted(unknown)}")
+        return cls(**data)
+
+class SiteRegistry:
+    """按域名和别名索引的网站适配器集合"""
+
+    def __init__(self, adapters: Iterable[SiteAdapter] = ()):
+        self._by_domain: Dict[str, SiteAdapter] = {}
+        self._by_alias: Dict[str, SiteAdapter] = {}
+        self._adapters: Dict[str, SiteAdapter] = {}
+        self._alias_pattern: Optional[re.Pattern] = None
+        # 每次注册加一，依赖别名表的缓存（如规则解析器）据此判断是否需要重建
+        self.version = 0
+        for adapter in adapters:
+            self.register(adapter)
+
+    def register(self, adapter: SiteAdapter):
+        """注册网站，同名网站会被覆盖"""
+        previous = self._adapters.get(adapter.name)
+        if previous is not None:
+            self._unindex(previous)
+        self._adapters[adapter.name] = adapter
+        for domain in adapter.domains:
+            self._by_domain[registrable_domain(domain)] = adapter
+        for alias in adapter.aliases:
+            self._by_alias[alias.lower()] = adapter
+        self._alias_pattern = None
+        self.version += 1
+
+    def _unindex(self, adapter: SiteAdapter):
+        for index in (self._by_domain, self._by_alias):
+            for key in [key for key, value in index.items() if value is adapter]:
+                del index[key]
+
+    def load_file(self, path: str):
+        """从JSON文件加载网站配置（对象列表）"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("sites", [])
+        for item in data:
+            self.register(SiteAdapter.from_dict(item))
+
+    def __iter__(self):
+        return iter(self._adapters.values())
+
+    def __len__(self):
+        return len(self._adapters)
+
+    def get(self, name: str) -> Optional[SiteAdapter]:
+        """按名称或别名查找"""
+        return self._by_alias.get(name.lower())
+
+    def default(self) -> SiteAdapter:
+        return self.get(DEFAULT_SITE) or next(iter(self._adapters.values()))
+
+    def for_url(self, url: str) -> Optional[SiteAdapter]:
+        """按URL查找（忽略子域名、路径和末尾斜杠）"""
+        if not url:
+            return None
+        return self._by_domain.get(registrable_domain(url))
+
+    def _pattern(self) -> re.Pattern:
+        if self._alias_pattern is None:
+            aliases = sorted(self._by_alias, key=len, reverse=True)
+            self._alias_pattern = re.compile("|".join(re.escape(alias) for alias in aliases), re.IGNORECASE)
+        return self._alias_pattern
+
+    def find_in_text(self, text: str) -> Optional[SiteAdapter]:
+        """在自然语言中查找最先出现的网站别名"""
+        match = self._pattern().search(text)
+        if not match:
+            return None
+        return self._by_alias[match.group(0).lower()]
+
+    def find_all_in_text(self, text: str) -> List[SiteAdapter]:
+        """在自然语言中查找提到的所有网站（按出现顺序去重）"""
+        found: List[SiteAdapter] = []
+        for match in self._pattern().finditer(text):
+            adapter = self._by_alias[match.group(0).lower()]
+            if adapter not in found:
+                found.append(adapter)
+        return found
+
+    def prompt_site_list(self) -> str:
+        """给LLM提示词使用的网站列表"""
+        return "\n".join(f"- {adapter.name}: {adapter.home_url}" for adapter in self)
+
+BUILTIN_SITES = [
+    SiteAdapter(
+        name="知乎",
+        home_url="https://www.zhihu.com",
+        aliases=["zhihu"],
+        search_url_template="https://www.zhihu.com/search?type=content&q={query}",
+        search_input="input[placeholder*='搜索']",
+        ready_selector="input[placeholder*='搜索']",
+        result_selector=".SearchResult",
+        login_url="https://www.zhihu.com/signin",
+        password_tab_texts=["密码登录"],
+        typing_strategy="insertText"
+    ),
+    SiteAdapter(
+        name="百度",
+        home_url="https://www.baidu.com",
+        aliases=["baidu"],
+        search_url_template="https://www.baidu.com/s?wd={query}",
+        search_input="input#kw",
+        search_button="input#su",
+        ready_selector="input#kw",
+        result_selector=".result",
+        result_title_selector="h3",
+        result_link_selector="h3 a",
+        login_url="https://passport.baidu.com/v2/?login",
+        password_tab_texts=["账号登录", "用户名登录"],
+        typing_strategy="instant"
+    ),
+    SiteAdapter(
+        name="微博",
+        home_url="https://weibo.com",
+        domains=["weibo.com", "weibo.cn"],
+        aliases=["weibo"],
+        search_url_template="https://s.weibo.com/weibo?q={query}",
+        search_input="input[placeholder*='搜索']",
+        ready_selector="input[placeholder*='搜索']",
+        result_selector=".card-wrap",
+        login_url="https://passport.weibo.com/sso/signin",
+        password_tab_texts=["账号登录", "密码登录"],
+        typing_strategy="human",
+        # 微博搜索结果变化快
+        cache_ttl=60
+    ),
+    SiteAdapter(
+        name="B站",
+        home_url="https://www.bilibili.com",
+        aliases=["b站", "bilibili", "哔哩哔哩", "bili"],
+        search_url_template="https://search.bilibili.com/all?keyword={query}",
+        search_input="input.nav-search-input",
+        ready_selector="input.nav-search-input",
+        result_selector=".video-item",
+        login_url="https://passport.bilibili.com/login",
+        password_tab_texts=["密码登录"],
+        typing_strategy="insertText"
+    ),
+    SiteAdapter(
+        name="豆瓣",
+        home_url="https://www.douban.com",
+        aliases=["douban"],
+        search_url_template="https://www.douban.com/search?q={query}",
+        search_input="input[placeholder*='搜索']",
+        search_button="input[type='submit']",
+        ready_selector="input[placeholder*='搜索']",
+        result_selector=".item",
+        login_url="https://accounts.douban.com/passport/login",
+        password_tab_texts=["密码登录"],
+        typing_strategy="instant"
+    ),
+]
+
+_registry: Optional[SiteRegistry] = None
+_registry_paths: List[str] = []
+
+def get_registry(config: Optional[SitesConfig] = None) -> SiteRegistry:
+    """
+    全局注册表：内置网站 + config.config_paths 中的JSON配置
+
+    入口程序和控制器传入 SitesConfig 加载（配置文件变化时重新加载），
+    其他模块不带参数取用已加载的注册表；还没有加载时只有内置网站
+    """
+    global _registry, _registry_paths
+    paths = list(config.config_paths) if config is not None else _registry_paths
+    if _registry is None or paths != _registry_paths:
+        registry = SiteRegistry(BUILTIN_SITES)
+        for path in paths:
+            registry.load_file(path)
+        _registry, _registry_paths = registry, paths
+    return _registry
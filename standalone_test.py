@@ -5,6 +5,8 @@
 import os
 import json
 
+from rule_parser import parse_command
+
 def load_env_config():
     """加载环境配置"""
     config = {}
@@ -19,51 +21,9 @@ def load_env_config():
 
 def parse_user_input_standalone(user_input: str) -> dict:
     """
-    独立解析用户输入（不调用API）
+    独立解析用户输入（不调用API），使用与回退解析相同的规则解析器
     """
-    # 简单的关键词匹配
-    if "知乎" in user_input:
-        website_name = "知乎"
-        website_url = "https://www.zhihu.com"
-    elif "百度" in user_input:
-        website_name = "百度"
-        website_url = "https://www.baidu.com"
-    elif "微博" in user_input:
-        website_name = "微博"
-        website_url = "https://weibo.com"
-    elif "b站" in user_input.lower() or "bilibili" in user_input.lower():
-        website_name = "B站"
-        website_url = "https://www.bilibili.com"
-    elif "豆瓣" in user_input:
-        website_name = "豆瓣"
-        website_url = "https://www.douban.com"
-    else:
-        website_name = "百度"
-        website_url = "https://www.baidu.com"
-    
-    # 提取搜索关键词
-    search_keywords = ["搜索", "搜", "查", "找"]
-    search_query = user_input
-    for keyword in search_keywords:
-        if keyword in user_input:
-            parts = user_input.split(keyword, 1)
-            if len(parts) > 1:
-                search_query = parts[1].strip()
-                break
-    
-    # 清理搜索词
-    search_query = search_query.replace(website_name, "").strip()
-    
-    # 确保搜索词不为空
-    if not search_query:
-        search_query = "默认搜索"
-    
-    return {
-        "intent": "open_and_search",
-        "website_name": website_name,
-        "website_url": website_url,
-        "search_query": search_query
-    }
+    return parse_command(user_input)
 
 def print_task_info(task_info):
     """打印任务信息"""
@@ -0,0 +1,155 @@
+"""
+结构化日志
+
+浏览器控制器和千问解析在热路径上原本逐行 print，并发时输出互相穿插，而且直接阻塞在标准输出上。
+这里统一改为标准库 logging：
+- 所有日志记录器都在 "agent" 之下，按级别过滤，被过滤掉的调试日志不做任何格式化
+- setup_logging 之后日志先进入队列（QueueHandler），由后台线程写出，调用方不阻塞在IO上
+- 每条日志带当前任务的关联ID（ContextVar），并发任务的日志可以按ID分开
+- console 格式与原来的输出一致，json 格式每行一条，便于采集
+
+未调用 setup_logging 时（如单独运行的脚本）直接同步输出到标准输出，行为与 print 相同
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from config import LoggingConfig
+
+ROOT_LOGGER = "agent"
+
+_correlation_id: ContextVar[str] = ContextVar("correlation_id", default="")
+_queue: Optional[queue.Queue] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_debug_dumps = False
+
+def get_correlation_id() -> str:
+    return _correlation_id.get()
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+@contextmanager
+def correlation(correlation_id: Optional[str] = None) -> Iterator[str]:
+    """在当前上下文（及其中创建的 asyncio 任务）中使用该关联ID，为空时生成一个新的"""
+    correlation_id = correlation_id or new_correlation_id()
+    token = _correlation_id.set(correlation_id)
+    try:
+        yield correlation_id
+    finally:
+        _correlation_id.reset(token)
+
+class _CorrelationFilter(logging.Filter):
+    """在产生日志的线程/任务中取出关联ID（写出线程中已经拿不到 ContextVar）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = _correlation_id.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        correlation_id = getattr(record, "correlation_id", "")
+        if correlation_id:
+            data["correlation_id"] = correlation_id
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+class ConsoleFormatter(logging.Formatter):
+    """与原来 print 的输出一致，只输出消息本身"""
+
+    def __init__(self):
+        super().__init__("%(message)s")
+
+class _StdoutHandler(logging.StreamHandler):
+    """每次写出时才取 sys.stdout，标准输出被替换（如测试捕获输出）后仍然写到新的位置"""
+
+    def __init__(self):
+        super().__init__()
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+def _root() -> logging.Logger:
+    logger = logging.getLogger(ROOT_LOGGER)
+    if not logger.handlers:
+        # 未配置时同步输出到标准输出
+        handler = _StdoutHandler()
+        handler.setFormatter(ConsoleFormatter())
+        handler.addFilter(_CorrelationFilter())
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def get_logger(name: str) -> logging.Logger:
+    _root()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+def set_level(level):
+    """调整所有日志记录器的级别（如评测、基准脚本只保留警告）"""
+    _root().setLevel(level)
+
+def setup_logging(config: LoggingConfig):
+    """按配置切换为经队列异步写出的日志（可重复调用，后一次覆盖前一次）"""
+    global _queue, _listener, _debug_dumps
+    shutdown_logging()
+
+    handler = logging.FileHandler(config.file, encoding="utf-8") if config.file else _StdoutHandler()
+    handler.setFormatter(JsonFormatter() if config.format == "json" else ConsoleFormatter())
+
+    _queue = queue.Queue()
+    queue_handler = logging.handlers.QueueHandler(_queue)
+    queue_handler.addFilter(_CorrelationFilter())
+    logger = _root()
+    logger.handlers = [queue_handler]
+    logger.setLevel(config.level)
+
+    _listener = logging.handlers.QueueListener(_queue, handler)
+    _listener.start()
+    _debug_dumps = config.debug_dumps
+
+def flush_logs():
+    """等待队列中的日志全部写出（交互界面在打印结果、等待输入前调用，避免输出错位）"""
+    if _queue is not None and _listener is not None:
+        _queue.join()
+
+def shutdown_logging():
+    """停止后台写出线程，队列中剩余的日志会先写完"""
+    global _queue, _listener, _debug_dumps
+    _debug_dumps = False
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue = None
+        # 之后的日志恢复为同步输出
+        logging.getLogger(ROOT_LOGGER).handlers = []
+        _root()
+
+def debug_dumps_enabled() -> bool:
+    return _debug_dumps
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+测试本地解析函数的微基准
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_parsers import (
+    DEFAULT_BASELINE, build_corpus, build_query_corpus, compare, load_baseline, measure_allocations,
+    run_benchmarks, save_baseline
+)
+
+def test_corpus_is_deterministic():
+    """相同种子生成相同的语料，覆盖搜索、登录、多步和多网站指令"""
+    corpus = build_corpus(2000)
+    assert corpus == build_corpus(2000)
+    assert corpus != build_corpus(2000, seed=1)
+    assert any("密码" in text for text in corpus)
+    assert any("然后" in text for text in corpus)
+    assert any("、" in text for text in corpus)
+    queries = build_query_corpus(500)
+    assert queries == build_query_corpus(500)
+    assert any("  " in query or "\t" in query for query in queries)
+
+def test_run_and_compare():
+    """运行结果带有每秒调用数、相对速度和分配量；超过容差的退化被标记"""
+    report = run_benchmarks(["clean_search_query"], corpus_size=200, repeat=2)
+    result = report["results"]["clean_search_query"]
+    assert result["calls"] == 200
+    assert result["ops_per_sec"] > 0 and result["relative"] > 0
+    assert result["peak_bytes_per_call"] > 0
+
+    slower = {"results": {"clean_search_query": dict(result, relative=result["relative"] * 0.7)}}
+    bigger = {"results": {"clean_search_query": dict(result, peak_bytes_per_call=result["peak_bytes_per_call"] * 1.5)}}
+    assert not compare(report, report, 0.2)[0]["regressed"]
+    assert compare(slower, report, 0.2)[0]["regressed"]
+    assert compare(bigger, report, 0.2)[0]["regressed"]
+    # 基准中没有的函数不参与对比
+    assert compare(report, {"results": {}}, 0.2) == []
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "baseline.json")
+        save_baseline(report, path)
+        assert load_baseline(path) == report
+        assert load_baseline(os.path.join(directory, "missing.json")) is None
+
+def test_measure_allocations():
+    """临时分配计入峰值，调用之间保留的对象计入留存"""
+    kept = []
+    result = measure_allocations(lambda text: kept.append(text * 1000), ["ab"] * 10)
+    assert result["retained_bytes_per_call"] >= 2000
+    assert result["peak_bytes_per_call"] >= result["retained_bytes_per_call"]
+
+def test_stored_baseline_covers_all_targets():
+    """仓库中保存的基准包含所有被测函数"""
+    baseline = load_baseline(DEFAULT_BASELINE)
+    assert set(baseline["results"]) == {"fallback_parse", "parse_search_intent", "clean_search_query"}
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
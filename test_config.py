@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试集中配置的加载和校验
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import AppConfig, ConfigError, load_config
+from utils import get_browser_config
+
+def test_defaults():
+    """空环境得到默认配置"""
+    config = load_config({})
+    assert config == AppConfig()
+    assert config.browser.chrome_path is None
+    assert config.qwen.model == "qwen-turbo-latest"
+
+def test_env_overrides():
+    """环境变量覆盖各项参数"""
+    config = load_config({
+        "BROWSER_HEADLESS": "true",
+        "BROWSER_TIMEOUT": "45000",
+        "BROWSER_VIEWPORT": "1280x720",
+        "BROWSER_BLOCK_RESOURCES": "image, font",
+        "MAX_CONCURRENT_TASKS": "4",
+        "TASK_ISOLATION": "incognito",
+        "QWEN_TIMEOUT": "8.5",
+    })
+    assert config.browser.headless is True
+    assert config.browser.navigation_timeout_ms == 45000
+    assert (config.browser.viewport_width, config.browser.viewport_height) == (1280, 720)
+    assert config.browser.blocked_resource_types == ["image", "font"]
+    assert config.execution.max_concurrent_tasks == 4
+    assert config.qwen.timeout == 8.5
+
+def test_invalid_values_rejected():
+    """格式错误的配置在加载时报错"""
+    for env in ({"BROWSER_HEADLESS": "maybe"},
+                {"BROWSER_TIMEOUT": "soon"},
+                {"MAX_CONCURRENT_TASKS": "0"},
+                {"MAX_CONCURRENT_TASKS": "2"},
+                {"MAX_CONCURRENT_TASKS": "2", "TASK_ISOLATION": "shared"},
+                {"BROWSER_WAIT_UNTIL": "forever"},
+                {"BROWSER_BLOCK_RESOURCES": "pictures"},
+                {"BROWSER_VIEWPORT": "big"},
+                {"INTENT_CACHE_THRESHOLD": "1.5"}):
+        try:
+            load_config(env)
+            assert False, f"应该拒绝 {env}"
+        except ConfigError:
+            pass
+
+def test_launch_options_follow_config():
+    """启动参数由配置生成"""
+    config = load_config({"BROWSER_HEADLESS": "true", "CHROME_PATH": "/usr/bin/chromium",
+                          "BROWSER_ARGS": "--lang=zh-CN"})
+    assert load_config({"BROWSER_ARGS": "--lang=zh-CN,--disable-features=A,B"}).browser.extra_args == [
+        "--lang=zh-CN", "--disable-features=A,B"]
+    options = get_browser_config(config.browser)
+    assert options["headless"] is True
+    assert options["executablePath"] == "/usr/bin/chromium"
+    assert "--lang=zh-CN" in options["args"]
+    assert "--start-maximized" not in options["args"]
+
+def test_production_profile():
+    """production 方案：无头、小视口、精简参数和单标签页堆上限，单项仍可覆盖"""
+    config = load_config({"BROWSER_PROFILE": "production"})
+    assert config.browser.headless is True
+    assert (config.browser.viewport_width, config.browser.viewport_height) == (1280, 800)
+    args = get_browser_config(config.browser)["args"]
+    assert "--disable-background-networking" in args
+    assert "--js-flags=--max-old-space-size=512" in args
+    assert "--start-maximized" not in args
+    
+    config = load_config({"BROWSER_PROFILE": "production", "BROWSER_VIEWPORT": "800x600", "BROWSER_TAB_HEAP_MB": "0"})
+    assert config.browser.viewport_width == 800
+    assert not any(arg.startswith("--js-flags") for arg in get_browser_config(config.browser)["args"])
+    assert "--disable-background-networking" not in get_browser_config(load_config({}).browser)["args"]
+
+def test_site_isolation_and_feature_merge():
+    """站点隔离默认保留；多处的 --disable-features 合并为一个参数"""
+    args = get_browser_config(load_config({"BROWSER_PROFILE": "production"}).browser)["args"]
+    assert not any("site-per-process" in arg for arg in args)
+    config = load_config({"BROWSER_PROFILE": "production", "BROWSER_DISABLE_SITE_ISOLATION": "true",
+                          "BROWSER_ARGS": "--disable-features=Translate,AutofillServerCommunication"})
+    args = get_browser_config(config.browser)["args"]
+    features = [arg for arg in args if arg.startswith("--disable-features")]
+    assert features == ["--disable-features=Translate,OptimizationHints,MediaRouter,site-per-process,"
+                        "IsolateOrigins,AutofillServerCommunication"]
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+测试隐身上下文池
+"""
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from browser_controller import BrowserController, _task_context
+from config import ConfigError, load_config
+from context_pool import ContextPool
+
+class FakePage:
+    pass
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def newPage(self):
+        await asyncio.sleep(0.01)
+        return FakePage()
+
+    async def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    async def createIncognitoBrowserContext(self):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+async def _prepare(page):
+    page.prepared = True
+
+def test_config():
+    """默认共用主页面，可切换为隐身上下文隔离"""
+    assert load_config({}).execution.task_isolation == "shared"
+    execution = load_config({"TASK_ISOLATION": "incognito", "CONTEXT_POOL_SIZE": "3"}).execution
+    assert (execution.task_isolation, execution.context_pool_size) == ("incognito", 3)
+    assert load_config({"TASK_ISOLATION": "incognito", "MAX_CONCURRENT_TASKS": "4"}).execution.max_concurrent_tasks == 4
+    try:
+        load_config({"MAX_CONCURRENT_TASKS": "4"})
+        assert False, "shared 隔离时应该拒绝并发任务"
+    except ConfigError:
+        pass
+
+def test_warm_then_acquire():
+    """预热后取用命中预热的上下文，归还时销毁并在后台补足"""
+    async def run():
+        browser = FakeBrowser()
+        pool = ContextPool(2, _prepare)
+        pool.warm(browser)
+        await asyncio.sleep(0.05)
+        assert len(browser.contexts) == 2
+        lease = await pool.acquire(browser)
+        assert lease.page.prepared
+        assert lease.context in browser.contexts
+        assert pool.utilization() == 0.5
+        await pool.release(lease)
+        assert lease.context.closed
+        await asyncio.sleep(0.05)
+        # 用过的上下文不会复用，池中重新补足到2个
+        assert len(browser.contexts) == 3
+        assert pool.utilization() == 0
+    asyncio.run(run())
+
+def test_contexts_are_distinct():
+    """并发任务各自拿到不同的上下文"""
+    async def run():
+        browser = FakeBrowser()
+        pool = ContextPool(1, _prepare)
+        leases = await asyncio.gather(*[pool.acquire(browser) for _ in range(3)])
+        assert len({id(lease.context) for lease in leases}) == 3
+        for lease in leases:
+            await pool.release(lease)
+    asyncio.run(run())
+
+def test_browser_restart_discards_idle():
+    """浏览器重启后丢弃旧浏览器的空闲上下文"""
+    async def run():
+        old_browser, new_browser = FakeBrowser(), FakeBrowser()
+        pool = ContextPool(2, _prepare)
+        pool.warm(old_browser)
+        await asyncio.sleep(0.05)
+        lease = await pool.acquire(new_browser)
+        assert lease.context.browser is new_browser
+        await pool.release(lease)
+        await pool.close()
+    asyncio.run(run())
+
+def test_refresh_leases_own_context():
+    """后台刷新租用自己的隐身上下文，不使用触发它的任务的上下文（任务结束时会被关闭）"""
+    async def run():
+        browser = FakeBrowser()
+        controller = object.__new__(BrowserController)
+        controller._browser = browser
+        controller.context_pool = ContextPool(1, _prepare)
+        controller._active_tasks = 0
+        controller._watchdog_idle = asyncio.Event()
+        controller._watchdog_idle.set()
+        used = []
+
+        async def ready():
+            pass
+
+        async def search(site, website_url, query):
+            used.append(_task_context.get())
+
+        controller.ensure_browser_ready = ready
+        controller._search_in_new_page = search
+        task_context = await browser.createIncognitoBrowserContext()
+        _task_context.set(task_context)
+        await controller._refresh_search(None, "https://www.baidu.com", "天气")
+        assert used[0] is not None and used[0] is not task_context
+        # 刷新结束后销毁自己的上下文，任务的上下文不受影响
+        assert used[0].closed and not task_context.closed
+        await controller.context_pool.close()
+    asyncio.run(run())
+
+def test_concurrent_launch_starts_once():
+    """并发任务同时启动浏览器时只启动一次"""
+    async def run():
+        controller = object.__new__(BrowserController)
+        controller._browser = None
+        controller._launch_lock = asyncio.Lock()
+        launches = []
+
+        async def fake_launch(retry_count=None):
+            launches.append(1)
+            await asyncio.sleep(0.05)
+            controller._browser = FakeBrowser()
+
+        controller._launch_browser = fake_launch
+        await asyncio.gather(*(controller.launch_browser() for _ in range(3)))
+        assert len(launches) == 1
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+测试离线意图评测
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from evaluate_intents import (
+    BACKENDS, DEFAULT_GOLDEN, _cache_lookups, load_golden, normalize_host, normalize_query, percentile, predictions_parser,
+    run_evaluation, score_case, summarize
+)
+from utils import SUPPORTED_INTENTS, get_missing_fields
+
+def test_golden_set_is_valid():
+    """标注集ID唯一，期望结果的意图受支持且不缺必要字段"""
+    cases, version = load_golden(DEFAULT_GOLDEN)
+    assert version["name"] == "intents_v1.jsonl" and version["cases"] == len(cases) >= 50
+    assert len({case["id"] for case in cases}) == len(cases)
+    for case in cases:
+        expected = case["expected"]
+        assert expected["intent"] in SUPPORTED_INTENTS, case["id"]
+        assert get_missing_fields(expected) == [], case["id"]
+
+def test_normalizers():
+    """网站按主机名比较，搜索词忽略大小写、空白和标点"""
+    assert normalize_host("https://www.zhihu.com/search?q=1") == "zhihu.com"
+    assert normalize_host("zhihu.com") == "zhihu.com"
+    assert normalize_host("") == ""
+    assert normalize_query(" iPhone 16！") == normalize_query("iphone16")
+    assert normalize_query("“大语言模型”") == "大语言模型"
+
+def test_score_plan_and_multi_search():
+    """计划按步骤评分，多网站搜索按网站集合评分"""
+    expected = {"intent": "plan", "steps": [
+        {"intent": "open_website", "website_url": "https://www.zhihu.com"},
+        {"intent": "open_and_search", "website_url": "https://www.zhihu.com", "search_query": "机器学习"},
+    ]}
+    actual = {"intent": "plan", "steps": [
+        {"intent": "open_website", "website_url": "https://zhihu.com"},
+        {"intent": "open_and_search", "website_url": "https://www.zhihu.com", "search_query": "深度学习"},
+    ]}
+    assert score_case(expected, actual) == {"intent": True, "steps": True, "steps.intent": True,
+                                            "steps.website_url": True, "steps.search_query": False}
+    assert not score_case(expected, {"intent": "plan", "steps": actual["steps"][:1]})["steps"]
+
+    expected = {"intent": "multi_search", "search_query": "三体",
+                "websites": [{"website_url": "https://www.zhihu.com"}, {"website_url": "https://www.douban.com"}]}
+    actual = dict(expected, websites=list(reversed(expected["websites"])))
+    assert all(score_case(expected, actual).values())
+    assert not score_case(expected, dict(expected, websites=expected["websites"][:1]))["websites"]
+
+def test_percentile():
+    assert percentile([], 50) is None
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 51.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+
+def test_predictions_backend_report():
+    """用保存的预测结果评测：按意图和字段汇总，异常记为错误，token按千条指令折算成本"""
+    cases = [
+        {"id": "a", "input": "打开百度", "expected": {"intent": "open_website", "website_url": "https://www.baidu.com"}},
+        {"id": "b", "input": "去知乎搜索大模型", "expected": {"intent": "open_and_search",
+                                                        "website_url": "https://www.zhihu.com", "search_query": "大模型"}},
+        {"id": "c", "input": "打开知乎", "expected": {"intent": "open_website", "website_url": "https://www.zhihu.com"}},
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "predictions.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for text, task_info in [
+                ("打开百度", {"intent": "open_website", "website_url": "https://baidu.com"}),
+                ("去知乎搜索大模型", {"intent": "open_and_search", "website_url": "https://www.zhihu.com",
+                                "search_query": "知乎大模型"}),
+            ]:
+                f.write(json.dumps({"input": text, "task_info": task_info}, ensure_ascii=False) + "\n")
+        parse = predictions_parser(path)
+
+        def parse_with_usage(user_input):
+            metrics.counter("qwen_tokens_total").inc(100, model="test", kind="prompt")
+            metrics.counter("qwen_tokens_total").inc(20, model="test", kind="completion")
+            return parse(user_input)
+
+        results, elapsed, tokens = run_evaluation(parse_with_usage, cases, workers=2)
+    assert [result["correct"] for result in results] == [True, False, False]
+    assert results[2]["error"].startswith("KeyError")
+    assert tokens == {"prompt": 300, "completion": 60}
+
+    summary = summarize(results, elapsed, tokens, price_in=1.0, price_out=2.0)
+    assert summary["errors"] == 1
+    assert summary["per_intent"]["open_website"]["accuracy"] == 0.5
+    assert summary["per_field"]["search_query"] == {"cases": 1, "correct": 0, "accuracy": 0.0}
+    assert summary["tokens_per_1k"] == {"prompt": 100000, "completion": 20000}
+    # 每条指令 0.1*1 + 0.02*2 = 0.14，每千条 140
+    assert abs(summary["cost_per_1k"] - 140) < 1e-9
+    assert summary["latency"]["p50"] is not None
+
+def test_cache_backend():
+    """cache 后端在回放结果前面加意图缓存，相似指令命中缓存且搜索词按新指令提取"""
+    cases = [{"id": str(index), "input": f"去知乎搜{query}",
+              "expected": {"intent": "open_and_search", "website_url": "https://www.zhihu.com", "search_query": query}}
+             for index, query in enumerate(["大模型", "深度学习", "Rust入门"])]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "predictions.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            # 只有第一条有预测结果，其余必须由缓存应答
+            f.write(json.dumps({"input": cases[0]["input"], "task_info": cases[0]["expected"]}, ensure_ascii=False))
+        args = argparse.Namespace(predictions=path, cache_threshold=0.9)
+        before = _cache_lookups()
+        results, elapsed, tokens = run_evaluation(BACKENDS["cache"](args), cases, workers=1)
+    assert all(result["correct"] for result in results)
+    lookups = {outcome: value - before.get(outcome, 0.0) for outcome, value in _cache_lookups().items()}
+    summary = summarize(results, elapsed, tokens, cache=lookups)
+    assert summary["cache"]["lookups"] == 3
+    assert abs(summary["cache"]["similar_rate"] - 2 / 3) < 1e-9
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试意图缓存：模板生成、相似命中和搜索词重新提取（不调用真实API）
+"""
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import intent_cache
+import metrics
+import qwen_agent
+from config import IntentCacheConfig, QwenConfig
+from intent_cache import QUERY_SLOT, SITE_SLOT, IntentCache, make_template
+from qwen_agent import ModelTier, QwenAgent
+
+def search(site_url, query, intent="open_and_search"):
+    return {"intent": intent, "website_name": "", "website_url": site_url, "search_query": query,
+            "username": "", "password": ""}
+
+ZHIHU = "https://www.zhihu.com"
+
+def test_template():
+    """网站名和搜索词替换为占位符，同类动作词归一；登录和多步指令没有模板"""
+    first, second = make_template("去知乎搜大模型"), make_template("在知乎上搜索一下深度学习")
+    assert SITE_SLOT in first.text and QUERY_SLOT in first.text and "大模型" not in first.text
+    assert first.key == second.key == ("open_and_search", ("zhihu.com",))
+    assert make_template("去知乎搜深度学习").text == first.text
+    assert make_template("去百度搜深度学习").key != first.key
+    assert make_template("登录豆瓣 用户名a 密码b") is None
+    assert make_template("打开知乎然后搜索大模型") is None
+
+def test_similar_hit_reextracts_query():
+    """相似的指令命中缓存，搜索词从新指令中提取；网站或意图不同时不命中"""
+    cache = IntentCache(threshold=0.5)
+    cache.store("去知乎搜大模型", search(ZHIHU, "大模型"))
+    assert cache.lookup("去知乎搜索深度学习")["search_query"] == "深度学习"
+    assert cache.lookup("搜索一下知乎Python教程")["search_query"] == "Python教程"
+    assert cache.lookup("去百度搜深度学习") is None
+    assert cache.lookup("打开知乎") is None
+    # 阈值为 1 时模板必须完全相同
+    strict = IntentCache(threshold=1.0)
+    strict.store("去知乎搜大模型", search(ZHIHU, "大模型"))
+    assert strict.lookup("去知乎搜深度学习") is not None
+    assert strict.lookup("帮我去知乎搜一下深度学习") is None
+
+def test_disagreement_and_credentials():
+    """千问与本地规则不一致的结果只做精确匹配；带密码的结果不缓存"""
+    cache = IntentCache(threshold=0.0)
+    cache.store("去知乎搜大模型的原理", search(ZHIHU, "大模型原理介绍"))
+    assert cache.lookup("去知乎搜深度学习") is None
+    assert cache.lookup("  去知乎搜大模型的原理 ")["search_query"] == "大模型原理介绍"
+    login = dict(search(ZHIHU, ""), intent="open_and_login", username="a", password="b")
+    cache.store("登录知乎 用户名a 密码b", login)
+    assert cache.lookup("登录知乎 用户名a 密码b") is None
+    # 返回的是副本
+    cache.lookup("去知乎搜大模型的原理")["search_query"] = "changed"
+    assert cache.lookup("去知乎搜大模型的原理")["search_query"] == "大模型原理介绍"
+
+def test_lru_eviction():
+    """超出容量时淘汰最近最少使用的条目，其行被复用"""
+    cache = IntentCache(max_entries=2)
+    cache.store("打开知乎", search(ZHIHU, "", "open_website"))
+    cache.store("去知乎搜大模型", search(ZHIHU, "大模型"))
+    assert cache.lookup("打开知乎") is not None
+    cache.store("去百度搜大模型", search("https://www.baidu.com", "大模型"))
+    assert len(cache) == 2
+    assert cache.lookup("去知乎搜深度学习") is None
+    assert cache.lookup("访问知乎")["intent"] == "open_website"
+    assert cache.lookup("去百度搜深度学习")["search_query"] == "深度学习"
+
+def test_agent_uses_cache():
+    """开启缓存后相似指令不再调用API，解析耗时记为 cache"""
+    agent = QwenAgent(QwenConfig(api_key="test-key"), intent_cache=IntentCache())
+    agent.tiers = [ModelTier("small", 1.0)]
+    calls = []
+
+    def fake_request(prompt, timeout, model):
+        calls.append(prompt)
+        return json.dumps(search(ZHIHU, "大模型"))
+
+    agent._request_completion = fake_request
+    histogram = metrics.histogram("parse_latency_seconds")
+    before = histogram.count(source="cache")
+    assert agent.parse_user_input("去知乎搜大模型")["search_query"] == "大模型"
+    assert agent.parse_user_input("去知乎搜索机器学习")["search_query"] == "机器学习"
+    assert len(calls) == 1
+    assert histogram.count(source="cache") == before + 1
+
+def test_get_agent_uses_passed_config():
+    """get_agent 按传入的配置创建意图缓存，而不是进程配置"""
+    saved = qwen_agent._agent, intent_cache._cache
+    qwen_agent._agent = intent_cache._cache = None
+    try:
+        agent = qwen_agent.get_agent(QwenConfig(api_key="test-key"),
+                                     IntentCacheConfig(enabled=True, threshold=0.9, max_entries=8))
+        assert (agent.intent_cache.threshold, agent.intent_cache.max_entries) == (0.9, 8)
+        qwen_agent._agent = intent_cache._cache = None
+        assert qwen_agent.get_agent(QwenConfig(), IntentCacheConfig(enabled=False)).intent_cache is None
+    finally:
+        qwen_agent._agent, intent_cache._cache = saved
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+测试延迟初始化：导入模块不加载重量级依赖，也不需要API密钥
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def run_python(code: str, env=None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=60)
+
+def test_import_is_free():
+    """导入 main 不会加载 pyppeteer、requests 和 numpy，也不会创建agent"""
+    result = run_python(
+        "import sys, main, qwen_agent\n"
+        "assert 'pyppeteer' not in sys.modules\n"
+        "assert 'requests' not in sys.modules\n"
+        "assert 'numpy' not in sys.modules\n"
+        "assert qwen_agent._agent is None\n"
+    )
+    assert result.returncode == 0, result.stderr
+
+def test_parse_without_credentials():
+    """没有 QWEN_API_KEY 时使用本地规则解析"""
+    env = dict(os.environ)
+    env.pop("QWEN_API_KEY", None)
+    result = run_python(
+        "import config\n"
+        "config._env_loaded = True\n"
+        "from qwen_agent import parse_user_input\n"
+        "print(parse_user_input('去知乎搜索大模型')['search_query'])\n",
+        env=env
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith("大模型")
+
+if __name__ == "__main__":
+    test_import_is_free()
+    test_parse_without_credentials()
+    print("🎉 全部通过")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+测试页面回收与内存看门狗
+"""
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from browser_controller import BrowserController
+from config import WatchdogConfig, load_config
+from memory_stats import process_tree_rss_mb
+from memory_watchdog import KEEP, RECYCLE_PAGE, RESTART_BROWSER, MemoryWatchdog
+
+class FakeProcess:
+    pid = os.getpid()
+
+class FakeBrowser:
+    process = FakeProcess()
+
+class FakePage:
+    def __init__(self, heap_mb):
+        self.heap_mb = heap_mb
+
+    async def metrics(self):
+        return {"JSHeapUsedSize": self.heap_mb * 1024 * 1024}
+
+def _check(watchdog, page):
+    return asyncio.run(watchdog.check(FakeBrowser(), page))
+
+def test_disabled_by_default():
+    """默认（desktop 方案）不检查；production 方案开启"""
+    assert not MemoryWatchdog(load_config({}).watchdog).enabled
+    assert MemoryWatchdog(load_config({"BROWSER_PROFILE": "production"}).watchdog).enabled
+
+def test_recycle_after_max_tasks():
+    """任务数达到上限后回收页面，回收后重新计数"""
+    watchdog = MemoryWatchdog(WatchdogConfig(page_max_tasks=3))
+    for _ in range(2):
+        watchdog.record_task()
+    assert _check(watchdog, FakePage(10))[0] == KEEP
+    watchdog.record_task()
+    action, reason, _ = _check(watchdog, FakePage(10))
+    assert (action, reason) == (RECYCLE_PAGE, "tasks")
+    watchdog.page_recycled(reason)
+    assert watchdog.page_tasks == 0
+
+def test_recycle_on_heap_limit():
+    """JS堆超过阈值时回收页面"""
+    watchdog = MemoryWatchdog(WatchdogConfig(page_heap_limit_mb=100))
+    assert _check(watchdog, FakePage(50))[0] == KEEP
+    assert _check(watchdog, FakePage(150))[:2] == (RECYCLE_PAGE, "heap")
+
+def test_restart_on_rss_limit():
+    """进程树RSS超过阈值时重启浏览器（优先于页面回收）"""
+    assert process_tree_rss_mb(os.getpid()) > 1
+    watchdog = MemoryWatchdog(WatchdogConfig(browser_rss_limit_mb=1, page_max_tasks=1))
+    watchdog.record_task()
+    assert _check(watchdog, FakePage(10))[:2] == (RESTART_BROWSER, "rss")
+
+class SlowWatchdog:
+    """每次检查都要求重启浏览器，检查耗时 0.05 秒"""
+    enabled = True
+
+    def __init__(self, events):
+        self.events = events
+
+    def record_task(self):
+        pass
+
+    async def check(self, browser, page):
+        self.events.append("check")
+        await asyncio.sleep(0.05)
+        return RESTART_BROWSER, "rss", "测试"
+
+    def browser_restarted(self, reason):
+        pass
+
+def _controller(events, max_tasks=2):
+    controller = object.__new__(BrowserController)
+    controller._task_semaphore = asyncio.Semaphore(max_tasks)
+    controller._active_tasks = 0
+    controller._watchdog_idle = asyncio.Event()
+    controller._watchdog_idle.set()
+    controller.watchdog = SlowWatchdog(events)
+
+    async def close_browser():
+        events.append("close")
+
+    async def perform(task_info):
+        events.append(f"start {task_info['n']}")
+        await asyncio.sleep(0.01)
+        events.append(f"end {task_info['n']}")
+
+    controller.close_browser = close_browser
+    controller._perform_recorded = perform
+    return controller
+
+def test_tasks_wait_for_watchdog():
+    """看门狗检查和重启期间，有空闲名额的新任务也要等它完成才开始"""
+    async def run():
+        events = []
+        controller = _controller(events)
+        first = asyncio.ensure_future(controller._run_task({"n": 1}))
+        await asyncio.sleep(0.03)
+        assert events == ["start 1", "end 1", "check"]
+        await asyncio.gather(first, controller._run_task({"n": 2}))
+        assert events == ["start 1", "end 1", "check", "close", "start 2", "end 2", "check", "close"]
+    asyncio.run(run())
+
+def test_background_work_blocks_watchdog():
+    """后台刷新计入活动数：刷新进行中时任务结束不触发回收"""
+    async def run():
+        events = []
+        controller = _controller(events)
+        release = asyncio.Event()
+
+        async def refresh():
+            async with controller._active_work():
+                await release.wait()
+
+        background = asyncio.ensure_future(refresh())
+        await asyncio.sleep(0)
+        await controller._run_task({"n": 1})
+        assert events == ["start 1", "end 1"]
+        release.set()
+        await background
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
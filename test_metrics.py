@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+测试 Prometheus 指标导出
+"""
+import os
+import sys
+import tempfile
+import urllib.request
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from config import QwenConfig, load_config
+from qwen_agent import QwenAgent
+
+def test_config():
+    """默认不导出，端口和文件可配置"""
+    config = load_config({}).metrics
+    assert (config.port, config.file) == (0, "")
+    config = load_config({"METRICS_PORT": "9100", "METRICS_FILE": "/tmp/agent.prom"}).metrics
+    assert (config.port, config.file) == (9100, "/tmp/agent.prom")
+
+def test_render_prometheus():
+    """计数器、仪表和直方图按文本格式输出，标签值转义"""
+    registry = metrics.MetricsRegistry()
+    registry.counter("demo_total", "示例计数").inc(2, site='a"b')
+    registry.gauge("demo_depth", "队列深度").set(3)
+    histogram = registry.histogram("demo_seconds", "耗时", buckets=(0.1, 1.0))
+    histogram.observe(0.05, intent="open_website")
+    histogram.observe(0.5, intent="open_website")
+    text = metrics.render_prometheus(registry)
+
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{site="a\\"b"} 2' in text
+    assert "demo_depth 3" in text
+    assert 'demo_seconds_bucket{intent="open_website",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{intent="open_website",le="1"} 2' in text
+    assert 'demo_seconds_bucket{intent="open_website",le="+Inf"} 2' in text
+    assert 'demo_seconds_sum{intent="open_website"} 0.55' in text
+    assert 'demo_seconds_count{intent="open_website"} 2' in text
+
+def test_http_endpoint_and_textfile():
+    """/metrics 端点和指标文件输出相同的内容"""
+    metrics.counter("test_export_total", "导出测试").inc()
+    server = metrics.start_http_server(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+    assert "test_export_total 1" in body
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "agent.prom")
+        metrics.write_textfile(path)
+        with open(path, encoding="utf-8") as f:
+            assert "test_export_total 1" in f.read()
+
+def test_parse_latency_by_source():
+    """没有API Key时解析耗时记为 fallback"""
+    histogram = metrics.histogram("parse_latency_seconds")
+    before = histogram.count(source="fallback")
+    QwenAgent(QwenConfig(api_key="")).parse_user_input("打开百度")
+    assert histogram.count(source="fallback") == before + 1
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
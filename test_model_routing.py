@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+测试分层模型路由：小模型优先，校验失败时升级（不调用真实API）
+"""
+import json
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("QWEN_API_KEY", "test-key")
+
+from qwen_agent import ModelTier, QwenAgent, parse_model_tiers
+from resilience import RetryableError
+
+GOOD = {
+    "intent": "open_and_search",
+    "website_name": "知乎",
+    "website_url": "https://www.zhihu.com",
+    "search_query": "大模型",
+    "username": "",
+    "password": ""
+}
+
+def make_agent(responses):
+    """构造两层模型的agent，responses: 模型名 -> 返回内容或异常"""
+    agent = QwenAgent()
+    agent.tiers = [ModelTier("small", 1.0), ModelTier("large", 1.0)]
+    calls = []
+
+    def fake_request(prompt, timeout, model):
+        calls.append(model)
+        response = responses[model]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    agent._request_completion = fake_request
+    return agent, calls
+
+def test_parse_model_tiers():
+    """解析分层配置"""
+    assert parse_model_tiers("", "qwen-turbo-latest", 15.0) == [("qwen-turbo-latest", 15.0)]
+    assert parse_model_tiers("a:5, b", "x", 15.0) == [("a", 5.0), ("b", 15.0)]
+
+def test_small_model_accepted():
+    """小模型结果有效时不调用大模型"""
+    agent, calls = make_agent({"small": json.dumps(GOOD), "large": json.dumps(GOOD)})
+    assert agent.parse_user_input("去知乎搜索大模型") == GOOD
+    assert calls == ["small"]
+
+def test_escalate_on_missing_fields():
+    """小模型缺少字段时升级到大模型"""
+    incomplete = dict(GOOD, search_query="")
+    agent, calls = make_agent({"small": json.dumps(incomplete), "large": json.dumps(GOOD)})
+    assert agent.parse_user_input("去知乎搜索大模型") == GOOD
+    assert calls == ["small", "large"]
+
+def test_login_without_credentials_not_escalated():
+    """指令中没有账号密码的登录只调用一层模型，缺失的账号由调用方提示用户"""
+    login = dict(GOOD, intent="login", search_query="")
+    agent, calls = make_agent({"small": json.dumps(login), "large": json.dumps(login)})
+    assert agent.parse_user_input("登录知乎") == login
+    assert calls == ["small"]
+
+def test_case_different_credentials_not_coalesced():
+    """账号密码只差大小写的并发指令各自解析，不共享结果"""
+    agent = QwenAgent()
+    agent.tiers = [ModelTier("small", 1.0)]
+
+    def fake_request(prompt, timeout, model):
+        time.sleep(0.05)
+        username = "Alice" if "用户名Alice" in prompt else "alice"
+        return json.dumps({"intent": "login", "website_name": "GitHub", "website_url": "https://github.com",
+                           "search_query": "", "username": username, "password": username + "-pw"})
+
+    agent._request_completion = fake_request
+    results = {}
+    threads = [threading.Thread(target=lambda text=text: results.update({text: agent.parse_user_input(text)}))
+               for text in ("登录GitHub 用户名Alice 密码Secret1", "登录github 用户名alice 密码secret1")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results["登录GitHub 用户名Alice 密码Secret1"]["username"] == "Alice"
+    assert results["登录github 用户名alice 密码secret1"]["username"] == "alice"
+
+def test_escalate_on_invalid_json_and_unknown_intent():
+    """非JSON或未知意图同样升级"""
+    agent, calls = make_agent({"small": "我不知道", "large": json.dumps(GOOD)})
+    assert agent.parse_user_input("去知乎搜索大模型") == GOOD
+    agent, calls = make_agent({"small": json.dumps(dict(GOOD, intent="dance")), "large": json.dumps(GOOD)})
+    assert agent.parse_user_input("去知乎搜索大模型") == GOOD
+    assert calls == ["small", "large"]
+
+def test_all_tiers_down_uses_fallback():
+    """所有层都失败时使用本地回退解析"""
+    error = ValueError("401")
+    agent, calls = make_agent({"small": error, "large": error})
+    result = agent.parse_user_input("去知乎搜索大模型")
+    assert result["website_url"] == "https://www.zhihu.com"
+    assert result["search_query"] == "大模型"
+
+def test_tier_breaker_skips_model():
+    """某层熔断后直接跳过"""
+    agent, calls = make_agent({"small": RetryableError("503", 503), "large": json.dumps(GOOD)})
+    small = agent.tiers[0]
+    small.caller.retry_policy.max_attempts = 1
+    small.caller.breaker.failure_threshold = 1
+    agent.parse_user_input("去知乎搜索大模型")
+    calls.clear()
+    assert agent.parse_user_input("去知乎搜索大模型") == GOOD
+    assert calls == ["large"]
+    assert agent.health()["small"]["state"] == "open"
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
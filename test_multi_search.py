@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+测试多网站并行搜索
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from browser_controller import BrowserController
+from config import AppConfig, BrowserConfig, QwenConfig
+from qwen_agent import QwenAgent
+from results import SearchResult, TaskResult, merge_search_results
+from singleflight import task_fingerprint
+from sites import BUILTIN_SITES, SiteRegistry
+from utils import get_missing_fields
+
+def test_find_all_in_text():
+    """按出现顺序找出所有提到的网站"""
+    registry = SiteRegistry(BUILTIN_SITES)
+    names = [site.name for site in registry.find_all_in_text("在知乎、baidu和哔哩哔哩还有知乎搜索")]
+    assert names == ["知乎", "百度", "B站"]
+
+def test_fallback_multi_search():
+    """提到多个网站的搜索指令解析为 multi_search"""
+    agent = QwenAgent(QwenConfig())
+    with contextlib.redirect_stdout(io.StringIO()):
+        task = agent._fallback_parse("在知乎、百度和B站搜索大模型")
+    assert task["intent"] == "multi_search"
+    assert task["search_query"] == "大模型"
+    assert [website["website_name"] for website in task["websites"]] == ["知乎", "百度", "B站"]
+    assert get_missing_fields(task) == []
+
+def test_multi_search_missing_fields():
+    """校验网站列表和搜索词"""
+    assert get_missing_fields({"intent": "multi_search"}) == ["websites", "search_query"]
+    task = {"intent": "multi_search", "search_query": "x", "websites": [{"website_name": "知乎"}]}
+    assert get_missing_fields(task) == ["websites[0].website_url"]
+
+def test_fingerprint_ignores_site_order():
+    """网站顺序不同的多网站搜索视为同一个任务"""
+    a = {"intent": "multi_search", "search_query": "x",
+         "websites": [{"website_url": "https://www.zhihu.com"}, {"website_url": "https://www.baidu.com"}]}
+    b = dict(a, websites=list(reversed(a["websites"])))
+    assert task_fingerprint(a) == task_fingerprint(b)
+
+def test_merge_interleaves_by_rank():
+    """合并结果按排名交错"""
+    zhihu = [SearchResult("z1", "", "", 1, "知乎"), SearchResult("z2", "", "", 2, "知乎")]
+    baidu = [SearchResult("b1", "", "", 1, "百度")]
+    assert [item.title for item in merge_search_results([zhihu, baidu])] == ["z1", "b1", "z2"]
+
+def test_sites_run_in_parallel():
+    """各网站并行搜索，总耗时接近最慢的网站；单个网站失败不影响其他网站"""
+    controller = object.__new__(BrowserController)
+    controller.config = AppConfig()
+    delays = {"https://www.zhihu.com": 0.2, "https://www.baidu.com": 0.2, "https://www.bilibili.com": 0.1}
+
+    async def fake_search(website_url, query):
+        await asyncio.sleep(delays[website_url])
+        result = TaskResult(intent="open_and_search", website_url=website_url)
+        if "bilibili" in website_url:
+            result.status, result.error = "error", "超时"
+        else:
+            result.results = [SearchResult(query, website_url, "", 1)]
+        return result
+
+    controller._search_site = fake_search
+    task = {"intent": "multi_search", "search_query": "大模型",
+            "websites": [{"website_url": url} for url in delays]}
+    result = TaskResult(intent="multi_search", website_url="")
+    started = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(controller._execute_multi_search(task, result))
+    assert time.monotonic() - started < 0.35
+    assert [step.status for step in result.steps] == ["ok", "ok", "error"]
+    assert len(result.results) == 2
+    assert result.status == "ok"
+
+class FakeKeyboard:
+    def __init__(self, actions):
+        self.actions = actions
+
+    async def press(self, key):
+        self.actions.append(("press", key))
+
+class FakePage:
+    def __init__(self):
+        self.actions = []
+        self.url = ""
+        self.keyboard = FakeKeyboard(self.actions)
+
+    async def goto(self, url, options=None):
+        self.url = url
+        self.actions.append(("goto", url))
+
+    async def click(self, selector):
+        self.actions.append(("click", selector))
+
+    async def close(self):
+        pass
+
+def test_new_page_search_honors_strategy():
+    """多网站搜索与单网站搜索一样按 search_strategy 选择在首页输入还是直接打开结果页"""
+    async def search(strategy):
+        controller = object.__new__(BrowserController)
+        controller.browser_config = BrowserConfig(search_strategy=strategy)
+        page = FakePage()
+
+        async def new_page():
+            return page
+
+        async def noop(*args, **kwargs):
+            return []
+
+        async def fill_input(selector, text, site=None, page=None):
+            page.actions.append(("fill", selector, text))
+
+        controller.new_page = new_page
+        controller.wait_until_ready = controller.wait_for_results = controller.extract_search_results = noop
+        controller.fill_input = fill_input
+        site = SiteRegistry(BUILTIN_SITES).get("百度")
+        result = await controller._search_in_new_page(site, "https://www.baidu.com", "天气")
+        assert result.status == "ok", result.error
+        return page.actions
+
+    assert asyncio.run(search("form")) == [
+        ("goto", "https://www.baidu.com"), ("fill", "input#kw", "天气"), ("click", "input#su")]
+    assert asyncio.run(search("url")) == [("goto", "https://www.baidu.com/s?wd=%E5%A4%A9%E6%B0%94")]
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
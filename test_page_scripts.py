@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试注入页面的脚本（用 Node.js 和最小的 DOM 替身执行，未安装 node 时跳过）
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from page_scripts import SET_INPUT_VALUE_JS
+
+# 原生 value setter 与浏览器一样只接受对应类型的元素，用在其他元素上会抛 TypeError
+FAKE_DOM_JS = """
+class Event { constructor(type) { this.type = type; } }
+class HTMLElement {
+    constructor() { this.events = []; this.focused = false; }
+    focus() { this.focused = true; }
+    dispatchEvent(event) { this.events.push(event.type); }
+}
+const nativeValue = (cls) => Object.defineProperty(cls.prototype, 'value', {
+    get() { return this._value; },
+    set(value) {
+        if (!(this instanceof cls)) throw new TypeError('Illegal invocation');
+        this._value = value;
+    },
+    configurable: true,
+});
+class HTMLInputElement extends HTMLElement {}
+class HTMLTextAreaElement extends HTMLElement {}
+nativeValue(HTMLInputElement);
+nativeValue(HTMLTextAreaElement);
+const elements = {input: new HTMLInputElement(), textarea: new HTMLTextAreaElement(), editable: new HTMLElement()};
+const document = {querySelector: (selector) => elements[selector] || null};
+"""
+
+def run_script(script: str, calls: list) -> dict:
+    """执行 script(*args) 的各次调用，返回 {results, elements}"""
+    program = FAKE_DOM_JS + f"""
+const fn = {script};
+const results = {json.dumps(calls)}.map(args => fn(...args));
+console.log(JSON.stringify({{results, elements}}));
+"""
+    output = subprocess.run(["node", "-e", program], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+def test_set_input_value_by_element_type():
+    """input 和 textarea 用各自的原生 setter，其他元素返回 false 交给逐字输入"""
+    if shutil.which("node") is None:
+        print("⚠️  未安装 node，跳过")
+        return
+    output = run_script(SET_INPUT_VALUE_JS, [["input", "大模型"], ["textarea", "多行\n文字"],
+                                             ["editable", "x"], ["missing", "x"]])
+    assert output["results"] == [True, True, False, False]
+    textarea = output["elements"]["textarea"]
+    assert textarea["_value"] == "多行\n文字"
+    assert textarea["focused"] and textarea["events"] == ["input", "change"]
+    assert output["elements"]["input"]["_value"] == "大模型"
+    assert output["elements"]["editable"]["events"] == []
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
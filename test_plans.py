@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+测试多步任务计划的解析与校验
+"""
+import contextlib
+import io
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from browser_controller import same_page_url
+from config import QwenConfig
+from qwen_agent import QwenAgent
+from utils import fill_plan_websites, get_missing_fields
+
+def _fallback(text):
+    agent = QwenAgent(QwenConfig())
+    with contextlib.redirect_stdout(io.StringIO()):
+        return agent._fallback_parse(text)
+
+def test_fallback_splits_compound_command():
+    """回退解析把带连接词的指令拆成计划，未提网站的步骤沿用上一步网站"""
+    plan = _fallback("登录豆瓣 用户名abc 密码123 然后搜索电影")
+    assert plan["intent"] == "plan"
+    login, search = plan["steps"]
+    assert login["intent"] == "open_and_login" and login["username"] == "abc"
+    assert search["intent"] == "open_and_search"
+    assert search["website_name"] == "豆瓣"
+    assert search["search_query"] == "电影"
+    assert get_missing_fields(plan) == []
+
+def test_single_command_not_split():
+    """普通指令保持单步"""
+    assert _fallback("打开百度搜索Python教程")["intent"] == "open_and_search"
+
+def test_plan_missing_fields():
+    """计划逐步校验字段"""
+    assert get_missing_fields({"intent": "plan", "steps": []}) == ["steps"]
+    plan = {"intent": "plan", "steps": [
+        {"intent": "open_website", "website_url": "https://www.baidu.com"},
+        {"intent": "open_and_search", "website_url": "https://www.baidu.com"},
+        {"intent": "plan"}
+    ]}
+    assert get_missing_fields(plan) == ["steps[1].search_query", "steps[2].intent"]
+
+def test_fill_plan_websites():
+    """没有网站的步骤沿用上一步"""
+    plan = fill_plan_websites({"intent": "plan", "steps": [
+        {"intent": "open_website", "website_name": "知乎", "website_url": "https://www.zhihu.com"},
+        {"intent": "open_and_search", "website_url": "", "search_query": "大模型"}
+    ]})
+    assert plan["steps"][1]["website_url"] == "https://www.zhihu.com"
+
+def test_same_page_url():
+    """跳过导航的URL比较"""
+    assert same_page_url("https://www.baidu.com/", "https://baidu.com")
+    assert same_page_url("http://www.douban.com/#top", "https://www.douban.com")
+    assert not same_page_url("https://www.baidu.com/s?wd=1", "https://www.baidu.com")
+    assert not same_page_url("", "https://www.baidu.com")
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试千问调用的重试、对冲和熔断策略（不调用真实API）
+"""
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, RetryableError, RetryPolicy
+
+def test_retry_then_success():
+    """可重试错误后重试成功"""
+    calls = []
+
+    def flaky(timeout):
+        calls.append(timeout)
+        if len(calls) < 3:
+            raise RetryableError("503", status_code=503)
+        return "ok"
+
+    caller = ResilientCaller("test_retry", attempt_timeout=1.0,
+                             retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01))
+    assert caller.call(flaky) == "ok"
+    assert len(calls) == 3
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+def test_non_retryable_error_is_raised():
+    """非可重试错误直接抛出"""
+    def bad_request(timeout):
+        raise ValueError("400")
+
+    caller = ResilientCaller("test_fatal", retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01))
+    try:
+        caller.call(bad_request)
+        assert False, "应该抛出异常"
+    except ValueError:
+        pass
+
+def test_attempt_deadline():
+    """单次调用超过截止时间视为可重试错误"""
+    def hung(timeout):
+        time.sleep(0.5)
+        return "late"
+
+    caller = ResilientCaller("test_deadline", attempt_timeout=0.05,
+                             retry_policy=RetryPolicy(max_attempts=1))
+    started = time.monotonic()
+    try:
+        caller.call(hung)
+        assert False, "应该超时"
+    except RetryableError:
+        pass
+    assert time.monotonic() - started < 0.4
+
+def test_breaker_opens_and_recovers():
+    """连续失败后熔断，冷却后半开探测成功则关闭"""
+    breaker = CircuitBreaker("test_breaker", failure_threshold=2, recovery_timeout=0.05)
+    caller = ResilientCaller("test_breaker", attempt_timeout=1.0,
+                             retry_policy=RetryPolicy(max_attempts=1), breaker=breaker)
+
+    def down(timeout):
+        raise RetryableError("502", status_code=502)
+
+    for _ in range(2):
+        try:
+            caller.call(down)
+        except RetryableError:
+            pass
+    assert breaker.state == CircuitBreaker.OPEN
+    try:
+        caller.call(lambda timeout: "ok")
+        assert False, "熔断期间应拒绝调用"
+    except CircuitOpenError:
+        pass
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert caller.call(lambda timeout: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_half_open_probe_with_non_retryable_error():
+    """半开探测遇到非可重试错误时归还探测名额，后续调用仍可探测"""
+    breaker = CircuitBreaker("test_probe", failure_threshold=1, recovery_timeout=0.05)
+    caller = ResilientCaller("test_probe", attempt_timeout=1.0,
+                             retry_policy=RetryPolicy(max_attempts=1), breaker=breaker)
+
+    def down(timeout):
+        raise RetryableError("503", status_code=503)
+
+    try:
+        caller.call(down)
+    except RetryableError:
+        pass
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    def bad_request(timeout):
+        raise ValueError("400")
+
+    try:
+        caller.call(bad_request)
+        assert False, "非可重试错误应直接抛出"
+    except ValueError:
+        pass
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert caller.call(lambda timeout: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_hedged_request_wins():
+    """主请求卡住时，对冲请求先返回"""
+    state = {"calls": 0}
+
+    def slow_first(timeout):
+        state["calls"] += 1
+        if state["calls"] == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    caller = ResilientCaller("test_hedge", attempt_timeout=2.0, hedge_enabled=True,
+                             hedge_min_delay=0.02, hedge_min_samples=1)
+    caller.latencies.add(0.01)
+    started = time.monotonic()
+    assert caller.call(slow_first) == "fast"
+    assert time.monotonic() - started < 0.4
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
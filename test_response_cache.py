@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+测试请求拦截层的磁盘响应缓存
+"""
+import asyncio
+import base64
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import response_cache
+from config import load_config
+from response_cache import ResponseCache, freshness_lifetime
+
+class FakeRequest:
+    def __init__(self, url, resource_type="script", method="GET"):
+        self.url = url
+        self.resourceType = resource_type
+        self.method = method
+        self.responded = None
+        self.aborted = False
+
+    async def respond(self, response):
+        self.responded = response
+
+    async def abort(self):
+        self.aborted = True
+
+class FakeResponse:
+    def __init__(self, request, body, headers, status=200):
+        self.request = request
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def buffer(self):
+        return self._body
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+def test_config():
+    """默认关闭，模式取值受校验"""
+    assert load_config({}).response_cache.mode == "off"
+    config = load_config({"RESPONSE_CACHE_MODE": "offline", "RESPONSE_CACHE_MAX_MB": "10"}).response_cache
+    assert (config.mode, config.max_size_mb) == ("offline", 10)
+
+def test_freshness_lifetime():
+    """max-age 优先，no-store 和随Cookie变化的响应不缓存，Last-Modified 启发式取10%"""
+    assert freshness_lifetime({"Cache-Control": "public, max-age=600"}, 0) == 600
+    assert freshness_lifetime({"Cache-Control": "no-store"}, 0) is None
+    assert freshness_lifetime({"Vary": "Cookie"}, 0) is None
+    assert freshness_lifetime({"Cache-Control": "no-cache"}, 0) == 0
+    assert freshness_lifetime({
+        "Date": "Wed, 11 Jan 2023 00:00:00 GMT",
+        "Last-Modified": "Sun, 01 Jan 2023 00:00:00 GMT",
+    }, 0) == 86400.0
+    assert freshness_lifetime({}, 0) == 0
+    # private 的响应属于某个用户，不能放进各隐身上下文共用的缓存
+    assert freshness_lifetime({"Cache-Control": "private, max-age=600"}, 0) is None
+
+def test_static_hit_and_expiry():
+    """在线模式：新鲜的静态资源从磁盘应答，过期后放行；页面始终走网络"""
+    async def run():
+        clock = Clock()
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResponseCache(directory, 1024 * 1024, clock=clock)
+            request = FakeRequest("https://www.baidu.com/app.js")
+            await cache._on_response(FakeResponse(request, b"js", {"cache-control": "max-age=60",
+                                                                   "content-encoding": "gzip"}))
+            document = FakeRequest("https://www.baidu.com/", "document")
+            await cache._on_response(FakeResponse(document, b"<html>", {"cache-control": "max-age=60"}))
+            assert len(cache) == 1
+
+            hit = FakeRequest("https://www.baidu.com/app.js")
+            assert await cache.handle(hit)
+            assert hit.responded["body"] == b"js"
+            assert "content-encoding" not in hit.responded["headers"]
+            # 缓存自己应答的响应不会再写一次
+            await cache._on_response(FakeResponse(hit, b"js", {"cache-control": "max-age=60"}))
+
+            assert not await cache.handle(FakeRequest("https://www.baidu.com/", "document"))
+            clock.now += 61
+            assert not await cache.handle(FakeRequest("https://www.baidu.com/app.js"))
+
+            # 关闭后重新打开时从磁盘索引恢复
+            await cache.close()
+            assert len(ResponseCache(directory, 1024 * 1024, clock=clock)) == 1
+    asyncio.run(run())
+
+def test_index_flushed_in_batches():
+    """页面响应只标记索引已修改，攒够一批才写盘，关闭时写入剩余的修改"""
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            index = os.path.join(directory, "index.json")
+            cache = ResponseCache(directory, 1024 * 1024)
+            for i in range(response_cache.FLUSH_BATCH - 1):
+                request = FakeRequest(f"https://a.com/{i}.js")
+                await cache._on_response(FakeResponse(request, b"js", {"cache-control": "max-age=60"}))
+            assert not os.path.exists(index) and cache.dirty
+            request = FakeRequest("https://a.com/last.js")
+            await cache._on_response(FakeResponse(request, b"js", {"cache-control": "max-age=60"}))
+            assert os.path.exists(index) and not cache.dirty
+            request = FakeRequest("https://a.com/extra.js")
+            await cache._on_response(FakeResponse(request, b"js", {"cache-control": "max-age=60"}))
+            assert len(ResponseCache(directory, 1024 * 1024)) == response_cache.FLUSH_BATCH
+            await cache.close()
+            assert len(ResponseCache(directory, 1024 * 1024)) == response_cache.FLUSH_BATCH + 1
+    asyncio.run(run())
+
+def test_set_cookie_not_stored_or_replayed():
+    """Set-Cookie 不写入缓存，也不回放给其他上下文（包括旧索引中已有的）"""
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResponseCache(directory, 1024 * 1024)
+            request = FakeRequest("https://a.com/app.js")
+            await cache._on_response(FakeResponse(request, b"js", {"cache-control": "max-age=60",
+                                                                   "Set-Cookie": "sid=tenant-a"}))
+            entry = cache.lookup("https://a.com/app.js", "script")
+            assert "Set-Cookie" not in entry["headers"]
+            entry["headers"]["Set-Cookie"] = "sid=tenant-a"
+            hit = FakeRequest("https://a.com/app.js")
+            assert await cache.handle(hit)
+            assert "set-cookie" not in {name.lower() for name in hit.responded["headers"]}
+            # 按请求对象记录自己应答的请求，应答过的响应不再写入
+            assert hit in cache._served
+            await cache._on_response(FakeResponse(hit, b"js", {"cache-control": "max-age=60"}))
+            assert hit not in cache._served
+    asyncio.run(run())
+
+def test_validators_refresh_without_rewrite():
+    """ETag 不变时只刷新新鲜期，不重写响应体"""
+    clock = Clock()
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResponseCache(directory, 1024 * 1024, clock=clock)
+        first = cache.store("https://a.com/x.css", 200, {"ETag": '"v1"'}, "stylesheet", b"old", 10)
+        clock.now += 100
+        second = cache.store("https://a.com/x.css", 200, {"ETag": '"v1"'}, "stylesheet", b"new", 10)
+        assert second is first and first["expires_at"] == clock.now + 10
+        assert cache.read_body(first) == b"old"
+        third = cache.store("https://a.com/x.css", 200, {"ETag": '"v2"'}, "stylesheet", b"new", 10)
+        assert cache.read_body(third) == b"new"
+        assert cache.total_bytes == 3
+
+def test_lru_eviction():
+    """超过大小上限时淘汰最近最少使用的条目"""
+    clock = Clock()
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResponseCache(directory, 10, clock=clock)
+        cache.store("https://a.com/1.png", 200, {}, "image", b"1234", 60)
+        cache.store("https://a.com/2.png", 200, {}, "image", b"1234", 60)
+        assert cache.lookup("https://a.com/1.png", "image") is not None
+        cache.store("https://a.com/3.png", 200, {}, "image", b"1234", 60)
+        assert cache.lookup("https://a.com/2.png", "image") is None
+        assert cache.lookup("https://a.com/1.png", "image") is not None
+        assert cache.total_bytes == 8
+        assert sorted(os.listdir(os.path.join(directory, "bodies"))) == sorted(
+            cache.make_key(url) for url in ("https://a.com/1.png", "https://a.com/3.png"))
+
+def test_offline_mode_with_har_import():
+    """离线模式用导入的HAR应答所有请求（包括页面），未缓存的请求被中止"""
+    async def run():
+        har = {"log": {"entries": [{
+            "request": {"method": "GET", "url": "https://www.baidu.com/"},
+            "response": {"status": 200, "headers": [{"name": "Content-Type", "value": "text/html"}],
+                         "content": {"text": base64.b64encode(b"<html>").decode(), "encoding": "base64"}},
+            "_resourceType": "document",
+        }]}}
+        with tempfile.TemporaryDirectory() as directory:
+            assert ResponseCache(directory, 1024, mode="record").import_har(har) == 1
+            cache = ResponseCache(directory, 1024, mode="offline")
+            page = FakeRequest("https://www.baidu.com/", "document")
+            assert await cache.handle(page)
+            assert page.responded["body"] == b"<html>"
+            missing = FakeRequest("https://www.baidu.com/other.js")
+            assert await cache.handle(missing)
+            assert missing.aborted
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
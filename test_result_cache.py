@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+测试搜索结果缓存
+"""
+import asyncio
+import contextvars
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from result_cache import ResultCache, normalize_query
+from results import SearchResult, TaskResult
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_loader(calls, delay=0.0, results=1):
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        result = TaskResult(intent="open_and_search", website_url="https://www.baidu.com")
+        result.results = [SearchResult(f"第{len(calls)}次", "https://example.com", "", i + 1) for i in range(results)]
+        return result
+    return loader
+
+def test_normalize_query():
+    """搜索词规范化"""
+    assert normalize_query("  今天  广州天气 ") == "今天 广州天气"
+    assert normalize_query("Python  Tutorial") == "python tutorial"
+
+def test_hit_within_ttl():
+    """新鲜期内命中缓存，不再调用 loader"""
+    async def run():
+        clock = FakeClock()
+        cache = ResultCache(default_ttl=10, stale_ttl=0, clock=clock)
+        calls = []
+        first = await cache.get_or_fetch("百度", "今天广州天气", make_loader(calls))
+        clock.now = 5
+        second = await cache.get_or_fetch("百度", " 今天广州天气 ", make_loader(calls))
+        assert len(calls) == 1
+        assert not first.cached and second.cached
+        assert second.results[0].title == "第1次"
+        clock.now = 20
+        await cache.get_or_fetch("百度", "今天广州天气", make_loader(calls))
+        assert len(calls) == 2
+    asyncio.run(run())
+
+_caller = contextvars.ContextVar("caller", default=None)
+
+def test_background_refresh_has_clean_context():
+    """后台刷新不继承触发它的调用方的上下文变量，并且使用 refresher"""
+    async def run():
+        clock = FakeClock()
+        cache = ResultCache(default_ttl=10, stale_ttl=100, clock=clock)
+        seen = []
+        loader = make_loader([])
+
+        async def tracking_loader():
+            seen.append(("loader", _caller.get()))
+            return await loader()
+
+        async def refresher():
+            seen.append(("refresher", _caller.get()))
+            return await loader()
+
+        _caller.set("task-1")
+        await cache.get_or_fetch("百度", "天气", tracking_loader, refresher=refresher)
+        clock.now = 50
+        await cache.get_or_fetch("百度", "天气", tracking_loader, refresher=refresher)
+        await asyncio.sleep(0.01)
+        assert seen == [("loader", "task-1"), ("refresher", None)]
+    asyncio.run(run())
+
+def test_stale_while_revalidate():
+    """过期后先返回旧结果，后台刷新完成后返回新结果"""
+    async def run():
+        clock = FakeClock()
+        cache = ResultCache(default_ttl=10, stale_ttl=100, clock=clock)
+        calls = []
+        await cache.get_or_fetch("百度", "天气", make_loader(calls))
+        clock.now = 50
+        stale = await cache.get_or_fetch("百度", "天气", make_loader(calls))
+        assert stale.cached and stale.results[0].title == "第1次"
+        await asyncio.sleep(0.01)
+        fresh = await cache.get_or_fetch("百度", "天气", make_loader(calls))
+        assert len(calls) == 2
+        assert fresh.results[0].title == "第2次"
+    asyncio.run(run())
+
+def test_concurrent_misses_coalesce():
+    """并发的相同搜索只执行一次"""
+    async def run():
+        cache = ResultCache()
+        calls = []
+        results = await asyncio.gather(*[
+            cache.get_or_fetch("百度", "天气", make_loader(calls, delay=0.05)) for _ in range(5)
+        ])
+        assert len(calls) == 1
+        assert all(result.results[0].title == "第1次" for result in results)
+    asyncio.run(run())
+
+def test_empty_results_not_cached():
+    """没有结果的执行不写入缓存"""
+    async def run():
+        cache = ResultCache()
+        calls = []
+        await cache.get_or_fetch("百度", "天气", make_loader(calls, results=0))
+        await cache.get_or_fetch("百度", "天气", make_loader(calls, results=0))
+        assert len(calls) == 2
+        assert len(cache) == 0
+    asyncio.run(run())
+
+def test_lru_eviction():
+    """超过容量时淘汰最久未使用的条目"""
+    async def run():
+        cache = ResultCache(max_entries=2)
+        calls = []
+        for query in ("a", "b", "a", "c"):
+            await cache.get_or_fetch("百度", query, make_loader(calls))
+        assert len(cache) == 2
+        await cache.get_or_fetch("百度", "a", make_loader(calls))
+        assert len(calls) == 3
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+测试任务结果的数据结构
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from results import SearchResult, TaskResult
+
+def test_search_result_from_dict():
+    """页面脚本返回的字典转换为 SearchResult"""
+    item = SearchResult.from_dict({"title": "Python教程", "url": "https://example.com", "rank": "2"})
+    assert item.title == "Python教程"
+    assert item.snippet == ""
+    assert item.rank == 2
+
+def test_task_result_to_dict():
+    """TaskResult 可序列化为普通字典"""
+    result = TaskResult(intent="open_and_search", website_url="https://www.baidu.com")
+    result.results.append(SearchResult("标题", "https://example.com", "摘要", 1))
+    data = result.to_dict()
+    assert data["status"] == "ok"
+    assert data["results"][0] == {"title": "标题", "url": "https://example.com", "snippet": "摘要", "rank": 1, "site": ""}
+    # 默认的结果列表不在实例之间共享
+    assert TaskResult(intent="open_website", website_url="").results == []
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
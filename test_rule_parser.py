@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+测试统一的规则解析器
+"""
+import contextlib
+import io
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import QwenConfig
+from qwen_agent import QwenAgent
+from rule_parser import RuleParser, parse_command
+from sites import BUILTIN_SITES, SiteAdapter, SiteRegistry
+from standalone_test import parse_user_input_standalone
+from utils import clean_search_query, parse_search_intent
+
+def test_tokenize():
+    """一次扫描得到网站、动作词和登录字段；网站前后的介词归入网站词元"""
+    parser = RuleParser(SiteRegistry(BUILTIN_SITES))
+    tokens = parser.tokenize("帮我在知乎上搜索大模型")
+    assert [token.kind for token in tokens] == ["filler", "site", "search"]
+    assert tokens[1].site.name == "知乎"
+    # “上海”、“React 和 Vue”中的字不会被当成前缀切开
+    assert [token.kind for token in parser.tokenize("搜索上海 React 和 Vue")] == ["search"]
+    tokens = parser.tokenize("用户名:player1 密码:abc@2024")
+    assert [(token.kind, token.value) for token in tokens] == [("username", "player1"), ("password", "abc@2024")]
+
+def test_query_extraction():
+    """搜索词取动作词之后的一段并去掉网站名；动作词前有其他内容时保留整句"""
+    cases = {
+        "帮我在豆瓣找一下肖申克的救赎": ("豆瓣", "肖申克的救赎"),
+        "用百度查一下北京到上海的高铁": ("百度", "北京到上海的高铁"),
+        "百度一下深度学习框架": ("百度", "深度学习框架"),
+        "如何学习英语": ("百度", "如何学习英语"),
+        "查看今天广州天气": ("百度", "今天广州天气"),
+        "在知乎搜索“大语言模型的原理”": ("知乎", "大语言模型的原理"),
+        "查一下bilibili的股价": ("B站", "股价"),
+    }
+    for text, (site, query) in cases.items():
+        result = parse_command(text)
+        assert result["intent"] == "open_and_search", text
+        assert (result["website_name"], result["search_query"]) == (site, query), (text, result)
+    # 只有动作词没有内容时只是打开网站
+    assert parse_command("打开知乎看看")["intent"] == "open_website"
+
+def test_login_and_url():
+    """登录字段支持“是/为”、冒号和紧跟的写法；完整URL优先于网站别名"""
+    result = parse_command("帮我登录百度，用户名是 zhangsan，密码是 zs123456")
+    assert (result["intent"], result["username"], result["password"]) == ("open_and_login", "zhangsan", "zs123456")
+    result = parse_command("登录微博 用户名test 密码123456")
+    assert (result["username"], result["password"]) == ("test", "123456")
+    result = parse_command("打开https://github.com")
+    assert (result["intent"], result["website_name"], result["website_url"]) == \
+        ("open_website", "github.com", "https://github.com")
+
+def test_entry_points_agree():
+    """回退解析、独立测试版和 parse_search_intent 的结果一致（parse_search_intent 另外去掉停用词）"""
+    agent = QwenAgent(QwenConfig(api_key=""))
+    for text in ["去知乎搜索大模型", "在B站搜索Python教程", "查一下明天的汇率", "登录豆瓣 用户名a 密码b"]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            fallback = agent._fallback_parse(text)
+        assert parse_user_input_standalone(text) == fallback
+        if fallback["intent"] == "open_and_search":
+            search = parse_search_intent(text)
+            assert (search["website_url"], search["search_query"]) == (fallback["website_url"], clean_search_query(fallback["search_query"]))
+
+def test_rebuilds_when_registry_changes():
+    """注册表新增网站后解析器重建"""
+    registry = SiteRegistry(BUILTIN_SITES)
+    parser = RuleParser(registry)
+    assert parser.parse_search("在掘金搜索Rust")["website_name"] == "百度"
+    registry.register(SiteAdapter(name="掘金", home_url="https://juejin.cn", aliases=["juejin"]))
+    assert registry.version != parser.version
+    result = RuleParser(registry).parse_search("在掘金搜索Rust")
+    assert (result["website_name"], result["search_query"]) == ("掘金", "Rust")
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+测试词典分词和搜索词清理
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from segmenter import Segmenter
+import sites
+from sites import BUILTIN_SITES, SiteAdapter, SiteRegistry, get_registry
+from utils import clean_search_query
+
+def test_max_match():
+    """每个位置取最长的词，词典外的字符合并为一段"""
+    segmenter = Segmenter({"知乎": "site", "知乎上": "site", "在知乎上": "site", "搜索": "search", "搜": "search"})
+    assert segmenter.segment("在知乎上搜索大模型") == [("在知乎上", "site"), ("搜索", "search"), ("大模型", None)]
+    assert segmenter.segment("知乎里搜大模型") == [("知乎", "site"), ("里", None), ("搜", "search"), ("大模型", None)]
+    # 较长的候选没有走完时退回较短的词
+    assert segmenter.scan("在知乎") == [(1, 3, "site")]
+    assert Segmenter().segment("大模型") == [("大模型", None)]
+
+def test_ascii_word_boundary():
+    """英文词只在词边界上匹配，不区分大小写"""
+    segmenter = Segmenter({"bili": 1, "bilibili": 2, "open": 3})
+    assert segmenter.scan("abilities openai") == []
+    assert segmenter.scan("Bilibili上 OPEN") == [(0, 8, 2), (10, 14, 3)]
+    # 较长的英文词后面紧跟字母时退回较短的词
+    assert segmenter.segment("bili bilibil") == [("bili", 1), (" bilibil", None)]
+
+def test_clean_unspaced_chinese():
+    """不依赖空格去掉停用词，保护含停用字的常用词"""
+    assert clean_search_query("人工智能的发展趋势") == "人工智能发展趋势"
+    assert clean_search_query("React 和 Vue 的区别") == "React Vue 区别"
+    assert clean_search_query("目的地的天气") == "目的地天气"
+    assert clean_search_query("现在在线的人数") == "现在在线人数"
+    assert clean_search_query("  Python   教程 ") == "Python 教程"
+
+def test_clean_leading_verbs_and_sites():
+    """只去掉开头的动作词和网站名；清理后为空时返回原查询"""
+    assert clean_search_query("去知乎搜索大模型") == "大模型"
+    assert clean_search_query("大模型 搜索 技巧") == "大模型 搜索 技巧"
+    assert clean_search_query("open source 项目") == "open source 项目"
+    assert clean_search_query("搜索") == "搜索"
+    assert clean_search_query(" 的 ") == "的"
+
+def test_clean_follows_registry():
+    """注册新网站后搜索词清理识别新的别名"""
+    original = get_registry()
+    sites._registry = registry = SiteRegistry(BUILTIN_SITES)
+    try:
+        assert clean_search_query("掘金搜索Rust") == "掘金搜索Rust"
+        registry.register(SiteAdapter(name="掘金", home_url="https://juejin.cn", aliases=["juejin"]))
+        assert clean_search_query("掘金搜索Rust") == "Rust"
+    finally:
+        sites._registry = original
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+测试请求合并（single-flight）
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from singleflight import AsyncSingleFlight, SingleFlight, input_fingerprint, task_fingerprint
+
+def test_task_fingerprint():
+    """规范化后相同的任务指纹相同"""
+    a = {"intent": "open_and_search", "website_url": "https://www.baidu.com", "search_query": "今天 广州天气"}
+    b = {"intent": "open_and_search", "website_url": "https://baidu.com/", "search_query": " 今天  广州天气 "}
+    c = dict(a, search_query="北京天气")
+    assert task_fingerprint(a) == task_fingerprint(b)
+    assert task_fingerprint(a) != task_fingerprint(c)
+    login = {"intent": "login", "website_url": "https://www.zhihu.com", "username": "u", "password": "p1"}
+    assert task_fingerprint(login) != task_fingerprint(dict(login, password="p2"))
+    assert "p1" not in task_fingerprint(login)
+
+def test_task_fingerprint_keeps_path():
+    """同一网站的不同页面或子域名不合并"""
+    def task(url):
+        return {"intent": "open_website", "website_url": url}
+    assert task_fingerprint(task("https://github.com/foo/bar")) != task_fingerprint(task("https://github.com/other/repo"))
+    assert task_fingerprint(task("https://www.baidu.com/a")) != task_fingerprint(task("https://news.baidu.com/a"))
+    assert task_fingerprint(task("https://github.com/foo?tab=1")) != task_fingerprint(task("https://github.com/foo?tab=2"))
+    assert task_fingerprint(task("HTTPS://GitHub.com:443/foo/#top")) == task_fingerprint(task("https://github.com/foo"))
+
+def test_input_fingerprint():
+    """指令指纹忽略多余空白，保留大小写（账号密码区分大小写）"""
+    assert input_fingerprint(" 打开  Baidu ") == input_fingerprint("打开 Baidu")
+    assert input_fingerprint("登录GitHub 用户名Alice 密码Secret1") != input_fingerprint("登录github 用户名alice 密码secret1")
+
+def test_threaded_calls_share_result():
+    """并发的相同同步调用只执行一次"""
+    flight = SingleFlight("test")
+    calls = []
+    started = threading.Event()
+
+    def work():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {"intent": "open_website"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", work)))]
+    threads[0].start()
+    started.wait()
+    threads += [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(4)]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(results) == 5
+    # 执行结束后键被释放，再次调用会重新执行
+    flight.do("k", work)
+    assert len(calls) == 2
+
+def test_threaded_error_shared():
+    """领头调用的异常传给所有等待者"""
+    flight = SingleFlight("test")
+    started = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    def call():
+        try:
+            flight.do("k", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2
+
+def test_async_calls_share_result():
+    """并发的相同协程调用只执行一次，取消一个调用方不影响其他调用方"""
+    async def run():
+        flight = AsyncSingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "done"
+
+        tasks = [asyncio.ensure_future(flight.do("k", work)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        tasks[0].cancel()
+        results = await asyncio.gather(*tasks[1:])
+        assert results == ["done", "done"]
+        assert len(calls) == 1
+        assert not flight.in_flight("k")
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
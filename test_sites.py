@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+测试网站适配器注册表
+"""
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import sites
+from config import QwenConfig, SitesConfig
+from qwen_agent import QwenAgent
+from sites import BUILTIN_SITES, SiteAdapter, SiteRegistry, get_registry, registrable_domain
+
+def test_registrable_domain():
+    """提取可注册域名"""
+    assert registrable_domain("https://www.baidu.com/") == "baidu.com"
+    assert registrable_domain("https://s.weibo.com/weibo?q=1") == "weibo.com"
+    assert registrable_domain("www.example.com.cn:8080/path") == "example.com.cn"
+    assert registrable_domain("localhost") == "localhost"
+
+def test_lookup_by_url():
+    """URL查找忽略子域名、路径和末尾斜杠"""
+    registry = SiteRegistry(BUILTIN_SITES)
+    assert registry.for_url("https://www.baidu.com/").name == "百度"
+    assert registry.for_url("https://search.bilibili.com/all?keyword=x").name == "B站"
+    assert registry.for_url("https://m.weibo.cn").name == "微博"
+    assert registry.for_url("https://example.org") is None
+
+def test_find_in_text():
+    """在自然语言中匹配网站别名"""
+    registry = SiteRegistry(BUILTIN_SITES)
+    assert registry.find_in_text("去知乎搜索大模型").name == "知乎"
+    assert registry.find_in_text("在Bilibili找编程视频").name == "B站"
+    assert registry.find_in_text("打开哔哩哔哩").name == "B站"
+    assert registry.find_in_text("查看今天广州天气") is None
+    assert registry.default().name == "百度"
+
+def test_search_url_and_aliases():
+    """搜索URL模板与别名清理"""
+    registry = SiteRegistry(BUILTIN_SITES)
+    baidu = registry.get("baidu")
+    assert baidu.search_url("今天 天气") == "https://www.baidu.com/s?wd=%E4%BB%8A%E5%A4%A9%20%E5%A4%A9%E6%B0%94"
+    assert registry.get("B站").strip_aliases("b站编程视频") == "编程视频"
+
+def test_load_file_overrides_and_extends():
+    """从JSON文件加载网站，同名覆盖内置配置"""
+    registry = SiteRegistry(BUILTIN_SITES)
+    sites = [
+        {"name": "GitHub", "home_url": "https://github.com", "aliases": ["github"],
+         "search_url_template": "https://github.com/search?q={query}"},
+        {"name": "百度", "home_url": "https://www.baidu.com", "search_input": "textarea#chat-textarea"}
+    ]
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(sites, f, ensure_ascii=False)
+    try:
+        registry.load_file(f.name)
+    finally:
+        os.unlink(f.name)
+    assert registry.find_in_text("去GitHub搜索pyppeteer").name == "GitHub"
+    assert registry.for_url("https://www.baidu.com").search_input == "textarea#chat-textarea"
+    assert len(registry) == len(BUILTIN_SITES) + 1
+
+def test_registry_uses_passed_config():
+    """注册表按传入的配置加载，之后不带参数取用；解析器使用传给它的注册表"""
+    original = (sites._registry, sites._registry_paths)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump([{"name": "GitHub", "home_url": "https://github.com", "aliases": ["github"]}], f)
+    try:
+        registry = get_registry(SitesConfig(config_paths=[f.name]))
+        assert get_registry() is registry and registry.get("GitHub") is not None
+        agent = QwenAgent(QwenConfig(api_key=""), sites=registry)
+        assert agent._fallback_parse("去GitHub搜索pyppeteer")["website_name"] == "GitHub"
+        # 配置文件变化时重新加载
+        assert get_registry(SitesConfig()).get("GitHub") is None
+    finally:
+        os.unlink(f.name)
+        sites._registry, sites._registry_paths = original
+
+def test_typing_strategy_validated():
+    """网站的输入方式必须是已知取值"""
+    assert SiteRegistry(BUILTIN_SITES).get("百度").typing_strategy == "instant"
+    try:
+        SiteAdapter.from_dict({"name": "X", "home_url": "https://x.com", "typing_strategy": "fast"})
+        assert False, "应该拒绝未知的输入方式"
+    except ValueError:
+        pass
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
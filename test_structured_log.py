@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+测试结构化日志
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import LoggingConfig, load_config
+from structured_log import (
+    correlation, debug_dumps_enabled, flush_logs, get_correlation_id, get_logger, setup_logging, shutdown_logging
+)
+
+class CountingStr:
+    """记录被格式化的次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "value"
+
+def _read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def test_config():
+    """默认 INFO 级别、console 格式，调试转储默认关闭"""
+    config = load_config({}).logging
+    assert (config.level, config.format, config.debug_dumps) == ("INFO", "console", False)
+    config = load_config({"LOG_LEVEL": "DEBUG", "LOG_FORMAT": "json", "LOG_DEBUG_DUMPS": "true"}).logging
+    assert (config.level, config.format, config.debug_dumps) == ("DEBUG", "json", True)
+
+def test_json_lines_with_correlation():
+    """JSON日志每行一条，带有产生日志时的关联ID（包括在 asyncio 任务中产生的）"""
+    logger = get_logger("test")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "agent.log")
+        setup_logging(LoggingConfig(format="json", file=path, debug_dumps=True))
+        try:
+            assert debug_dumps_enabled()
+            with correlation("abc123"):
+                logger.info("解析 %s", "指令")
+
+                async def task():
+                    logger.warning("任务中")
+                asyncio.run(task())
+            logger.info("没有关联ID")
+            flush_logs()
+            lines = _read_lines(path)
+        finally:
+            shutdown_logging()
+    assert [line["message"] for line in lines] == ["解析 指令", "任务中", "没有关联ID"]
+    assert [line.get("correlation_id") for line in lines] == ["abc123", "abc123", None]
+    assert lines[1]["level"] == "WARNING"
+    assert lines[0]["logger"] == "agent.test"
+
+def test_filtered_debug_is_not_formatted():
+    """级别之外的调试日志不会格式化参数"""
+    logger = get_logger("test")
+    value = CountingStr()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "agent.log")
+        setup_logging(LoggingConfig(level="INFO", format="json", file=path))
+        try:
+            logger.debug("页面元素 %s", value)
+            logger.info("结果 %s", value)
+            flush_logs()
+            lines = _read_lines(path)
+        finally:
+            shutdown_logging()
+    assert value.calls == 1
+    assert [line["message"] for line in lines] == ["结果 value"]
+
+def test_correlation_scope():
+    """没有传入关联ID时生成新的，离开作用域后恢复"""
+    assert get_correlation_id() == ""
+    with correlation() as correlation_id:
+        assert get_correlation_id() == correlation_id and len(correlation_id) == 12
+    assert get_correlation_id() == ""
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("🎉 全部通过")
@@ -2,6 +2,8 @@ import re
 import urllib.parse
 from typing import Dict, List, Optional
 
+from sites import get_registry
+
 def extract_domain(url: str) -> str:
     """
     从URL中提取域名
@@ -12,67 +14,90 @@ def extract_domain(url: str) -> str:
     except:
         return ""
 
+# 搜索词中去掉的停用词
+STOP_WORDS = ['的', '了', '在', '和', '与', '或', '但是', '然而', '因此', '所以']
+
+# 包含停用字的常用词，整体作为一个词保留，避免“目的”、“现在”、“和平”被拆开
+PROTECTED_WORDS = [
+    '的确', '目的', '的士', '的话', '了解', '为了', '除了', '了不起', '在线', '现在', '正在', '存在', '所在', '实在',
+    '在于', '好在', '和平', '和谐', '温和', '总和', '暖和', '和尚', '参与', '给与', '或者', '或许', '所以然',
+]
+
+# 搜索词开头去掉的词类：搜索、打开、登录动作词，客套词，网站名（“去知乎搜索大模型” -> “大模型”）
+_LEADING_KINDS = {"search", "open", "login", "filler", "site"}
+
+_query_segmenter = None
+_query_segmenter_key = None
+
+def _get_query_segmenter():
+    """搜索词的词典：停用词、保护词、动作词和网站名，网站注册表变化时重建"""
+    global _query_segmenter, _query_segmenter_key
+    registry = get_registry()
+    key = (id(registry), registry.version)
+    if _query_segmenter_key == key:
+        return _query_segmenter
+
+    # rule_parser 依赖本模块，在这里导入避免循环导入
+    from rule_parser import KEYWORDS, SITE_PREFIXES, SITE_SUFFIXES
+    from segmenter import Segmenter
+
+    segmenter = Segmenter({word: "stop" for word in STOP_WORDS})
+    segmenter.update((word, "word") for word in PROTECTED_WORDS)
+    # 英文动作词（open、search）常是搜索内容的一部分，不去掉
+    segmenter.update((word, kind) for kind in _LEADING_KINDS - {"site"}
+                     for word in KEYWORDS.get(kind, []) if not word.isascii())
+    for adapter in registry:
+        for alias in adapter.aliases:
+            for prefix in [""] + SITE_PREFIXES:
+                for suffix in [""] + SITE_SUFFIXES:
+                    segmenter.add(prefix + alias + suffix, "site")
+    _query_segmenter, _query_segmenter_key = segmenter, key
+    return segmenter
+
 def clean_search_query(query: str) -> str:
     """
     清理搜索查询字符串
+
+    按词典做正向最大匹配分词，不依赖空格：去掉停用词（“人工智能的发展趋势” -> “人工智能发展趋势”）
+    和开头的动作词、网站名，合并多余的空白；清理后为空时返回原查询
     """
-    # 移除多余的空格
-    query = re.sub(r'\s+', ' ', query).strip()
-    
-    # 移除常见的无用词
-    stop_words = ['的', '了', '在', '和', '与', '或', '但是', '然而', '因此', '所以']
-    words = query.split()
-    filtered_words = [word for word in words if word not in stop_words]
-    
-    return ' '.join(filtered_words) if filtered_words else query
+    query = " ".join(query.split())
+    segmenter = _get_query_segmenter()
+    parts = []
+    position = 0
+    leading = True
+    for match in segmenter.finditer(query):
+        if leading and query[position:match.start()].strip():
+            leading = False
+        kind = segmenter.value(match.group())
+        if kind == "stop" or (leading and kind in _LEADING_KINDS):
+            parts.append(query[position:match.start()])
+            position = match.end()
+        else:
+            leading = False
+    if not parts:
+        return query
+    parts.append(query[position:])
+    return " ".join("".join(parts).split()) or query
 
 def normalize_website_name(name: str) -> str:
     """
     标准化网站名称
     """
-    name_mapping = {
-        'zhihu': '知乎',
-        'baidu': '百度',
-        'weibo': '微博',
-        'bilibili': 'B站',
-        'douban': '豆瓣',
-        'b站': 'B站',
-        'bili': 'B站'
-    }
-    
-    name_lower = name.lower()
-    return name_mapping.get(name_lower, name)
+    adapter = get_registry().get(name)
+    return adapter.name if adapter else name
 
 def get_common_selectors() -> Dict[str, Dict[str, str]]:
     """
     获取常见网站的选择器配置
     """
     return {
-        "https://www.zhihu.com": {
-            "search_input": "input[placeholder*='搜索']",
-            "search_button": None,
-            "wait_selector": ".SearchResult"
-        },
-        "https://www.baidu.com": {
-            "search_input": "input#kw",
-            "search_button": "input#su",
-            "wait_selector": ".result"
-        },
-        "https://weibo.com": {
-            "search_input": "input[placeholder*='搜索']",
-            "search_button": None,
-            "wait_selector": ".card-wrap"
-        },
-        "https://www.bilibili.com": {
-            "search_input": "input.nav-search-input",
-            "search_button": None,
-            "wait_selector": ".video-item"
-        },
-        "https://www.douban.com": {
-            "search_input": "input[placeholder*='搜索']",
-            "search_button": "input[type='submit']",
-            "wait_selector": ".item"
+        adapter.home_url: {
+            "search_input": adapter.search_input,
+            "search_button": adapter.search_button,
+            "wait_selector": adapter.result_selector
         }
+        for adapter in get_registry()
     }
 
 def validate_task_info(task_info: Dict) -> bool:
@@ -87,6 +112,79 @@ def validate_task_info(task_info: Dict) -> bool:
     
     return True
 
+# 意图识别支持的任务类型
+SUPPORTED_INTENTS = ["open_website", "open_and_search", "login", "open_and_login", "plan", "multi_search"]
+
+# 多步计划中每一步可用的任务类型
+PLAN_STEP_INTENTS = ["open_website", "open_and_search", "login", "open_and_login"]
+
+# 只能由用户在指令中给出的字段：指令中没有时模型也提取不出来，缺失时提示用户补充而不是升级模型
+USER_SUPPLIED_FIELDS = ("username", "password")
+
+def is_user_supplied_field(field: str) -> bool:
+    """get_missing_fields 返回的字段（含 steps[序号].字段名）是否只能由用户提供"""
+    return field.rsplit(".", 1)[-1] in USER_SUPPLIED_FIELDS
+
+def get_missing_fields(task_info: Dict) -> List[str]:
+    """
+    按意图检查任务信息，返回缺失的必要字段
+
+    多步计划逐步检查，缺失字段记为 steps[序号].字段名；
+    多网站搜索检查搜索词和每个网站的URL，缺失字段记为 websites[序号].website_url
+    """
+    intent = task_info.get('intent', '')
+    if intent == "multi_search":
+        websites = task_info.get('websites') or []
+        missing_fields = [] if websites else ['websites']
+        missing_fields.extend(f"websites[{index}].website_url"
+                              for index, website in enumerate(websites) if not website.get('website_url'))
+        if not task_info.get('search_query'):
+            missing_fields.append('search_query')
+        return missing_fields
+    if intent == "plan":
+        steps = task_info.get('steps') or []
+        if not steps:
+            return ['steps']
+        missing_fields = []
+        for index, step in enumerate(steps):
+            if step.get('intent') not in PLAN_STEP_INTENTS:
+                missing_fields.append(f"steps[{index}].intent")
+                continue
+            missing_fields.extend(f"steps[{index}].{field}" for field in get_missing_fields(step))
+        return missing_fields
+    
+    missing_fields = []
+    
+    for field in ['intent', 'website_url']:
+        if field not in task_info or not task_info[field]:
+            missing_fields.append(field)
+    
+    # 根据任务类型验证特定字段
+    if intent == "open_and_search":
+        if not task_info.get('search_query'):
+            missing_fields.append('search_query')
+    elif intent in ["login", "open_and_login"]:
+        if not task_info.get('username'):
+            missing_fields.append('username')
+        if not task_info.get('password'):
+            missing_fields.append('password')
+    
+    return missing_fields
+
+def fill_plan_websites(task_info: Dict) -> Dict:
+    """
+    多步计划中没有指定网站的步骤沿用上一步的网站（如“登录豆瓣然后搜索电影”）
+    """
+    if task_info.get('intent') != "plan":
+        return task_info
+    previous = None
+    for step in task_info.get('steps') or []:
+        if not step.get('website_url') and previous is not None:
+            step['website_name'] = previous.get('website_name', '')
+            step['website_url'] = previous.get('website_url', '')
+        previous = step
+    return task_info
+
 def format_user_input(user_input: str) -> str:
     """
     格式化用户输入
@@ -102,58 +200,14 @@ def format_user_input(user_input: str) -> str:
 
 def parse_search_intent(text: str) -> Dict[str, str]:
     """
-    简单的搜索意图解析（作为AI解析的备选方案）
+    简单的搜索意图解析（作为AI解析的备选方案），使用与回退解析相同的规则解析器
     """
-    # 网站关键词映射
-    website_keywords = {
-        '知乎': 'https://www.zhihu.com',
-        '百度': 'https://www.baidu.com',
-        '微博': 'https://weibo.com',
-        'b站': 'https://www.bilibili.com',
-        'bilibili': 'https://www.bilibili.com',
-        '豆瓣': 'https://www.douban.com'
-    }
-    
-    # 搜索动词
-    search_verbs = ['搜索', '搜', '查找', '查', '找', '寻找']
+    # rule_parser 依赖本模块，在这里导入避免循环导入
+    from rule_parser import parse_search
     
-    # 打开动词
-    open_verbs = ['打开', '去', '访问', '进入']
-    
-    website_name = ""
-    website_url = ""
-    search_query = text
-    
-    # 查找网站关键词
-    for keyword, url in website_keywords.items():
-        if keyword in text:
-            website_name = keyword
-            website_url = url
-            break
-    
-    # 如果没有找到特定网站，默认使用百度
-    if not website_name:
-        website_name = "百度"
-        website_url = "https://www.baidu.com"
-    
-    # 提取搜索关键词
-    for verb in search_verbs + open_verbs:
-        if verb in text:
-            parts = text.split(verb, 1)
-            if len(parts) > 1:
-                search_query = parts[1].strip()
-                break
-    
-    # 清理搜索词
-    search_query = search_query.replace(website_name, "").strip()
-    search_query = clean_search_query(search_query)
-    
-    return {
-        "intent": "open_and_search",
-        "website_name": website_name,
-        "website_url": website_url,
-        "search_query": search_query
-    }
+    result = parse_search(text)
+    result["search_query"] = clean_search_query(result["search_query"])
+    return result
 
 def log_task_execution(task_info: Dict, status: str, message: str = ""):
     """
@@ -163,25 +217,89 @@ def log_task_execution(task_info: Dict, status: str, message: str = ""):
     if message:
         print(f"    {message}")
 
-def get_browser_config() -> Dict:
+# production 启动方案额外使用的低占用参数
+PRODUCTION_CHROME_ARGS = [
+    # 不做后台联网、同步、组件更新和崩溃上报
+    "--disable-background-networking",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--disable-component-update",
+    "--disable-breakpad",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--no-default-browser-check",
+    # 并行页面都在后台，不能被节流或冻结
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    # 关闭用不到的附加功能
+    "--disable-features=Translate,OptimizationHints,MediaRouter",
+    "--mute-audio",
+    "--hide-scrollbars",
+]
+
+# 关闭站点隔离（BROWSER_DISABLE_SITE_ISOLATION）：同一网站的标签页共用渲染进程，显著减少进程数，
+# 但隐身上下文（TASK_ISOLATION=incognito）之间的进程隔离也随之失效
+SITE_ISOLATION_ARGS = ["--disable-features=site-per-process,IsolateOrigins"]
+
+# 值为逗号分隔列表的开关：Chrome只认最后一个，多次出现时合并为一个
+LIST_SWITCHES = ("--disable-features", "--enable-features", "--disable-blink-features")
+
+def merge_chrome_args(args: List[str]) -> List[str]:
     """
-    获取浏览器配置
+    合并Chrome启动参数：LIST_SWITCHES 中的开关多次出现时把取值合并到第一次出现的位置（去重），
+    其他参数去掉完全相同的重复项
     """
-    return {
-        "headless": False,
-        "args": [
-            "--start-maximized",
-            "--no-sandbox",
-            "--disable-setuid-sandbox",
-            "--disable-dev-shm-usage",
-            "--disable-accelerated-2d-canvas",
-            "--disable-gpu",
-            "--window-size=1920,1080",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-extensions"
-        ],
+    merged: List[str] = []
+    values: Dict[str, List[str]] = {}
+    for arg in args:
+        switch, _, value = arg.partition("=")
+        if switch in LIST_SWITCHES:
+            if switch not in values:
+                values[switch] = []
+                merged.append(switch)
+            values[switch].extend(item.strip() for item in value.split(",")
+                                  if item.strip() and item.strip() not in values[switch])
+        elif arg not in merged:
+            merged.append(arg)
+    return [f"{arg}={','.join(values[arg])}" if arg in values else arg for arg in merged]
+
+def get_browser_config(config) -> Dict:
+    """
+    获取浏览器启动参数（pyppeteer.launch 的选项）
+    
+    config 为 config.BrowserConfig
+    """
+    args = [
+        "--no-sandbox",
+        "--disable-setuid-sandbox",
+        # /dev/shm 在容器中通常只有64MB，改用 /tmp 避免标签页崩溃
+        "--disable-dev-shm-usage",
+        "--disable-accelerated-2d-canvas",
+        "--disable-gpu",
+        f"--window-size={config.viewport_width},{config.viewport_height}",
+        "--disable-blink-features=AutomationControlled",
+        "--disable-extensions"
+    ]
+    if not config.headless:
+        args.insert(0, "--start-maximized")
+    if config.profile == "production":
+        args.extend(PRODUCTION_CHROME_ARGS)
+    if config.disable_site_isolation:
+        args.extend(SITE_ISOLATION_ARGS)
+    if config.tab_heap_limit_mb:
+        args.append(f"--js-flags=--max-old-space-size={config.tab_heap_limit_mb}")
+    args = merge_chrome_args(args + list(config.extra_args))
+    
+    options = {
+        "headless": config.headless,
+        "args": args,
         "defaultViewport": {
-            "width": 1920,
-            "height": 1080
-        }
-    }
\ No newline at end of file
+            "width": config.viewport_width,
+            "height": config.viewport_height
+        },
+        "timeout": config.launch_timeout_ms
+    }
+    if config.chrome_path:
+        options["executablePath"] = config.chrome_path
+    return options